@@ -2,3 +2,6 @@ from .modelicaregressiontest import RegressionTest
 from . import metrics
 from .generator import Generator
 from . import utils
+from . import resultio
+from . import runner
+from . import streaming
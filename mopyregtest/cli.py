@@ -10,22 +10,14 @@ import argparse
 import pathlib
 import sys
 from mopyregtest import metrics
+from mopyregtest import resultio
+from mopyregtest import runner
 from mopyregtest import Generator, RegressionTest
+from mopyregtest.generator import ReferenceGenerationError
 
 
 def metric_str_to_func(m: str):
-    if m == "norm_p_dist":
-        return metrics.norm_p_dist
-    elif m == "norm_infty_dist":
-        return metrics.norm_infty_dist
-    elif m == "Lp_dist":
-        return metrics.Lp_dist
-    elif m == "Linfty_dist":
-        return metrics.Linfty_dist
-    elif m == "abs_dist_ptwise":
-        return metrics.abs_dist_ptwise
-    else:
-        raise ValueError("Invalid value for metric")
+    return metrics.get_metric(m)
 
 
 def generate(args):
@@ -36,6 +28,14 @@ def generate(args):
     models_in_package = args.models_in_package.split(",")
     mode = args.mode
 
+    simulation_options = None
+    if args.discover:
+        simulation_options = {}
+        for root_class in models_in_package:
+            simulation_options.update(Generator.discover_models(package_folder, root_class))
+        models_in_package = list(simulation_options.keys())
+        print(f"Discovered {len(models_in_package)} models in {args.models_in_package}")
+
     if args.references is not None:
         ref_pairs = args.references.split(",")
         references = {}
@@ -56,8 +56,14 @@ def generate(args):
         metric = metric_str_to_func(args.metric)
 
     gen = Generator(package_folder=package_folder, models_in_package=models_in_package,
-                    mode=mode, metric=metric, tol=args.tol)
-    gen.generate_tests(test_folder, test_name, result_folder, references)
+                    mode=mode, metric=metric, tol=args.tol, simulation_options=simulation_options,
+                    reference_format=args.reference_format, reference_store=args.reference_store)
+    try:
+        gen.generate_tests(test_folder, test_name, result_folder, references, num_workers=args.workers,
+                           incremental=args.incremental, output_format=args.output_format)
+    except ReferenceGenerationError as e:
+        print(f"{e}. Aborting test generation.")
+        sys.exit(1)
 
     return
 
@@ -75,8 +81,25 @@ def compare(args):
     if args.metric is not None:
         metric = metric_str_to_func(args.metric)
 
+    discrete_cols = None
+    if args.discrete_cols is not None:
+        discrete_cols = args.discrete_cols if args.discrete_cols == "auto" else args.discrete_cols.split(",")
+
     RegressionTest.compare_csv_files(ref_result, act_result,
-                                     args.tol, validated_cols, metric, True, args.fill_in_method)
+                                     args.tol, validated_cols, metric, True, args.fill_in_method,
+                                     chunk_rows=args.chunk_rows, num_threads=args.threads if args.threads > 0 else None,
+                                     t_start=args.t_start, t_stop=args.t_stop, fail_fast=args.fail_fast,
+                                     priority_cols=args.priority_cols.split(",") if args.priority_cols else [],
+                                     discrete_cols=discrete_cols, event_tol=args.event_tol)
+
+    return
+
+
+def run(args):
+    results = runner.run_manifest(args.manifest, num_workers=args.workers)
+
+    if not all(r["passed"] for r in results):
+        sys.exit(1)
 
     return
 
@@ -111,7 +134,7 @@ def parse_args(cmd_args):
                                  help="Metric to be used. Choose here from predefined values. "
                                       "For user-defined metrics please consider creating the tests with a dedicated script. "
                                       "If omitted, the default is norm_infty_dist",
-                                 choices=["norm_p_dist", "norm_infty_dist", "Lp_dist", "Linfty_dist", "abs_dist_ptwise"],
+                                 choices=metrics.metric_names(),
                                  default="norm_infty_dist")
     generate_parser.add_argument("--tol", type=float,
                                  help="Absolute tolerance up to which deviation in the comparison metric is accepted",
@@ -119,6 +142,29 @@ def parse_args(cmd_args):
     generate_parser.add_argument("--references", type=str,
                                  help="Comma separated list like <model name1>:</path/to/ref1.csv>,<model name2>:</path/to/ref2.csv>. "
                                       "Missing references for models here will be generated.")
+    generate_parser.add_argument("--workers", type=int,
+                                 help="Number of processes used to generate missing references in parallel",
+                                 default=1)
+    generate_parser.add_argument("--discover", action="store_true",
+                                 help="Interpret models_in_package as a comma separated list of packages like "
+                                      "<package name1>,<package name2> and generate tests for all non-partial models "
+                                      "and blocks with an experiment annotation found in them")
+    generate_parser.add_argument("--incremental", action="store_true",
+                                 help="Only regenerate references whose model sources, dependencies, Modelica version "
+                                      "or tool version changed since they were last generated")
+    generate_parser.add_argument("--reference-format", type=str,
+                                 help="Format of the stored references. Compressed and binary formats are read "
+                                      "transparently when comparing results",
+                                 choices=resultio.RESULT_FORMATS,
+                                 default="csv")
+    generate_parser.add_argument("--reference-store", type=str,
+                                 help="Folder of a content-addressed reference store. References are stored there "
+                                      "once per distinct content and the generated tests point to them")
+    generate_parser.add_argument("--output-format", type=str,
+                                 help="'unittest' (default) generates one test method per model. 'manifest' generates "
+                                      "a compact test manifest that can be run in parallel with 'mopyregtest run'",
+                                 choices=["unittest", "manifest"],
+                                 default="unittest")
     generate_parser.set_defaults(func=generate)
 
     # mopyregtest compare
@@ -130,10 +176,11 @@ def parse_args(cmd_args):
     compare_parser.add_argument("--metric", type=str,
                                 help="Metric to be used. Choose here from predefined values. "
                                      "For user-defined metrics please consider creating the tests with a dedicated script.",
-                                choices=["norm_p_dist", "norm_infty_dist", "Lp_dist", "Linfty_dist", "abs_dist_ptwise"],
+                                choices=metrics.metric_names(),
                                 default="norm_infty_dist")
     compare_parser.add_argument("--validated-cols", type=str,
-                                help="Comma separated list like <var name 1>,<var name 2>. "
+                                help="Comma separated list like <var name 1>,<var name 2>. Entries may be glob "
+                                     "patterns like *.v or regular expressions prefixed with re:. "
                                      "If omitted, then all common column names from both CSV files will be used.")
     compare_parser.add_argument("--tol", type=float,
                                 help="Absolute tolerance up to which deviation in the comparison metric is accepted",
@@ -141,8 +188,38 @@ def parse_args(cmd_args):
     compare_parser.add_argument("--fill-in-method", type=str,
                                 help="Defines the method used to fill in data when calling RegressionTest._unify_timestamps",
                                 choices=["ffill", "bfill", "interpolate"], default="ffill")
+    compare_parser.add_argument("--chunk-rows", type=int,
+                                help="Read and compare the results in chunks of this many rows, such that memory stays "
+                                     "bounded for results of any size. No comparison file is written then")
+    compare_parser.add_argument("--threads", type=int, default=1,
+                                help="Number of threads evaluating the metric on the columns in parallel. 0 uses all "
+                                     "CPUs. Default: 1")
+    compare_parser.add_argument("--t-start", type=float,
+                                help="Only compare rows with time >= t_start, e.g. to exclude initialization transients")
+    compare_parser.add_argument("--t-stop", type=float,
+                                help="Only compare rows with time <= t_stop")
+    compare_parser.add_argument("--fail-fast", action="store_true",
+                                help="Stop at the first column exceeding the tolerance without writing a comparison file")
+    compare_parser.add_argument("--priority-cols", type=str,
+                                help="Comma separated list of columns or patterns compared first with --fail-fast")
+    compare_parser.add_argument("--discrete-cols", type=str,
+                                help="Comma separated list of Integer or Boolean columns or patterns, which are "
+                                     "compared exactly instead of with the metric. 'auto' detects columns with only "
+                                     "integral values")
+    compare_parser.add_argument("--event-tol", type=float, default=0.0,
+                                help="Maximum deviation of the times at which discrete columns change their values. "
+                                     "Default: 0")
     compare_parser.set_defaults(func=compare)
 
+    # mopyregtest run
+    run_parser = subparsers.add_parser("run", help="Run the tests of a test manifest")
+
+    # mopyregtest run [--workers WORKERS] manifest
+    run_parser.add_argument("manifest", type=str, help="Path of the test manifest .json file")
+    run_parser.add_argument("--workers", type=int,
+                            help="Number of processes running tests in parallel. If omitted, the number of CPUs is used")
+    run_parser.set_defaults(func=run)
+
     args = main_parser.parse_args(cmd_args)
     args.func(args)
 
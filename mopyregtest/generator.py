@@ -5,17 +5,35 @@ Copyright (c) Dr. Philipp Emanuel Stelzig, 2019--2023.
 
 MIT License. See the project's LICENSE file.
 """
+import concurrent.futures
+import hashlib
+import json
 import os.path
 import shutil
 import os
 import pathlib
 import tempfile
-import sys
+import subprocess
 
 from . import metrics
+from . import resultio
+from . import runner
 from . import utils
 from .modelicaregressiontest import RegressionTest
 
+
+class ReferenceGenerationError(RuntimeError):
+    """
+    Raised by Generator.generate_tests if generating the reference results failed for any model. The attribute
+    failures maps each failed model to the exception raised for it.
+    """
+
+    def __init__(self, failures, num_models):
+        self.failures = failures
+        super().__init__(f"Generating the reference results failed for {len(failures)} of {num_models} models: "
+                         f"{', '.join(failures.keys())}")
+
+
 class Generator:
     """
     Experimental
@@ -57,7 +75,8 @@ class Test$$CLASS_NAME$$(unittest.TestCase):
                                             model_in_package="$$MODEL_IN_PACKAGE$$",
                                             result_folder="$$RESULT_FOLDER$$",
                                             modelica_version="$$MODELICA_VERSION$$",
-                                            dependencies=$$DEPENDENCIES$$)
+                                            dependencies=$$DEPENDENCIES$$,
+                                            simulation_options=$$SIMULATION_OPTIONS$$)
     
         # Comparing results
         tester.compare_result(reference_result="$$REFERENCE_RESULT$$",
@@ -78,7 +97,8 @@ class Test$$CLASS_NAME$$(unittest.TestCase):
                                             model_in_package="$$MODEL_IN_PACKAGE$$",
                                             result_folder="$$RESULT_FOLDER$$",
                                             modelica_version="$$MODELICA_VERSION$$",
-                                            dependencies=$$DEPENDENCIES$$)
+                                            dependencies=$$DEPENDENCIES$$,
+                                            simulation_options=$$SIMULATION_OPTIONS$$)
     
         # Check that simulation completes successfully
         tester.check_success()
@@ -89,16 +109,38 @@ class Test$$CLASS_NAME$$(unittest.TestCase):
         return
         """
 
+    MANIFEST_SHIM = \
+        """
+# Test definitions are read from the test manifest next to this file. Run the manifest directly and in parallel with
+#
+#     mopyregtest run $$MANIFEST$$
+#
+import unittest
+import pathlib
+import mopyregtest
+
+Test$$CLASS_NAME$$ = mopyregtest.runner.make_test_case(pathlib.Path(__file__).absolute().parent / "$$MANIFEST$$",
+                                                     "Test$$CLASS_NAME$$")
+
+if __name__ == '__main__':
+    unittest.main()
+"""
+
     MAIN_STATEMENT = \
         """
 if __name__ == '__main__':
     unittest.main()        
         """
 
+    REFERENCES_MANIFEST = "references_manifest.json"
+
+    USED_CLASSES_MARKER = "mopyregtest_used_classes"
+
     def __init__(self, package_folder, models_in_package, modelica_version="default", dependencies=None,
                  mode="regression",
                  metric=metrics.norm_infty_dist,
-                 tol=1e-7, unify_timestamps=True, fill_in_method="ffill"):
+                 tol=1e-7, unify_timestamps=True, fill_in_method="ffill", simulation_options=None,
+                 reference_format="csv", reference_store=None, reference_store_link="pointer"):
         """
 
         Parameters
@@ -108,6 +150,7 @@ if __name__ == '__main__':
             file that instantiates a Generator class are possible.
         models_in_package : List[str]
             List of strings with Modelica names of elements in the library to be turned into regression tests.
+            Use Generator.discover_models to find all models with an experiment annotation in a package.
         modelica_version : str
             Modelica STL version as a string. Default value is "default"
         dependencies : None or List[str]
@@ -120,12 +163,14 @@ if __name__ == '__main__':
             builds, and simulates successfully, without any reference comparison.
         metric : function or str
             Metric to be used in result comparison. Important: If the metric is given as a funtion, one must use one
-            of the predefined metrics, i.e. mopyregtest.metrics.norm_p_dist, mopyregtest.metrics.norm_infty_dist,
-            mopyregtest.metrics.Lp_dist, mopyregtest.metrics.Linfty_dist, or mopyregtest.metrics.abs_dist_ptwise.
+            of the metrics registered in mopyregtest.metrics, see mopyregtest.metrics.metric_names(). Metrics
+            registered by the user with mopyregtest.metrics.register_metric must be registered as well when the
+            generated tests run.
 
             If a user-defined metric shall be used, the code must be passed as a string!
-        tol : float
-            Tolerance to be used in all regression tests.
+        tol : float or dict
+            Tolerance to be used in all regression tests. Per-column tolerances are given as a dict, see
+            RegressionTest.compare_result.
         unify_timestamps : bool
             Boolean controlling whether the timestamp unification shall be called in the RegressionTest.compare_result
             before evaluating the metric. Default=True.
@@ -141,6 +186,28 @@ if __name__ == '__main__':
             ffill and bfill are the forward fill and backward fill methods from
             pandas.DataFrame.fillna and "interpol" uses linear interpolation
             as in pandas.DataFrame.interpol
+        simulation_options : None or dict
+            Optional dictionary mapping models from models_in_package to their simulation options
+            (start_time, stop_time, tolerance, num_intervals, interval), e.g. as returned by
+            Generator.discover_models. These are used when generating reference results, and can be written into
+            the generated tests, such that the experiment annotation of these models need not be read again.
+        reference_format : str
+            Format in which reference results are stored. "csv" (default) for plain CSV files, "csv.gz", "csv.xz",
+            "csv.bz2" or "csv.zst" (requires the zstandard package) for compressed CSV files, and "npz" for binary
+            numpy files. Compressed and binary references are read transparently by RegressionTest.compare_result.
+
+            "fp.json" stores only a compact fingerprint of each reference (per-column min/max envelope over time
+            buckets, extrema, integrals and checksums), which is much smaller than the full result for large
+            results. Tests compare against the fingerprint with tol as bound, and the metric is not used then.
+        reference_store : None or str or PathLike
+            Optional folder of a content-addressed reference store. If given, reference results are stored there once
+            per distinct content, named by their hash, and the references folder of the generated tests only links
+            to them. This way, suites sharing identical references store them only once.
+        reference_store_link : str
+            How the references folder links to the reference store. "pointer" (default) writes small pointer files
+            <model>_res.<format>.ref containing the relative path to the stored file, which
+            RegressionTest.compare_result resolves. "hardlink" creates hardlinks with the usual reference file names,
+            which requires the store and the tests to be on the same file system.
         """
         self.package_folder = package_folder
         self.models_in_package = models_in_package
@@ -151,11 +218,15 @@ if __name__ == '__main__':
             raise ValueError(f"Invalid mode '{mode}'. Must be 'regression' or 'success'.")
         self.mode = mode
 
-        if (callable(metric) and
-                metric in [metrics.norm_p_dist, metrics.norm_infty_dist,
-                           metrics.Lp_dist, metrics.Linfty_dist,
-                           metrics.abs_dist_ptwise]):
-            self.metric = f"mopyregtest.metrics.{metric.__name__}"
+        info = metrics.get_metric_info(metric) if callable(metric) else None
+        # Name of a registered metric, which test manifests store instead of code
+        self.metric_name = None
+        if info is not None and info.func is metric:
+            self.metric_name = info.name
+            if getattr(metrics, info.name, None) is metric:
+                self.metric = f"mopyregtest.metrics.{info.name}"
+            else:
+                self.metric = f"mopyregtest.metrics.get_metric(\"{info.name}\")"
         elif type(metric) == str:
             self.metric = metric
         else:
@@ -163,9 +234,300 @@ if __name__ == '__main__':
         self.tol = tol
         self.unify_timestamps = unify_timestamps
         self.fill_in_method = fill_in_method
+        self.simulation_options = dict(simulation_options) if simulation_options else {}
+
+        if reference_format not in resultio.RESULT_FORMATS:
+            raise ValueError(f"Invalid reference_format '{reference_format}'. Must be one of {resultio.RESULT_FORMATS}.")
+        self.reference_format = reference_format
+
+        if reference_store_link not in ["pointer", "hardlink"]:
+            raise ValueError(f"Invalid reference_store_link '{reference_store_link}'. Must be 'pointer' or 'hardlink'.")
+        self.reference_store = reference_store
+        self.reference_store_link = reference_store_link
 
         return
 
+    def _reference_name(self, model_in_package):
+        return f"{model_in_package}_res.{self.reference_format}"
+
+    def _reference_test_name(self, model_in_package):
+        """
+        Name of the reference result file as used in the generated tests. This is a pointer file (.ref) if references
+        are kept in a reference store and linked by pointers.
+        """
+        name = self._reference_name(model_in_package)
+        if self.reference_store is not None and self.reference_store_link == "pointer":
+            name += resultio.POINTER_SUFFIX
+
+        return name
+
+    def _reference_exists(self, reference_folder, model_in_package):
+        ref = pathlib.Path(reference_folder) / self._reference_test_name(model_in_package)
+
+        return ref.exists() and resultio.resolve_result(ref).exists()
+
+    def _store_reference(self, reference_folder, model_in_package):
+        """
+        Moves the reference result of a model from the reference folder into the reference store, if one is used,
+        and replaces it by a pointer file or a hardlink to the stored file.
+        """
+        if self.reference_store is None:
+            return
+
+        reference_folder = pathlib.Path(reference_folder).absolute()
+        ref = reference_folder / self._reference_name(model_in_package)
+        blob = resultio.store_result(ref, pathlib.Path(os.path.expanduser(self.reference_store)).absolute())
+
+        if self.reference_store_link == "hardlink":
+            tmp_link = ref.with_name(ref.name + ".tmp")
+            try:
+                if tmp_link.exists():
+                    os.remove(tmp_link)
+                os.link(blob, tmp_link)
+                os.replace(tmp_link, ref)
+            except OSError as e:
+                print(f"Cannot hardlink {ref} to the reference store file {blob}: {e}. Keeping a copy.")
+
+            return
+
+        try:
+            target = pathlib.Path(os.path.relpath(blob, start=reference_folder))
+        except ValueError:  # E.g. on different drives on Windows
+            target = blob
+
+        with open(reference_folder / self._reference_test_name(model_in_package), 'w') as fhandle:
+            fhandle.write(target.as_posix() + "\n")
+        os.remove(ref)
+
+        return
+
+    def _package_folder_path(self):
+        return pathlib.Path(os.path.expanduser(self.package_folder)).absolute()
+
+    @staticmethod
+    def _run_tool_script(package_folder, modelica_version, dependencies, template, repl_dict, tool="omc"):
+        """
+        Fills in a script template for the package and runs it with the simulation tool in a temporary folder.
+
+        Parameters
+        ----------
+        package_folder : str or PathLike
+            Path to the package
+        modelica_version : str
+            Modelica STL version as a string
+        dependencies : None or List[str]
+            Paths of the .mo files the package depends on
+        template : str
+            Name of the template in the tool's template folder, e.g. "model_dependencies.mos.template"
+        repl_dict : dict
+            Replacements in addition to PACKAGE_FOLDER, RESULT_FOLDER, MODELICA_VERSION and DEPENDENCIES
+        tool : str
+            Simulation tool. The only valid tool right now is omc (OpenModelica Compiler).
+
+        Returns
+        -------
+        out : str
+            Standard output of the simulation tool
+        """
+        template_path = pathlib.Path(__file__).parent.absolute() / "templates" / tool / template
+        tmp_folder = pathlib.Path(tempfile.mkdtemp(prefix="mopyregtest_", dir=tempfile.gettempdir()))
+
+        try:
+            script = tmp_folder / template.replace(".template", "")
+            shutil.copy(template_path, script)
+
+            package_folder = pathlib.Path(os.path.expanduser(package_folder)).absolute()
+            script_repl_dict = {"PACKAGE_FOLDER": str(package_folder.as_posix()),
+                                "RESULT_FOLDER": str(tmp_folder.as_posix()),
+                                "MODELICA_VERSION": modelica_version,
+                                "DEPENDENCIES": RegressionTest._dependencies_load_str(dependencies)}
+            script_repl_dict.update(repl_dict)
+            utils.replace_in_file(script, script_repl_dict)
+
+            proc_return = subprocess.run([tool, script.name], cwd=tmp_folder, check=True, capture_output=True)
+        finally:
+            shutil.rmtree(tmp_folder, ignore_errors=True)
+
+        return proc_return.stdout.decode("utf-8")
+
+    @staticmethod
+    def discover_models(package_folder, root_class, modelica_version="default", dependencies=None,
+                        restrictions=("model", "block"), include_partial=False, require_experiment=True, tool="omc"):
+        """
+        Finds all models inside a class of a Modelica package that can be turned into regression tests, e.g. all
+        models with an experiment annotation in MyLib.Examples. The simulation tool is started only once for
+        loading the package and enumerating all classes recursively.
+
+        Parameters
+        ----------
+        package_folder : str or PathLike
+            Path to the package
+        root_class : str
+            Modelica name of the class whose elements shall be searched recursively, e.g. "MyLib.Examples"
+        modelica_version : str
+            Modelica STL version as a string. Default value is "default"
+        dependencies : None or List[str]
+            Optional list of paths of .mo files that the package depends on
+        restrictions : tuple
+            Class restrictions to be included. Default=("model", "block")
+        include_partial : bool
+            Whether partial classes shall be included. Default=False
+        require_experiment : bool
+            Whether only classes with an experiment annotation shall be included. Default=True
+        tool : str
+            Simulation tool. The only valid tool right now is omc (OpenModelica Compiler).
+
+        Returns
+        -------
+        out : dict
+            Maps the Modelica name of each model found to its simulation options
+            (start_time, stop_time, tolerance, num_intervals, interval), sorted by their Modelica names as enumerated
+            by the simulation tool, such that the order does not depend on the order of definition in the package
+        """
+        output = Generator._run_tool_script(package_folder, modelica_version, dependencies,
+                                            "package_discover.mos.template", {"ROOT_CLASS": root_class}, tool)
+
+        return Generator._parse_discovered_models(output, restrictions, include_partial, require_experiment)
+
+    @staticmethod
+    def _parse_discovered_models(output, restrictions=("model", "block"), include_partial=False,
+                                 require_experiment=True):
+        """
+        Parses the output of the class enumeration of the simulation tool, see Generator.discover_models
+        """
+        models = {}
+        for ln in output.splitlines():
+            fields = ln.strip().strip('"').split(";")
+            if fields[0] != "mopyregtest_class" or len(fields) != 10:
+                continue
+
+            (name, restriction, is_partial, is_experiment) = fields[1:5]
+            if restriction.strip().lower() not in restrictions:
+                continue
+            if is_partial.strip() == "true" and not include_partial:
+                continue
+            if is_experiment.strip() != "true" and require_experiment:
+                continue
+
+            models[name] = RegressionTest._parse_simulation_options(fields[5:])
+
+        return models
+
+    @staticmethod
+    def _tool_version(tool="omc"):
+        try:
+            proc_return = subprocess.run([tool, "--version"], check=True, capture_output=True)
+        except (subprocess.CalledProcessError, OSError):
+            return "unknown"
+
+        return proc_return.stdout.decode("utf-8").strip()
+
+    def _query_used_classes(self, models, tool="omc"):
+        """
+        Determines the classes used by each of the models, starting the simulation tool only once.
+
+        Returns
+        -------
+        out : dict
+            Maps each model to the list of names of the classes it uses. Models for which the simulation tool did not
+            report any class are missing.
+        """
+        queries = ""
+        for md in models:
+            queries += f"\"{Generator.USED_CLASSES_MARKER} {md}\";\n\ngetUsedClassNames({md});\n\n"
+
+        output = Generator._run_tool_script(self.package_folder, self.modelica_version, self.dependencies,
+                                            "model_dependencies.mos.template", {"USED_CLASS_QUERIES": queries}, tool)
+
+        return Generator._parse_used_classes(output)
+
+    @staticmethod
+    def _parse_used_classes(output):
+        used_classes = {}
+        lines = [ln.strip() for ln in output.splitlines() if ln.strip()]
+        for i in range(0, len(lines) - 1):
+            if not lines[i].startswith(f"\"{Generator.USED_CLASSES_MARKER} "):
+                continue
+
+            md = lines[i].strip('"').split(" ", 1)[1]
+            classes = [c.strip() for c in lines[i + 1].lstrip("{").rstrip("}").split(",") if c.strip()]
+            if classes and lines[i + 1].startswith("{"):
+                used_classes[md] = classes
+
+        return used_classes
+
+    @staticmethod
+    def _class_source_files(package_folder, class_name):
+        """
+        Returns the source files of the package in package_folder that contribute to the definition of class_name,
+        i.e. the file defining the class and the package.mo files of all enclosing packages.
+        """
+        package_folder = pathlib.Path(package_folder)
+        files = [package_folder / "package.mo"]
+
+        folder = package_folder
+        for name in class_name.split(".")[1:]:
+            if (folder / name / "package.mo").is_file():
+                folder = folder / name
+                files.append(folder / "package.mo")
+            elif (folder / f"{name}.mo").is_file():
+                files.append(folder / f"{name}.mo")
+                break
+            else:
+                break
+
+        return files
+
+    def _reference_inputs(self, models, tool="omc"):
+        """
+        Collects the inputs that determine the reference result of each model: the hashes of the package source
+        files used by the model, the hashes of the dependencies, the Modelica version and the tool version.
+
+        If the classes used by a model cannot be determined, all source files of the package are taken as inputs.
+
+        Returns
+        -------
+        out : dict
+            Maps each model to a dictionary describing its inputs. Its entry "inputs" is a hash over all inputs.
+        """
+        package_folder = self._package_folder_path()
+        file_hashes = {}
+
+        def _hash(f):
+            if f not in file_hashes:
+                file_hashes[f] = utils.hash_file(f).hexdigest()
+            return file_hashes[f]
+
+        try:
+            used_classes = self._query_used_classes(models, tool)
+        except (subprocess.CalledProcessError, OSError):
+            used_classes = {}
+
+        dependencies = {str(d): _hash(pathlib.Path(d)) if pathlib.Path(d).is_file() else None
+                        for d in (self.dependencies or [])}
+        tool_version = Generator._tool_version(tool)
+
+        reference_inputs = {}
+        for md in models:
+            top_package = md.split(".")[0]
+            if md in used_classes:
+                files = set()
+                for c in used_classes[md] + [md]:
+                    if c.split(".")[0] == top_package:
+                        files.update(Generator._class_source_files(package_folder, c))
+            else:
+                files = set(package_folder.rglob("*.mo"))
+
+            entry = {"files": {f.relative_to(package_folder).as_posix(): _hash(f) for f in sorted(files) if f.is_file()},
+                     "dependencies": dependencies,
+                     "modelica_version": self.modelica_version,
+                     "tool": tool,
+                     "tool_version": tool_version}
+            entry["inputs"] = hashlib.sha256(json.dumps(entry, sort_keys=True).encode("utf-8")).hexdigest()
+            reference_inputs[md] = entry
+
+        return reference_inputs
+
     def _generate_reference(self, reference_folder, model_in_package, tool="omc", do_cleanup=False):
         """
         Generates missing reference results for a Modelica model using the specified tool. Note that this requires
@@ -185,8 +547,9 @@ if __name__ == '__main__':
             Whether to clean up the files generated during simulation (e.g. code and generated binaries)
         Returns
         -------
-        out : str
-            Complete path of the reference result generated
+        out : tuple
+            Simulation options (start_time, stop_time, tolerance, num_intervals, interval) used to generate the
+            reference result
 
         """
         tmp_res_folder = tempfile.mkdtemp(prefix=model_in_package, dir=tempfile.gettempdir())
@@ -196,34 +559,82 @@ if __name__ == '__main__':
                                  model_in_package=model_in_package,
                                  result_folder=tmp_res_folder, tool=tool,
                                  modelica_version=self.modelica_version,
-                                 dependencies=self.dependencies)
+                                 dependencies=self.dependencies,
+                                 simulation_options=self.simulation_options.get(model_in_package))
 
+        # Restore the working directory also if the simulation fails, such that other models can be simulated
+        cwd = os.getcwd()
         try:
             regtest._import_and_simulate()
-        except Exception as e:
-            print(f"Failed to generate the test:\n\n{e}\n\n")
-            print("Aborting test generation.")
-            sys.exit(1)
+        finally:
+            os.chdir(cwd)
 
         # Copy reference result file from temporary folder into reference target folder
-        res_file = f"{model_in_package}_res.csv"
-        ref_src = pathlib.Path(tmp_res_folder) / res_file
-        ref_dst = pathlib.Path(reference_folder) / res_file
+        ref_src = pathlib.Path(tmp_res_folder) / f"{model_in_package}_res.csv"
+        ref_dst = pathlib.Path(reference_folder) / self._reference_name(model_in_package)
 
         if ref_dst.exists():
             os.remove(ref_dst)
 
-        shutil.copyfile(ref_src, ref_dst)
+        resultio.convert_result(ref_src, ref_dst)
 
         # Cleanup temporary directory with simulation data
         if do_cleanup:
             shutil.rmtree(tmp_res_folder)
 
-        return
+        return regtest.used_simulation_options
+
+    def _generate_references(self, reference_folder, models, num_workers=1, do_cleanup=False):
+        """
+        Generates the reference results for several Modelica models, possibly in parallel processes. Failing models
+        do not stop the generation of the reference results for the other models.
+
+        Parameters
+        ----------
+        reference_folder : str or PathLike
+            Folder where to store the reference results
+        models : List[str]
+            Modelica model names for which to generate the reference results
+        num_workers : None or int
+            Number of worker processes. If None, the number of CPUs is used. If 1, all reference results are
+            generated sequentially in the current process.
+        do_cleanup : bool
+            Whether to clean up the files generated during simulation (e.g. code and generated binaries)
+
+        Returns
+        -------
+        out : tuple
+            Pair (simulation_options, failures) of dictionaries. simulation_options maps each successfully
+            simulated model to the simulation options used, failures maps each failed model to the exception raised.
+        """
+        simulation_options = {}
+        failures = {}
+
+        if num_workers == 1 or len(models) <= 1:
+            for md in models:
+                try:
+                    simulation_options[md] = self._generate_reference(reference_folder=reference_folder,
+                                                                      model_in_package=md, do_cleanup=do_cleanup)
+                except Exception as e:
+                    failures[md] = e
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=num_workers) as executor:
+                futures = {md: executor.submit(self._generate_reference, reference_folder=reference_folder,
+                                               model_in_package=md, do_cleanup=do_cleanup)
+                           for md in models}
+
+                for md, future in futures.items():
+                    try:
+                        simulation_options[md] = future.result()
+                    except Exception as e:
+                        failures[md] = e
+
+        return simulation_options, failures
 
     def generate_tests(self, test_folder, test_name, test_results_folder,
                        references=None, generate_missing_refs=True,
-                       cleanup_ref_gen=False, cleanup_in_tests=False):
+                       cleanup_ref_gen=False, cleanup_in_tests=False, bake_simulation_options=False,
+                       num_workers=1, incremental=False, output_format="unittest"):
         """
         Generates the test for the library elements specified in the constructor. All tests will be included in one
         single test class. For every library element an individual test method will be generated in the test class.
@@ -252,12 +663,41 @@ if __name__ == '__main__':
             Whether to clean up intermediate simulation files from generating reference results.
         cleanup_in_tests : bool
             Whether result files shall be cleaned up once the generated tests are actually run.
+        bake_simulation_options : bool
+            Whether the simulation options (start_time, stop_time, tolerance, num_intervals, interval) used for
+            generating a reference result shall be written into the generated test. The generated test then does not
+            need to read the experiment annotation of the model, which saves one start of the simulation tool per test.
+            Only applies to models for which the reference result is generated or whose simulation options were
+            passed to the constructor. Default=False.
+        num_workers : None or int
+            Number of processes used to generate missing reference results in parallel. If None, the number of CPUs
+            is used. Default=1. Note that on Windows, scripts using more than one worker must guard their main code
+            with if __name__ == "__main__".
+
+            If generating the reference result fails for any model, the errors of all failed models are reported
+            after all reference results have been attempted, no test definition is written, and a
+            ReferenceGenerationError with the failures of all models is raised.
+        incremental : bool
+            Whether to only generate reference results whose inputs changed since they were last generated. The
+            inputs of every generated reference result, i.e. hashes of the package source files the model uses, of
+            the dependencies, the Modelica version and the tool version, are recorded in the file
+            references/references_manifest.json. Existing reference results whose recorded inputs match the current
+            ones are left untouched. Default=False.
+        output_format : str
+            "unittest" (default) writes one test method per model into test_<test_name>.py. "manifest" writes the
+            tests as a compact manifest test_<test_name>.json, which can be run in parallel with
+            mopyregtest.runner.run_manifest or the CLI command "mopyregtest run", plus a small test_<test_name>.py
+            that creates the unittest test methods from the manifest. Relative paths in the manifest, including
+            test_results_folder, are relative to test_folder.
 
         Returns
         -------
         out : None
 
         """
+        if output_format not in ["unittest", "manifest"]:
+            raise ValueError(f"Invalid output_format '{output_format}'. Must be 'unittest' or 'manifest'.")
+
         # Creating the target folder where the MoPyRegtest test definition shall be created
         test_folder = pathlib.Path(test_folder)
         if not test_folder.exists():
@@ -267,6 +707,77 @@ if __name__ == '__main__':
             if not (test_folder / "references").exists():
                 (test_folder / "references").mkdir()
 
+        # Providing the reference results, generating missing ones first
+        simulation_options = dict(self.simulation_options)
+        if self.mode == "regression":
+            missing_refs = [md for md in self.models_in_package
+                            if (references is None or md not in references.keys())]
+
+            if generate_missing_refs and missing_refs:
+                refs_to_generate = missing_refs
+                if incremental:
+                    manifest_path = test_folder / "references" / Generator.REFERENCES_MANIFEST
+                    manifest = utils.read_json(manifest_path) or {}
+                    reference_inputs = self._reference_inputs(missing_refs)
+
+                    refs_to_generate = [md for md in missing_refs
+                                        if md not in manifest
+                                        or manifest[md].get("inputs") != reference_inputs[md]["inputs"]
+                                        or not self._reference_exists(test_folder / "references", md)]
+                    print(f"Reference results of {len(missing_refs) - len(refs_to_generate)} of {len(missing_refs)} "
+                          f"models are up to date")
+
+                    for md in missing_refs:
+                        if md not in refs_to_generate and manifest[md].get("simulation_options") is not None:
+                            simulation_options[md] = tuple(manifest[md]["simulation_options"])
+
+                generated_options, failures = self._generate_references(reference_folder=test_folder / "references",
+                                                                        models=refs_to_generate,
+                                                                        num_workers=num_workers,
+                                                                        do_cleanup=cleanup_ref_gen)
+                simulation_options.update(generated_options)
+
+                for md in generated_options.keys():
+                    self._store_reference(test_folder / "references", md)
+
+                if incremental:
+                    for md, options in generated_options.items():
+                        manifest[md] = dict(reference_inputs[md], simulation_options=list(options))
+                    utils.write_json_atomic(manifest_path, manifest)
+
+                if failures:
+                    for md, e in failures.items():
+                        print(f"Failed to generate the test for {md}:\n\n{e}\n\n")
+                    raise ReferenceGenerationError(failures, len(refs_to_generate))
+
+            for md in self.models_in_package:
+                if references is not None and md in references.keys():
+                    ref_dst = test_folder / "references" / self._reference_name(md)
+                    if ref_dst.exists():
+                        os.remove(ref_dst)  # Never write through a hardlink into the reference store
+
+                    resultio.convert_result(references[md], ref_dst)
+                    self._store_reference(test_folder / "references", md)
+
+        # If the package path is relative, compute its relative path to the target test folder
+        if not pathlib.PurePath(test_folder).is_absolute():
+            test_folder_abs = pathlib.Path.cwd().absolute() / test_folder
+        else:
+            test_folder_abs = test_folder
+
+        if not pathlib.PurePath(self.package_folder).is_absolute():
+            package_folder_abs = pathlib.Path.cwd().absolute() / self.package_folder
+            package_folder = os.path.relpath(package_folder_abs, start=test_folder_abs)
+            package_folder = pathlib.Path(package_folder)
+        else:
+            package_folder = pathlib.Path(self.package_folder)
+
+        if output_format == "manifest":
+            self._write_manifest(test_folder, test_name, test_results_folder, package_folder,
+                                 simulation_options if bake_simulation_options else {}, cleanup_in_tests)
+
+            return
+
         # Creating the MoPyRegtest test definition
         tfile = open(pathlib.Path(test_folder) / f"test_{test_name.lower()}.py", 'w')
         tfile.truncate()
@@ -275,26 +786,7 @@ if __name__ == '__main__':
 
         # Creating a test method for every element in self.models_in_package
         for md in self.models_in_package:
-            if self.mode == "regression":
-                r_ref_relpath = f"references/{md}_res.csv"
-                if (references is None or md not in references.keys()) and generate_missing_refs:
-                    self._generate_reference(reference_folder=test_folder / "references",
-                                             model_in_package=md, do_cleanup=cleanup_ref_gen)
-                else:
-                    shutil.copyfile(references[md], str(test_folder / r_ref_relpath))
-
-            # If the package path is relative, compute its relative path to the target test folder
-            if not pathlib.PurePath(test_folder).is_absolute():
-                test_folder_abs = pathlib.Path.cwd().absolute() / test_folder
-            else:
-                test_folder_abs = test_folder
-
-            if not pathlib.PurePath(self.package_folder).is_absolute():
-                package_folder_abs = pathlib.Path.cwd().absolute() / self.package_folder
-                package_folder = os.path.relpath(package_folder_abs, start=test_folder_abs)
-                package_folder = pathlib.Path(package_folder)
-            else:
-                package_folder = pathlib.Path(self.package_folder)
+            r_ref_relpath = f"references/{self._reference_test_name(md)}"
 
             dependencies_str = "None" if self.dependencies is None else "[{}]".format(",".join(self.dependencies))
             repl_dict = {
@@ -304,6 +796,7 @@ if __name__ == '__main__':
                 "$$RESULT_FOLDER$$": str(pathlib.Path(test_results_folder).as_posix()),
                 "$$MODELICA_VERSION$$": self.modelica_version,
                 "$$DEPENDENCIES$$": dependencies_str,
+                "$$SIMULATION_OPTIONS$$": str(simulation_options.get(md)) if bake_simulation_options else "None",
                 "$$DO_CLEANUP$$": "" if cleanup_in_tests else "#"
             }
 
@@ -326,3 +819,46 @@ if __name__ == '__main__':
 
         return
 
+    def _write_manifest(self, test_folder, test_name, test_results_folder, package_folder, simulation_options,
+                        cleanup_in_tests):
+        """
+        Writes the tests as a compact test manifest test_<test_name>.json, together with a test definition
+        test_<test_name>.py that creates one unittest test method per entry of the manifest.
+        """
+        defaults = {"mode": self.mode, "cleanup": cleanup_in_tests}
+        if self.mode == "regression":
+            if self.metric_name is not None:
+                defaults["metric"] = self.metric_name
+            else:
+                defaults["metric_code"] = self.metric
+            defaults.update({"tol": self.tol, "unify_timestamps": self.unify_timestamps,
+                             "fill_in_method": self.fill_in_method})
+
+        tests = []
+        for md in self.models_in_package:
+            test = {"name": md.lower().replace(".", "_"), "model_in_package": md}
+            if self.mode == "regression":
+                test["reference_result"] = f"references/{self._reference_test_name(md)}"
+            if simulation_options.get(md) is not None:
+                test["simulation_options"] = list(simulation_options[md])
+            tests.append(test)
+
+        manifest = {"format": runner.MANIFEST_FORMAT,
+                    "version": runner.MANIFEST_VERSION,
+                    "package_folder": str(package_folder.as_posix()),
+                    "modelica_version": self.modelica_version,
+                    "dependencies": self.dependencies,
+                    "result_folder": str(pathlib.Path(test_results_folder).as_posix()),
+                    "defaults": defaults,
+                    "tests": tests}
+
+        manifest_name = f"test_{test_name.lower()}.json"
+        with open(pathlib.Path(test_folder) / manifest_name, 'w') as fhandle:
+            json.dump(manifest, fhandle, indent=1)
+
+        with open(pathlib.Path(test_folder) / f"test_{test_name.lower()}.py", 'w') as fhandle:
+            fhandle.write(utils.replace_in_str(Generator.MANIFEST_SHIM, {"$$CLASS_NAME$$": test_name,
+                                                                         "$$MANIFEST$$": manifest_name}))
+
+        return
+
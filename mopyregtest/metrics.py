@@ -6,6 +6,9 @@ Copyright (c) Dr. Philipp Emanuel Stelzig, 2019--2023.
 MIT License. See the project's LICENSE file.
 """
 
+import collections
+import functools
+
 import numpy as np
 
 
@@ -111,6 +114,206 @@ def Linfty_dist(f1, f2):
     return Linfty_norm(np.vstack((f1[:, 0], f2[:, 1] - f1[:, 1])).transpose())
 
 
+def _check_grid_funcs(f1, f2):
+    for f in [f1, f2]:
+        msg = _check_piecewise_func(f)
+        if msg is not None:
+            raise ValueError(msg)
+
+    x_start = max(f1[0, 0], f2[0, 0])
+    x_stop = min(f1[-1, 0], f2[-1, 0])
+    if x_start >= x_stop:
+        raise ValueError(f"The abscissae of f1 and f2 must overlap but are [{f1[0, 0]}, {f1[-1, 0]}] and "
+                         f"[{f2[0, 0]}, {f2[-1, 0]}]")
+
+    # Merged breakpoints of both functions on their common domain
+    x = np.union1d(f1[:, 0], f2[:, 0])
+
+    return x[(x >= x_start) & (x <= x_stop)]
+
+
+def _eval_piecewise_constant(f, x):
+    """
+    Evaluates the right-continuous piecewise constant function f at x. At abscissae occurring multiple times in f,
+    i.e. at events, the last value is used.
+    """
+    return f[np.searchsorted(f[:, 0], x, side="right") - 1, 1]
+
+
+def _eval_piecewise_linear(f, x, side):
+    """
+    Evaluates the right limits (side="right") or left limits (side="left") of the piecewise linear interpolation of f
+    at x. At events, the right limit is the last value and the left limit is the first value at the event.
+    """
+    xf = f[:, 0]
+    yf = f[:, 1]
+
+    if side == "right":
+        i = np.clip(np.searchsorted(xf, x, side="right") - 1, 0, len(xf) - 2)
+        at_breakpoint = xf[i] == x
+    else:
+        i = np.clip(np.searchsorted(xf, x, side="left") - 1, 0, len(xf) - 2)
+        at_breakpoint = xf[i + 1] == x
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        interpolated = yf[i] + (x - xf[i]) / (xf[i + 1] - xf[i]) * (yf[i + 1] - yf[i])
+
+    if side == "right":
+        return np.where(at_breakpoint, yf[i], interpolated)
+
+    return np.where(at_breakpoint, yf[i + 1], interpolated)
+
+
+def Lp_dist_grid(f1, f2, p: int = 2):
+    r"""
+    Computes the :math:`L^p` distance of the piecewise constant functions f1 and f2 like Lp_dist, but f1 and f2 may be
+    given on different abscissae. The distance is computed exactly in a single sweep over the merged breakpoints of
+    f1 and f2 on their common domain, so the timestamps of both need not be unified before.
+    """
+    x = _check_grid_funcs(f1, f2)
+    delta = _eval_piecewise_constant(f2, x[:-1]) - _eval_piecewise_constant(f1, x[:-1])
+
+    return np.sum(np.diff(x) * np.abs(delta) ** p) ** (1 / p)
+
+
+def Linfty_dist_grid(f1, f2):
+    r"""
+    Computes the :math:`L^\infty` distance of the piecewise constant functions f1 and f2 like Linfty_dist, but f1 and
+    f2 may be given on different abscissae. The maximum is taken over the merged breakpoints of f1 and f2 on their
+    common domain, so the timestamps of both need not be unified before.
+
+    At events, i.e. abscissae occurring multiple times, only the last value is used, since all other values are
+    attained on intervals of length zero.
+    """
+    x = _check_grid_funcs(f1, f2)
+
+    return np.max(np.abs(_eval_piecewise_constant(f2, x) - _eval_piecewise_constant(f1, x)))
+
+
+def L2_dist_interp(f1, f2):
+    r"""
+    Computes the :math:`L^2` distance of the piecewise linear interpolations of f1 and f2, which may be given on
+    different abscissae. At abscissae occurring multiple times, i.e. at events, the interpolations jump.
+
+    On every interval :math:`[x_k, x_{k+1}]` between merged breakpoints, the difference d is linear, so its squared
+    integral is exactly :math:`(x_{k+1} - x_k) (d_k^2 + d_k d_{k+1} + d_{k+1}^2) / 3`, with :math:`d_k` and
+    :math:`d_{k+1}` the right and left limits of d at the interval's ends.
+    """
+    x = _check_grid_funcs(f1, f2)
+
+    d_start = _eval_piecewise_linear(f2, x[:-1], "right") - _eval_piecewise_linear(f1, x[:-1], "right")
+    d_stop = _eval_piecewise_linear(f2, x[1:], "left") - _eval_piecewise_linear(f1, x[1:], "left")
+
+    return np.sqrt(np.sum(np.diff(x) * (d_start ** 2 + d_start * d_stop + d_stop ** 2) / 3))
+
+
+def _sliding_extrema(y, lo, hi):
+    """
+    Computes the minimum and maximum of the rows lo[i] to hi[i] (inclusive) of y for every i. Tables of the extrema
+    over 2^k consecutive rows are built level by level, and every window is answered from two overlapping blocks of
+    the largest level fitting into it, i.e. in O(N log W) operations for windows of at most W rows, vectorized over
+    all rows and columns.
+    """
+    length = hi - lo + 1
+    level = np.floor(np.log2(length)).astype(np.int64)
+
+    lower = np.empty((len(lo), y.shape[1]))
+    upper = np.empty((len(lo), y.shape[1]))
+    block_min = y.copy()
+    block_max = y.copy()
+    for k in range(0, int(np.max(level, initial=0)) + 1):
+        rows = np.flatnonzero(level == k)
+        if len(rows) > 0:
+            second = hi[rows] - 2 ** k + 1
+            lower[rows] = np.minimum(block_min[lo[rows]], block_min[second])
+            upper[rows] = np.maximum(block_max[lo[rows]], block_max[second])
+
+        # Extrema over 2^(k+1) rows from two blocks of 2^k rows
+        shift = 2 ** k
+        block_min[:-shift] = np.minimum(block_min[:-shift], block_min[shift:])
+        block_max[:-shift] = np.maximum(block_max[:-shift], block_max[shift:])
+
+    return lower, upper
+
+
+def tube_envelope(f, x=None, x_width=None, y_width=None, rel_width=0.002):
+    """
+    Computes the tube around the reference f as in the csv-compare tool of the Modelica community. At an abscissa x,
+    the lower and upper bound of the tube are the minimum and maximum of the linear interpolation of f over
+    [x - x_width, x + x_width], decreased and increased by y_width.
+
+    Parameters
+    ----------
+    f : np.ndarray
+        Array of shape (N, 1 + k) with the abscissae in the first column and k variables in the other columns, for
+        which the tubes are computed at once
+    x : None or np.ndarray
+        Sorted abscissae at which the bounds are computed. If None, the abscissae of f are used.
+    x_width : None or float
+        Horizontal half width of the tube. If None, rel_width times the length of the abscissa range is used.
+    y_width : None or float or np.ndarray
+        Vertical half width of the tube, per variable if an array is given. If None, rel_width times the value range
+        of each variable is used, or rel_width times its absolute maximum (at least 1) if it is constant.
+    rel_width : float
+        Relative width of the tube used if x_width or y_width are not given
+
+    Returns
+    -------
+    out : (np.ndarray, np.ndarray)
+        Lower and upper bounds of shape (len(x), k)
+    """
+    msg = _check_piecewise_func(f[:, 0:2])
+    if msg is not None:
+        raise ValueError(msg)
+
+    x_ref = f[:, 0]
+    y_ref = f[:, 1:]
+    if x is None:
+        x = x_ref
+
+    if x_width is None:
+        x_width = rel_width * (x_ref[-1] - x_ref[0])
+
+    if y_width is None:
+        y_range = np.max(y_ref, axis=0) - np.min(y_ref, axis=0)
+        y_width = rel_width * np.where(y_range > 0, y_range, np.maximum(np.max(np.abs(y_ref), axis=0), 1.0))
+
+    # Extrema of the reference samples within the windows. Windows may contain no sample at all.
+    lo = np.searchsorted(x_ref, x - x_width, side="left")
+    hi = np.searchsorted(x_ref, x + x_width, side="right") - 1
+    empty = hi < lo
+    lower, upper = _sliding_extrema(y_ref, np.where(empty, 0, lo), np.where(empty, 0, hi))
+    lower[empty] = np.inf
+    upper[empty] = -np.inf
+
+    # The interpolated reference attains its extrema over a window at samples or at the window's ends
+    for j in range(0, y_ref.shape[1]):
+        for x_end in [x - x_width, x + x_width]:
+            y_end = np.interp(x_end, x_ref, y_ref[:, j])
+            lower[:, j] = np.minimum(lower[:, j], y_end)
+            upper[:, j] = np.maximum(upper[:, j], y_end)
+
+    return lower - y_width, upper + y_width
+
+
+def tube_dist(f1, f2, x_width=None, y_width=None, rel_width=0.002):
+    """
+    Localized distance of f2 from the tube around the reference f1, see tube_envelope. Returns an array of shape
+    (M, 2) with the abscissae of f2 and the distance of f2 outside of the tube, which is 0 where f2 is inside. The
+    tube is evaluated at the abscissae of f2, so f1 and f2 need not have the same abscissae.
+
+    Arrays of shape (N, 1 + k) and (M, 1 + k) compare k variables at once, and the result has shape (M, 1 + k).
+
+    Use functools.partial to set the tube widths, e.g. metric=functools.partial(tube_dist, rel_width=0.01).
+    """
+    lower, upper = tube_envelope(f1, f2[:, 0], x_width, y_width, rel_width)
+
+    y = f2[:, 1:]
+    delta = np.maximum(np.maximum(lower - y, y - upper), 0.0)
+
+    return np.hstack((f2[:, 0:1], delta))
+
+
 def func_ptwise(f1, f2, dist: callable):
     _check_comparability(f1, f2)
 
@@ -120,4 +323,343 @@ def func_ptwise(f1, f2, dist: callable):
 
 
 def abs_dist_ptwise(f1, f2):
-    return func_ptwise(f1, f2, np.abs)
\ No newline at end of file
+    return func_ptwise(f1, f2, np.abs)
+
+
+def _value_changes(f):
+    """
+    Returns the abscissae at which the value of the discrete function f changes and the new values
+    """
+    idx = np.flatnonzero(f[1:, 1] != f[:-1, 1]) + 1
+
+    return f[idx, 0], f[idx, 1]
+
+
+def event_time_dist(f1, f2):
+    """
+    Distance of two discrete, i.e. Integer or Boolean, functions, which may be given on different abscissae: the
+    maximum deviation of the abscissae at which their values change, or np.inf if they do not take the same sequence
+    of values. Identical functions have distance 0.
+    """
+    if len(f1) == 0 or len(f2) == 0:
+        return 0.0 if len(f1) == len(f2) else np.inf
+
+    if f1[0, 1] != f2[0, 1]:
+        return np.inf
+
+    x1, y1 = _value_changes(f1)
+    x2, y2 = _value_changes(f2)
+    if len(y1) != len(y2) or np.any(y1 != y2):
+        return np.inf
+
+    return float(np.max(np.abs(x1 - x2), initial=0.0))
+
+
+class MetricAccumulator:
+    """
+    Base class of accumulators, which compute a metric chunk by chunk over the rows of two results with matching
+    abscissae. The result is the same as evaluating the metric once on the complete results.
+
+    Chunks are passed to update in the order of their abscissae. Accumulators for disjoint consecutive ranges of
+    rows, e.g. computed in parallel, are combined with merge, which expects the other accumulator to hold the later
+    rows.
+
+    The arguments f1 and f2 of update are arrays of shape (N, 1 + k), where the first column contains the abscissae
+    and the other k columns contain the values of k variables, for which the metric is computed at once. finalize
+    returns a scalar if k = 1, as the metric function itself, and an array of k values otherwise.
+    """
+
+    def __init__(self):
+        self.num_cols = None
+
+    def update(self, f1, f2):
+        _check_comparability(f1, f2)
+
+        if self.num_cols is None:
+            self.num_cols = f1.shape[1] - 1
+            self._init_state(self.num_cols)
+
+        if f1.shape[0] > 0:
+            self._update(f1[:, 0], f2[:, 1:] - f1[:, 1:])
+
+        return self
+
+    def merge(self, other):
+        if other.num_cols is None:
+            return self
+
+        if self.num_cols is None:
+            self.num_cols = other.num_cols
+            self._init_state(self.num_cols)
+
+        self._merge(other)
+
+        return self
+
+    def finalize(self):
+        if self.num_cols is None:
+            raise ValueError("The accumulator has not been updated with any data")
+
+        r = self._finalize()
+
+        return r[0] if self.num_cols == 1 else r
+
+    def _init_state(self, num_cols):
+        raise NotImplementedError
+
+    def _update(self, x, delta):
+        raise NotImplementedError
+
+    def _merge(self, other):
+        raise NotImplementedError
+
+    def _finalize(self):
+        raise NotImplementedError
+
+
+class NormPDistAccumulator(MetricAccumulator):
+    r"""
+    Accumulator for norm_p_dist, i.e. :math:`(\sum_i |f_2(x_i) - f_1(x_i)|^p)^{1/p}`
+    """
+
+    def __init__(self, p: int = 2):
+        super().__init__()
+        self.p = p
+
+    def _init_state(self, num_cols):
+        self.sum = np.zeros(num_cols)
+
+    def _update(self, x, delta):
+        self.sum += np.sum(np.abs(delta) ** self.p, axis=0)
+
+    def _merge(self, other):
+        self.sum += other.sum
+
+    def _finalize(self):
+        return self.sum ** (1 / self.p)
+
+
+class NormInftyDistAccumulator(MetricAccumulator):
+    r"""
+    Accumulator for norm_infty_dist, i.e. :math:`\max_i |f_2(x_i) - f_1(x_i)|`
+    """
+
+    def _init_state(self, num_cols):
+        self.max = np.zeros(num_cols)
+
+    def _update(self, x, delta):
+        self.max = np.maximum(self.max, np.max(np.abs(delta), axis=0))
+
+    def _merge(self, other):
+        self.max = np.maximum(self.max, other.max)
+
+    def _finalize(self):
+        return self.max
+
+
+class LinftyDistAccumulator(NormInftyDistAccumulator):
+    """
+    Accumulator for Linfty_dist, which coincides with norm_infty_dist on matching abscissae
+    """
+    pass
+
+
+class LpDistAccumulator(MetricAccumulator):
+    r"""
+    Accumulator for Lp_dist, i.e. :math:`(\sum_{i<N} (x_{i+1} - x_i) |f_2(x_i) - f_1(x_i)|^p)^{1/p}`
+
+    As the weight of the last row of a chunk depends on the first abscissa of the next chunk, the first and last rows
+    are kept in the state.
+    """
+
+    def __init__(self, p: int = 2):
+        super().__init__()
+        self.p = p
+
+    def _init_state(self, num_cols):
+        self.sum = np.zeros(num_cols)
+        self.first = None
+        self.last = None
+
+    def _update(self, x, delta):
+        if self.last is not None:
+            x = np.concatenate(([self.last[0]], x))
+            delta = np.vstack((self.last[1], delta))
+        else:
+            self.first = (x[0], delta[0])
+
+        self.sum += np.sum(np.diff(x)[:, np.newaxis] * np.abs(delta[:-1]) ** self.p, axis=0)
+        self.last = (x[-1], delta[-1])
+
+    def _merge(self, other):
+        if other.first is None:
+            return
+
+        if self.last is None:
+            self.first = other.first
+        else:
+            self.sum += (other.first[0] - self.last[0]) * np.abs(self.last[1]) ** self.p
+
+        self.sum += other.sum
+        self.last = other.last
+
+    def _finalize(self):
+        return self.sum ** (1 / self.p)
+
+
+class AbsDistPtwiseAccumulator(MetricAccumulator):
+    """
+    Accumulator for abs_dist_ptwise. As the metric is localized, the pointwise deviations of all chunks are kept and
+    finalize returns the complete timeseries of deviations, or a list of such timeseries for several variables.
+    """
+
+    def _init_state(self, num_cols):
+        self.chunks = []
+
+    def _update(self, x, delta):
+        self.chunks.append(np.hstack((x[:, np.newaxis], np.abs(delta))))
+
+    def _merge(self, other):
+        self.chunks.extend(other.chunks)
+
+    def _finalize(self):
+        if self.chunks:
+            data = np.vstack(self.chunks)
+        else:
+            data = np.zeros((0, self.num_cols + 1))
+
+        return [data[:, [0, j + 1]] for j in range(0, self.num_cols)]
+
+
+MetricInfo = collections.namedtuple("MetricInfo", ["name", "func", "needs_unified_timestamps", "batched",
+                                                 "accumulator", "localized"])
+MetricInfo.__doc__ = """
+Properties of a registered metric, which the comparison engine uses to choose the fastest way of evaluating it.
+
+name : str
+    Stable name of the metric, e.g. used in generated tests and on the command line
+func : Callable
+    The metric function
+needs_unified_timestamps : bool
+    False if the metric compares results with different timestamps, such that timestamp unification can be skipped
+batched : bool
+    True if the metric accepts arrays of shape (N, 1 + k) and evaluates k variables at once
+accumulator : None or type
+    Subclass of MetricAccumulator computing the metric chunk by chunk, or None
+localized : bool
+    True if the metric returns a timeseries of deviations, False if it returns a scalar
+"""
+
+_REGISTRY = collections.OrderedDict()
+
+
+def register_metric(func, name=None, needs_unified_timestamps=True, batched=False, accumulator=None, localized=False):
+    """
+    Registers a metric with its properties, see MetricInfo. Registered metrics can be looked up by name with
+    get_metric, which is also how the Generator and the command line interface refer to them. A metric registered
+    again under the same name replaces the previous one.
+
+    Returns
+    -------
+    out : MetricInfo
+    """
+    if name is None:
+        name = func.__name__
+
+    info = MetricInfo(name, func, needs_unified_timestamps, batched, accumulator, localized)
+    _REGISTRY[name] = info
+
+    return info
+
+
+def metric_names():
+    """
+    Returns the names of all registered metrics
+    """
+    return list(_REGISTRY.keys())
+
+
+def get_metric(name):
+    """
+    Returns the registered metric function with the given name. Raises a ValueError for unknown names.
+    """
+    if name not in _REGISTRY:
+        raise ValueError(f"Invalid value for metric: {name}. Must be one of {metric_names()}")
+
+    return _REGISTRY[name].func
+
+
+def get_metric_info(metric):
+    """
+    Returns the MetricInfo of a registered metric given as function, as functools.partial of it or by its name.
+    Returns None for metrics that are not registered.
+    """
+    if isinstance(metric, str):
+        return _REGISTRY.get(metric)
+
+    if isinstance(metric, functools.partial):
+        metric = metric.func
+
+    for info in _REGISTRY.values():
+        if info.func is metric:
+            return info
+
+    return None
+
+
+def metric_name(metric):
+    """
+    Returns the registered name of a metric, or its function name for metrics that are not registered
+    """
+    info = get_metric_info(metric)
+    if info is not None:
+        return info.name
+
+    if isinstance(metric, functools.partial):
+        metric = metric.func
+
+    return getattr(metric, "__name__", repr(metric))
+
+
+def needs_unified_timestamps(metric):
+    """
+    Returns False if the metric can compare results with different timestamps, such that timestamp unification can be
+    skipped, and True otherwise. Unregistered metrics can declare this with the attribute needs_unified_timestamps.
+    """
+    info = get_metric_info(metric)
+    if info is not None:
+        return info.needs_unified_timestamps
+
+    if isinstance(metric, functools.partial):
+        metric = metric.func
+
+    return getattr(metric, "needs_unified_timestamps", True)
+
+
+def make_accumulator(metric):
+    """
+    Creates an accumulator for a registered metric with accumulator. Keyword arguments of the metric, like p, can be
+    bound with functools.partial. Raises a ValueError for metrics without accumulator.
+    """
+    kwargs = {}
+    if isinstance(metric, functools.partial) and not metric.args:
+        kwargs = metric.keywords
+
+    info = get_metric_info(metric)
+    if info is None or info.accumulator is None or (isinstance(metric, functools.partial) and metric.args):
+        raise ValueError(f"There is no accumulator for the metric {metric}. Accumulators exist for the metrics "
+                         f"{[i.name for i in _REGISTRY.values() if i.accumulator is not None]}")
+
+    return info.accumulator(**kwargs)
+
+
+register_metric(norm_p_dist, accumulator=NormPDistAccumulator)
+register_metric(norm_infty_dist, accumulator=NormInftyDistAccumulator)
+register_metric(Lp_dist, accumulator=LpDistAccumulator)
+register_metric(Linfty_dist, accumulator=LinftyDistAccumulator)
+register_metric(abs_dist_ptwise, accumulator=AbsDistPtwiseAccumulator, localized=True)
+register_metric(Lp_dist_grid, needs_unified_timestamps=False)
+register_metric(Linfty_dist_grid, needs_unified_timestamps=False)
+register_metric(L2_dist_interp, needs_unified_timestamps=False)
+register_metric(tube_dist, needs_unified_timestamps=False, batched=True, localized=True)
+register_metric(event_time_dist, needs_unified_timestamps=False)
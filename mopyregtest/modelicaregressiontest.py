@@ -8,16 +8,22 @@ MIT License. See the project's LICENSE file.
 
 import os
 import re
+import fnmatch
 import subprocess
 import platform
 import pathlib
 import shutil
+import tempfile
+import time
 import math
+import concurrent.futures
 import numpy as np
 import pandas as pd
 from typing import List
 from . import utils
 from . import metrics
+from . import resultio
+from . import streaming
 
 
 class RegressionTest:
@@ -26,7 +32,25 @@ class RegressionTest:
     Creates OpenModelica-compatible .mos scripts to import and simulate the model with .csv output.
     The .csv output is then compared against a reference result, possibly only on a subset of columns.
     """
-    def __init__(self, package_folder, model_in_package, result_folder, tool="omc", modelica_version="default", dependencies=None):
+    SIMULATION_OPTIONS = ("start_time", "stop_time", "tolerance", "num_intervals", "interval")
+
+    CACHE_FOLDER_ENV = "MOPYREGTEST_CACHE_FOLDER"
+
+    SCRATCH_FOLDER_ENV = "MOPYREGTEST_SCRATCH_FOLDER"
+
+    BUILD_JOBS_ENV = "MOPYREGTEST_BUILD_JOBS"
+
+    COMPILER_ENV = "MOPYREGTEST_CC"
+
+    # Files copied back from the scratch folder into the result folder
+    SCRATCH_COPY_BACK = ("*_res.csv", "*.log", "*.mos", "*.txt")
+
+    # Number of columns evaluated at once by vectorized metrics in fail-fast comparisons
+    FAIL_FAST_BLOCK_COLS = 64
+
+    def __init__(self, package_folder, model_in_package, result_folder, tool="omc", modelica_version="default", dependencies=None,
+                 simulation_options=None, cache_folder=None, scratch_folder=None, scratch_min_free_mb=1024,
+                 build_jobs=None, compiler=None):
         """
         Constructor of the RegresssionTest class.
 
@@ -49,6 +73,34 @@ class RegressionTest:
             Optional list of strings with names of packages that the package to be tested depends on.
             Each dependency must point to the .mo file that defines the dependency. E.g. if the
             dependency is an entire package, it must be the path to the respective package's package.mo.
+        simulation_options : None or tuple
+            Optional tuple (start_time, stop_time, tolerance, num_intervals, interval) used to simulate the model.
+            If given, the simulation tool is not asked for the experiment annotation of the model, which saves one
+            complete start of the simulation tool including loading all libraries. If None (default), the options
+            are taken from the cache (see cache_folder) or read from the experiment annotation of the model.
+        cache_folder : None or str or PathLike
+            Optional folder where the simulation options read from the experiment annotation of the model are cached.
+            Cache entries are keyed on a hash of the package sources, the dependencies, the Modelica version and the
+            tool, such that any change to these invalidates the entry. If None (default), the folder is taken from the
+            environment variable MOPYREGTEST_CACHE_FOLDER. If that is not set either, no caching is done.
+        scratch_folder : None or str or PathLike
+            Optional folder, ideally on a fast local disk or a tmpfs, in which the model is built and simulated. The
+            generated code, object files and the simulation binary then never touch result_folder. Only the result
+            .csv file, the .mos scripts and logs are copied back to result_folder, and the scratch data is deleted
+            right after the simulation. Use "auto" to pick $TMPDIR if set, else /dev/shm if available, else the
+            system's temporary folder. If None (default), the folder is taken from the environment variable
+            MOPYREGTEST_SCRATCH_FOLDER. If that is not set either, the model is built directly in result_folder.
+        scratch_min_free_mb : float
+            Minimum free space in MB required in the scratch folder. If less space is available, or if the scratch
+            folder runs full during the simulation, the model is built in result_folder instead. Default=1024.
+        build_jobs : None or int
+            Number of parallel jobs used to compile the generated C code (omc option -n). If None (default), the
+            value is taken from the environment variable MOPYREGTEST_BUILD_JOBS. If that is not set either, the
+            default of the simulation tool is used.
+        compiler : None or str
+            C compiler command used to compile the generated C code, e.g. "ccache gcc" to route compilation through
+            a compiler cache. If None (default), the value is taken from the environment variable MOPYREGTEST_CC.
+            If that is not set either, the default compiler of the simulation tool is used.
         """
 
         self.initial_cwd = os.getcwd()
@@ -65,6 +117,38 @@ class RegressionTest:
         else:
             self.tools = [tl for tl in ["omc"] if shutil.which(tl) != None]
 
+        if simulation_options is not None:
+            simulation_options = RegressionTest._parse_simulation_options(simulation_options)
+        self.simulation_options = simulation_options
+
+        if cache_folder is None:
+            cache_folder = os.environ.get(RegressionTest.CACHE_FOLDER_ENV)
+        self.cache_folder_path = self._make_path_absolut(cache_folder) if cache_folder else None
+
+        if scratch_folder is None:
+            scratch_folder = os.environ.get(RegressionTest.SCRATCH_FOLDER_ENV)
+        self.scratch_folder = scratch_folder
+        self.scratch_min_free_mb = scratch_min_free_mb
+
+        if build_jobs is None:
+            build_jobs = os.environ.get(RegressionTest.BUILD_JOBS_ENV)
+        self.build_jobs = int(build_jobs) if build_jobs else None
+
+        if compiler is None:
+            compiler = os.environ.get(RegressionTest.COMPILER_ENV)
+        self.compiler = compiler if compiler else None
+
+        # Wall clock times in seconds of building the model and of the complete simulation script, as measured in
+        # the most recent simulation run
+        self.build_time = None
+        self.simulate_time = None
+
+        # Folder in which the model is actually built and simulated
+        self.work_folder_path = self.result_folder_path
+
+        # Simulation options used in the most recent simulation run
+        self.used_simulation_options = None
+
         self.result_folder_created = False
 
     def _make_path_absolut(self, path):
@@ -222,15 +306,87 @@ class RegressionTest:
             pathlib.Path.mkdir(self.result_folder_path)
             self.result_folder_created = True
 
-        # Run the scripts for import and simulation
-        self._run_model()
+        scratch_folder_path = self._make_scratch_folder()
+        if scratch_folder_path is None:
+            # Run the scripts for import and simulation
+            self.work_folder_path = self.result_folder_path
+            self._run_model()
+
+            return
+
+        # Delete old simulation result, as the new one is only copied back after the simulation
+        sim_result_path = self.result_folder_path / (self.model_in_package + "_res.csv")
+        if sim_result_path.exists():
+            os.remove(sim_result_path)
+
+        # Run the scripts for import and simulation in the scratch folder and copy back the results
+        self.work_folder_path = scratch_folder_path
+        scratch_full = False
+        try:
+            self._run_model()
+        except (AssertionError, subprocess.CalledProcessError, OSError):
+            if self._has_free_space(scratch_folder_path.parent):
+                raise
+            scratch_full = True
+        finally:
+            os.chdir(self.initial_cwd)
+            self._copy_back_from_scratch(scratch_folder_path)
+            shutil.rmtree(scratch_folder_path, ignore_errors=True)
+
+        if scratch_full:
+            print("Scratch folder {} ran full. Falling back to result folder {}".format(
+                scratch_folder_path.parent, self.result_folder_path))
+            self.work_folder_path = self.result_folder_path
+            self._run_model()
+
+        return
+
+    def _has_free_space(self, folder):
+        return shutil.disk_usage(folder).free >= self.scratch_min_free_mb * 1024**2
+
+    def _make_scratch_folder(self):
+        """
+        Creates a fresh folder for building and simulating the model inside the scratch location specified in the
+        constructor.
+
+        Returns
+        -------
+        out : pathlib.Path or None
+            Path of the created folder, or None if no scratch location is configured or it has too little free space
+        """
+        if not self.scratch_folder:
+            return None
+
+        if self.scratch_folder == "auto":
+            if "TMPDIR" not in os.environ and os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+                scratch_root = pathlib.Path("/dev/shm")
+            else:
+                scratch_root = pathlib.Path(tempfile.gettempdir())
+        else:
+            scratch_root = self._make_path_absolut(self.scratch_folder)
+            scratch_root.mkdir(parents=True, exist_ok=True)
+
+        if not self._has_free_space(scratch_root):
+            print("Scratch folder {} has less than {} MB free space. Using result folder {}".format(
+                scratch_root, self.scratch_min_free_mb, self.result_folder_path))
+            return None
+
+        return pathlib.Path(tempfile.mkdtemp(prefix="mopyregtest_" + self.model_in_package + "_", dir=scratch_root))
+
+    def _copy_back_from_scratch(self, scratch_folder_path):
+        for pattern in RegressionTest.SCRATCH_COPY_BACK:
+            for f in scratch_folder_path.glob(pattern):
+                if f.is_file():
+                    shutil.copyfile(f, self.result_folder_path / f.name)
 
         return
 
     @staticmethod
     def compare_csv_files(reference_result, simulation_result, tol=1e-7, validated_cols=[],
                           metric=metrics.norm_infty_dist,
-                          unify_timestamps=True, fill_in_method="ffill", write_comparison=True):
+                          unify_timestamps=True, fill_in_method="ffill", write_comparison=True, chunk_rows=None,
+                          num_threads=1, t_start=None, t_stop=None, fail_fast=False, priority_cols=[],
+                          discrete_cols=None, event_tol=0.0):
         """
         Compares two CSV files from Modelica simulation runs, one as a reference result, the other one as the actual
         simulation result.
@@ -239,15 +395,23 @@ class RegressionTest:
 
         Parameters
         ----------
-        reference_result : str
-            Path to a reference .csv file
+        reference_result : str or list
+            Path to a reference result file, or a list of acceptable reference files, see doc string of
+            RegressionTest.compare_result. Besides .csv files, compressed .csv.gz, .csv.xz, .csv.bz2 and .csv.zst
+            (requires the zstandard package) as well as binary .npz files are read, determined by the file's suffix.
+
+            If it is a fingerprint (.fp.json), the simulation result is checked against the fingerprint's envelope,
+            extrema and integrals instead, see RegressionTest._compare_fingerprint. The arguments metric,
+            unify_timestamps, fill_in_method and write_comparison are ignored then, t_start and t_stop are not
+            supported, and for a list of
+            (metric, tol) pairs, the smallest tolerance is used.
         simulation_result  : str
-            Path to a simulation result .csv file
-        tol : float
+            Path to a simulation result file. The same formats as for reference_result are supported.
+        tol : float or dict
             See doc string of RegressionTest.compare_result
         validated_cols : list
             See doc string of RegressionTest.compare_result
-        metric : Callable
+        metric : Callable or list
             See doc string of RegressionTest.compare_result
         unify_timestamps : bool
             See doc string of RegressionTest.compare_result
@@ -255,65 +419,962 @@ class RegressionTest:
             See doc string of RegressionTest.compare_result
         write_comparison : bool
             See doc string of RegressionTest.compare_result
+        chunk_rows : None or int
+            See doc string of RegressionTest.compare_result
+        num_threads : None or int
+            See doc string of RegressionTest.compare_result
+        t_start : None or float
+            See doc string of RegressionTest.compare_result
+        t_stop : None or float
+            See doc string of RegressionTest.compare_result
+        fail_fast : bool
+            See doc string of RegressionTest.compare_result
+        priority_cols : list
+            See doc string of RegressionTest.compare_result
+        discrete_cols : None or str or list or dict
+            See doc string of RegressionTest.compare_result. Ignored for fingerprint references and chunked
+            comparisons.
+        event_tol : float
+            See doc string of RegressionTest.compare_result
 
         Returns
         -------
         out : None
         """
-        ref_data = pd.read_csv(filepath_or_buffer=reference_result, delimiter=',')
-        sim_data = pd.read_csv(filepath_or_buffer=simulation_result, delimiter=',')
+        checks = RegressionTest._metric_checks(metric, tol)
 
-        if unify_timestamps:
-            data_ext = RegressionTest._unify_timestamps([ref_data, sim_data], fill_in_method)
+        if isinstance(reference_result, (list, tuple)):
+            return RegressionTest._compare_any_reference(list(reference_result), simulation_result, checks,
+                                                         validated_cols, unify_timestamps, fill_in_method,
+                                                         write_comparison, chunk_rows, num_threads, t_start, t_stop,
+                                                         fail_fast, priority_cols, discrete_cols, event_tol)
+
+        if resultio.result_format(resultio.resolve_result(reference_result)) == "fp.json":
+            if t_start is not None or t_stop is not None:
+                raise ValueError(f"Time windows are not supported for the fingerprint reference {reference_result}")
+
+            return RegressionTest._compare_fingerprint(reference_result, simulation_result,
+                                                       [t for _, t in checks], validated_cols)
+
+        # Fast path for deterministic builds: identical files pass without parsing them, as long as they contain
+        # all validated columns
+        if resultio.identical_results(reference_result, simulation_result):
+            RegressionTest._resolve_validated_cols(reference_result, reference_result, validated_cols)
+
+            print(f"Simulation result {simulation_result} is identical to reference {reference_result}")
+            return
+
+        # Patterns are resolved once against the headers, such that only the validated columns are read
+        validated_cols = RegressionTest._resolve_validated_cols(reference_result, simulation_result, validated_cols)
+
+        if chunk_rows is not None:
+            return RegressionTest._compare_chunked(reference_result, simulation_result, checks, validated_cols,
+                                                   unify_timestamps, fill_in_method, write_comparison, chunk_rows,
+                                                   t_start, t_stop)
+
+        ref_raw = resultio.read_result(reference_result, usecols=["time"] + validated_cols,
+                                       t_start=t_start, t_stop=t_stop)
+        sim_raw = resultio.read_result(simulation_result, usecols=["time"] + validated_cols,
+                                       t_start=t_start, t_stop=t_stop)
+
+        failures = RegressionTest._compare_loaded(reference_result, simulation_result, ref_raw, sim_raw, checks,
+                                                  validated_cols, unify_timestamps, fill_in_method, num_threads,
+                                                  t_start, t_stop, fail_fast, priority_cols, discrete_cols, event_tol)
+
+        if failures:
+            if write_comparison and not fail_fast:
+                RegressionTest._write_comparisons(reference_result, simulation_result, checks, failures,
+                                                  fill_in_method, t_start, t_stop)
+
+            raise AssertionError(RegressionTest._failure_message(reference_result, simulation_result, checks,
+                                                                 failures))
+
+        return
+
+    @staticmethod
+    def _compare_any_reference(reference_results, simulation_result, checks, validated_cols, unify_timestamps,
+                               fill_in_method, write_comparison, chunk_rows, num_threads, t_start, t_stop,
+                               fail_fast=False, priority_cols=[], discrete_cols=None, event_tol=0.0):
+        """
+        Compares a simulation result against several acceptable references in their order and passes at the first
+        matching reference. Each reference is only resolved and read if no previous reference matched. The simulation
+        result is read once and only read again if a later reference validates further columns. Fingerprint
+        references, identical files and chunked comparisons are delegated to RegressionTest.compare_csv_files.
+
+        A reference not containing all validated columns does not match, and its missing columns are reported as its
+        deviation. If none of the references contains the validated columns, a ValueError is raised. If no reference
+        matches, the comparison file is written for the first reference compared in memory, and an
+        AssertionError lists the deviations from all references. The other parameters are the same as for
+        RegressionTest.compare_csv_files.
+        """
+        if len(reference_results) == 0:
+            raise ValueError("At least one reference result must be given")
+
+        def is_delegated(ref):
+            return (chunk_rows is not None or resultio.result_format(resultio.resolve_result(ref)) == "fp.json"
+                    or resultio.identical_results(ref, simulation_result))
+
+        sim_raw = None
+        messages = []
+        column_errors = []
+        first_failure = None
+        for ref in reference_results:
+            # Patterns are resolved against the headers only when the reference is reached, such that later
+            # references cannot prevent an earlier match
+            cols = None
+            if resultio.result_format(resultio.resolve_result(ref)) != "fp.json":
+                try:
+                    cols = RegressionTest._resolve_validated_cols(ref, simulation_result, validated_cols)
+                except ValueError as e:
+                    messages.append(str(e))
+                    column_errors.append(str(e))
+                    continue
+
+            if is_delegated(ref):
+                try:
+                    RegressionTest.compare_csv_files(ref, simulation_result, validated_cols=validated_cols,
+                                                     metric=checks, unify_timestamps=unify_timestamps,
+                                                     fill_in_method=fill_in_method, write_comparison=False,
+                                                     chunk_rows=chunk_rows, num_threads=num_threads,
+                                                     t_start=t_start, t_stop=t_stop, fail_fast=fail_fast,
+                                                     priority_cols=priority_cols, discrete_cols=discrete_cols,
+                                                     event_tol=event_tol)
+                except AssertionError as e:
+                    messages.append(str(e))
+                    continue
+
+                print(f"Simulation result {simulation_result} matches reference {ref}")
+                return
+
+            if sim_raw is None or not set(cols).issubset(sim_raw.columns):
+                loaded_cols = [] if sim_raw is None else [c for c in sim_raw.columns if c != "time"]
+                sim_raw = resultio.read_result(simulation_result,
+                                               usecols=["time"] + list(dict.fromkeys(loaded_cols + cols)),
+                                               t_start=t_start, t_stop=t_stop)
+
+            ref_raw = resultio.read_result(ref, usecols=["time"] + cols, t_start=t_start, t_stop=t_stop)
+            failures = RegressionTest._compare_loaded(ref, simulation_result, ref_raw, sim_raw[["time"] + cols],
+                                                      checks, cols, unify_timestamps, fill_in_method, num_threads,
+                                                      t_start, t_stop, fail_fast, priority_cols, discrete_cols,
+                                                      event_tol)
+            if not failures:
+                print(f"Simulation result {simulation_result} matches reference {ref}")
+                return
+
+            messages.append(RegressionTest._failure_message(ref, simulation_result, checks, failures))
+            if first_failure is None:
+                first_failure = (ref, failures)
+
+        if len(column_errors) == len(reference_results):
+            raise ValueError(f"None of the references {reference_results} contains the validated columns. "
+                             + " ".join(column_errors))
+
+        if write_comparison and not fail_fast and first_failure is not None:
+            RegressionTest._write_comparisons(first_failure[0], simulation_result, checks, first_failure[1],
+                                              fill_in_method, t_start, t_stop)
+
+        raise AssertionError(f"Simulation result {simulation_result} matches none of the references "
+                             f"{reference_results}. " + " ".join(messages))
+
+    @staticmethod
+    def _compare_loaded(reference_result, simulation_result, ref_raw, sim_raw, checks, validated_cols,
+                        unify_timestamps, fill_in_method, num_threads, t_start, t_stop, fail_fast=False,
+                        priority_cols=[], discrete_cols=None, event_tol=0.0):
+        """
+        Compares the loaded data of a reference result and a simulation result, restricted to the validated columns
+        resolved with RegressionTest._resolve_validated_cols. The other parameters are the same as for
+        RegressionTest.compare_csv_files.
+
+        Returns
+        -------
+        out : list
+            Violated metrics as returned by RegressionTest._check_metrics. Failed discrete columns are reported with
+            the metric metrics.event_time_dist, the tolerance event_tol and the check index None.
+        """
+        if len(ref_raw) == 0 or len(sim_raw) == 0:
+            raise ValueError(f"The results {reference_result} and {simulation_result} do not both contain rows in the "
+                             f"time window [{t_start}, {t_stop}]")
+
+        # Discrete columns are compared exactly on the data as read, such that only continuous columns are unified
+        # and passed to the metrics
+        discrete_failures = []
+        if discrete_cols is not None:
+            discrete = RegressionTest._discrete_cols(ref_raw, sim_raw, validated_cols, discrete_cols)
+            if discrete:
+                print(f"Comparing {len(discrete)} discrete columns exactly")
+                failed_cols = RegressionTest._compare_discrete(ref_raw, sim_raw, discrete, event_tol)
+                if failed_cols:
+                    discrete_failures = [(metrics.event_time_dist, event_tol, failed_cols, None)]
+                    if fail_fast:
+                        return discrete_failures
+
+                discrete = set(discrete)
+                validated_cols = [c for c in validated_cols if c not in discrete]
+                if not validated_cols:
+                    return discrete_failures
+
+                ref_raw = ref_raw[["time"] + validated_cols]
+                sim_raw = sim_raw[["time"] + validated_cols]
+
+        # Columns with identical values need no metric evaluation, if also the timestamps are identical
+        same_timestamps = np.array_equal(ref_raw["time"].values, sim_raw["time"].values)
+
+        # Timestamps are unified once for all metrics needing it. Metrics comparing results on different timestamps,
+        # like metrics.Lp_dist_grid, use the data as read.
+        ref_data = ref_raw
+        sim_data = sim_raw
+        if unify_timestamps and any(metrics.needs_unified_timestamps(m) for m, _ in checks):
+            data_ext = RegressionTest._unify_timestamps([ref_raw, sim_raw], fill_in_method)
             ref_data = data_ext[0]
             sim_data = data_ext[1]
 
-        # Determine common columns by comparing column headers
-        common_cols = set(ref_data.columns).intersection(set(sim_data.columns))
+        compared_cols = [c for c in validated_cols
+                         if not (same_timestamps and
+                                 np.array_equal(ref_data[c].values, sim_data[c].values, equal_nan=True))]
+        skipped_cols = len(validated_cols) - len(compared_cols)
+
+        if fail_fast:
+            failures = RegressionTest._check_metrics_fail_fast(checks, ref_raw, sim_raw, ref_data, sim_data,
+                                                               RegressionTest._order_cols(compared_cols, priority_cols),
+                                                               unify_timestamps)
+        else:
+            failures = RegressionTest._check_metrics(checks, ref_raw, sim_raw, ref_data, sim_data, compared_cols,
+                                                     unify_timestamps, num_threads)
+
+        if skipped_cols > 0:
+            print(f"Skipped {skipped_cols} of {len(validated_cols)} columns with values identical to the reference")
+
+        return discrete_failures + failures
+
+    @staticmethod
+    def _discrete_cols(ref_raw, sim_raw, cols, discrete_cols):
+        """
+        Determines the discrete, i.e. Integer or Boolean, columns among cols.
+
+        Parameters
+        ----------
+        ref_raw : pd.DataFrame
+            Reference data
+        sim_raw : pd.DataFrame
+            Simulation data
+        cols : list
+            Validated columns
+        discrete_cols : str or list or dict
+            "auto" to detect the columns with only integral values in both the reference and the simulation data,
+            a list of column names or glob patterns of discrete columns, or a dict mapping column names or glob
+            patterns to the types "Real", "Integer" or "Boolean". Columns matching no entry are continuous. A column
+            name takes precedence over patterns, and otherwise the first matching pattern is used.
+
+        Returns
+        -------
+        out : list
+            The discrete columns in the order of cols
+        """
+        if isinstance(discrete_cols, str):
+            if discrete_cols != "auto":
+                raise ValueError(f"Invalid value for discrete_cols: {discrete_cols}. Must be \"auto\", a list or a dict")
+
+            def integral(data):
+                values = data[cols].to_numpy(dtype=float)
+                return np.all(np.isfinite(values) & (values == np.round(values)), axis=0)
+
+            return [c for c, is_discrete in zip(cols, integral(ref_raw) & integral(sim_raw)) if is_discrete]
+
+        type_map = discrete_cols if isinstance(discrete_cols, dict) else {c: "Integer" for c in discrete_cols}
+        invalid_types = set(type_map.values()).difference({"Real", "Integer", "Boolean"})
+        if invalid_types:
+            raise ValueError(f"Invalid types {invalid_types} in discrete_cols. Must be \"Real\", \"Integer\" or "
+                             f"\"Boolean\"")
+
+        patterns = [p for p in type_map.keys() if p not in cols]
+        discrete = []
+        for c in cols:
+            key = c if c in type_map else next((p for p in patterns if fnmatch.fnmatchcase(c, p)), None)
+            if key is not None and type_map[key] != "Real":
+                discrete.append(c)
+
+        return discrete
+
+    @staticmethod
+    def _compare_discrete(ref_raw, sim_raw, cols, event_tol=0.0):
+        """
+        Compares discrete columns exactly. If both results have the same timestamps, all columns are compared for
+        equality at once. Otherwise, and for unequal columns, the values must change in the same sequence at times
+        deviating by at most event_tol, see metrics.event_time_dist.
+
+        Returns
+        -------
+        out : dict
+            Mapping of the failed columns to their maximum event time deviation, which is np.inf if the sequences of
+            values differ
+        """
+        ref_time = ref_raw["time"].to_numpy(dtype=float)
+        sim_time = sim_raw["time"].to_numpy(dtype=float)
+        ref_values = ref_raw[cols].to_numpy(dtype=float)
+        sim_values = sim_raw[cols].to_numpy(dtype=float)
+
+        if np.array_equal(ref_time, sim_time):
+            unequal = np.flatnonzero(~np.all(ref_values == sim_values, axis=0))
+        else:
+            unequal = np.arange(len(cols))
+
+        failed_cols = {}
+        for j in unequal:
+            delta = metrics.event_time_dist(np.column_stack((ref_time, ref_values[:, j])),
+                                            np.column_stack((sim_time, sim_values[:, j])))
+            if delta > event_tol:
+                failed_cols[cols[j]] = delta
+
+        return failed_cols
+
+    @staticmethod
+    def _write_comparisons(reference_result, simulation_result, checks, failures, fill_in_method, t_start, t_stop):
+        """
+        Writes one comparison file per violated metric with RegressionTest._write_csv_comparison. Failed discrete
+        columns are only reported in the AssertionError.
+        """
+        failures = [f for f in failures if f[3] is not None]
+        if not failures:
+            return
+
+        for (m, t, failed_cols, _), comparison_fname in zip(
+                failures, RegressionTest._comparison_fnames(simulation_result, checks, failures)):
+            RegressionTest._write_csv_comparison(reference_result, simulation_result,
+                                                 failed_cols, fill_in_method, comparison_fname,
+                                                 t_start, t_stop)
+
+        return
+
+    @staticmethod
+    def _failure_message(reference_result, simulation_result, checks, failures):
+        if len(checks) == 1 and len(failures) == 1 and failures[0][3] == 0:
+            return (f"Values of results {simulation_result} and {reference_result} are different in columns "
+                    f"{list(failures[0][2].keys())} by more than {failures[0][1]}. ")
+
+        return (f"Values of results {simulation_result} and {reference_result} are different in "
+                + "; ".join(f"columns {list(failed_cols.keys())} by more than {t} in metric {metrics.metric_name(m)}"
+                            for m, t, failed_cols, _ in failures) + ". ")
+
+    @staticmethod
+    def _check_metrics(checks, ref_raw, sim_raw, ref_data, sim_data, cols, unify_timestamps, num_threads=1):
+        """
+        Evaluates all (metric, tol) pairs in checks for the columns cols. Metrics needing unified timestamps are
+        evaluated on ref_data and sim_data, which have unified timestamps if unify_timestamps is True, and the others
+        on the data as read, ref_raw and sim_raw. Relative tolerances refer to the range of ref_raw.
+
+        Returns
+        -------
+        out : list
+            List of tuples (metric, tolerance, failed_cols, i) for the violated metrics, where failed_cols maps each
+            failed column to its deviation, a scalar or a pd.DataFrame of the deviations exceeding the tolerance, and
+            i is the index of the violated (metric, tol) pair in checks
+        """
+        def ref_range(range_cols):
+            return RegressionTest._reference_range(ref_raw, range_cols)
+
+        failures = []
+        for i, (m, t) in enumerate(checks):
+            if unify_timestamps and metrics.needs_unified_timestamps(m):
+                ref_metric_data, sim_metric_data = ref_data, sim_data
+            else:
+                ref_metric_data, sim_metric_data = ref_raw, sim_raw
+
+            col_tols = dict(zip(cols, RegressionTest._resolve_tolerances(t, cols, ref_range)))
+            deltas = RegressionTest._evaluate_metric(m, ref_metric_data, sim_metric_data, cols, num_threads)
+
+            # Scalar deviations of all columns are checked against their tolerances at once
+            scalar_cols = [c for c, delta in deltas.items() if type(delta) is not np.ndarray]
+            scalar_deltas = np.abs(np.array([deltas[c] for c in scalar_cols], dtype=float))
+            exceeded = dict(zip(scalar_cols, scalar_deltas >= np.array([col_tols[c] for c in scalar_cols],
+                                                                       dtype=float)))
+
+            failed_cols = {}
+            for c, delta in deltas.items():
+                if type(delta) is np.ndarray:
+                    if np.any(delta[:, 1] >= col_tols[c]):
+                        delta_gt_tol = np.where(delta >= col_tols[c], delta, 0.0)
+                        failed_cols[c] = pd.DataFrame(data=delta_gt_tol, columns=["time", "delta"])
+                elif exceeded[c]:
+                    failed_cols[c] = delta
+
+            if failed_cols:
+                failures.append((m, RegressionTest._tolerance_str(t, col_tols, failed_cols), failed_cols, i))
+
+        return failures
+
+    @staticmethod
+    def _check_metrics_fail_fast(checks, ref_raw, sim_raw, ref_data, sim_data, cols, unify_timestamps):
+        """
+        Evaluates the (metric, tol) pairs in checks like RegressionTest._check_metrics, but stops at the first column
+        exceeding its tolerance. Metrics are checked cheapest first, and the columns in the given order.
+
+        Returns
+        -------
+        out : list
+            Empty list, or a list with the tuple (metric, tolerance, failed_cols, i) for the first failed column
+        """
+        def cost(check):
+            info = metrics.get_metric_info(check[1][0])
+            if info is not None and info.accumulator is not None:
+                return 0
+            return 1 if info is not None and info.batched else 2
+
+        def ref_range(range_cols):
+            return RegressionTest._reference_range(ref_raw, range_cols)
+
+        for i, (m, t) in sorted(enumerate(checks), key=cost):
+            if unify_timestamps and metrics.needs_unified_timestamps(m):
+                ref_metric_data, sim_metric_data = ref_data, sim_data
+            else:
+                ref_metric_data, sim_metric_data = ref_raw, sim_raw
+
+            block_cols = RegressionTest.FAIL_FAST_BLOCK_COLS if cost((i, (m, t))) < 2 else 1
+            for start in range(0, len(cols), block_cols):
+                block = cols[start:start + block_cols]
+                col_tols = RegressionTest._resolve_tolerances(t, block, ref_range)
+                deltas = RegressionTest._evaluate_metric(m, ref_metric_data, sim_metric_data, block)
+
+                for c, col_tol in zip(block, col_tols):
+                    delta = deltas[c]
+                    if type(delta) is np.ndarray:
+                        if np.any(delta[:, 1] >= col_tol):
+                            delta = pd.DataFrame(data=np.where(delta >= col_tol, delta, 0.0),
+                                                 columns=["time", "delta"])
+                        else:
+                            continue
+                    elif np.abs(delta) < col_tol:
+                        continue
+
+                    print(f"Stopping at the first failed column \"{c}\"")
+                    return [(m, RegressionTest._tolerance_str(t, {c: col_tol}, {c: delta}), {c: delta}, i)]
+
+        return []
+
+    @staticmethod
+    def _order_cols(cols, priority_cols):
+        """
+        Orders the columns such that the columns matching the entries of priority_cols come first, in the order of
+        priority_cols, followed by the remaining columns in their order
+        """
+        ordered = []
+        for entry in priority_cols:
+            try:
+                matched = RegressionTest._expand_validated_cols([entry], cols)
+            except ValueError:
+                continue
+            ordered.extend(c for c in matched if c in cols)
+
+        ordered = list(dict.fromkeys(ordered))
+        prioritized = set(ordered)
+
+        return ordered + [c for c in cols if c not in prioritized]
+
+    @staticmethod
+    def _reference_range(ref_raw, cols):
+        """
+        Returns the ranges max - min of the columns of the reference data, used for relative tolerances
+        """
+        values = ref_raw[cols].values
+        return np.nanmax(values, axis=0) - np.nanmin(values, axis=0)
+
+    @staticmethod
+    def compare_csv_files_nway(reference_result, simulation_results, tol=1e-7, validated_cols=[],
+                               metric=metrics.norm_infty_dist, unify_timestamps=True, fill_in_method="ffill",
+                               num_threads=1, t_start=None, t_stop=None):
+        """
+        Compares several simulation results, e.g. from different tool versions or platforms, against one reference
+        result. The reference is read only once, and the timestamps of all results are unified onto one common
+        timeline in a single pass. Unlike compare_csv_files, no exception is raised for deviations. Instead, the
+        verdicts are returned.
+
+        Since all results share one timeline, metrics may differ slightly from pairwise comparisons with
+        compare_csv_files if the results have different timestamps, e.g. for fill_in_method="interpolate".
+
+        Parameters
+        ----------
+        reference_result : str
+            Path to a reference result file. Fingerprint references are not supported.
+        simulation_results : list
+            Paths to the simulation result files
+        tol : float or dict
+            See doc string of RegressionTest.compare_result
+        validated_cols : list
+            See doc string of RegressionTest.compare_result. If empty, the columns common to all results are
+            validated.
+        metric : Callable or list
+            See doc string of RegressionTest.compare_result
+        unify_timestamps : bool
+            See doc string of RegressionTest.compare_result
+        fill_in_method : str
+            See doc string of RegressionTest.compare_result
+        num_threads : None or int
+            See doc string of RegressionTest.compare_result
+        t_start : None or float
+            See doc string of RegressionTest.compare_result
+        t_stop : None or float
+            See doc string of RegressionTest.compare_result
+
+        Returns
+        -------
+        out : pd.DataFrame
+            Verdict matrix with one row per simulation result, indexed by its path as given, and one column per
+            validated column. An entry is True if the column of the simulation result is within the tolerance of
+            all metrics, and False otherwise.
+        """
+        if len(simulation_results) == 0:
+            raise ValueError("simulation_results must contain at least one simulation result")
+
+        if resultio.result_format(resultio.resolve_result(reference_result)) == "fp.json":
+            raise ValueError(f"N-way comparisons are not supported for the fingerprint reference {reference_result}")
+
+        checks = RegressionTest._metric_checks(metric, tol)
+
+        # Without explicit columns, only the columns common to all results are validated
+        cols = None
+        for simulation_result in simulation_results:
+            sim_cols = RegressionTest._resolve_validated_cols(reference_result, simulation_result, validated_cols)
+            cols = sim_cols if cols is None else [c for c in cols if c in sim_cols]
+
+        if len(cols) == 0:
+            raise ValueError(f"The reference {reference_result} and the simulation results {simulation_results} have "
+                             f"no common variable")
+
+        ref_raw = resultio.read_result(reference_result, usecols=["time"] + cols, t_start=t_start, t_stop=t_stop)
+        sim_raws = [resultio.read_result(f, usecols=["time"] + cols, t_start=t_start, t_stop=t_stop)
+                    for f in simulation_results]
+
+        if any(len(data) == 0 for data in [ref_raw] + sim_raws):
+            raise ValueError(f"The results {[reference_result] + list(simulation_results)} do not all contain rows "
+                             f"in the time window [{t_start}, {t_stop}]")
+
+        ref_data = ref_raw
+        sim_datas = sim_raws
+        if unify_timestamps and any(metrics.needs_unified_timestamps(m) for m, _ in checks):
+            data_ext = RegressionTest._unify_timestamps([ref_raw] + sim_raws, fill_in_method)
+            ref_data = data_ext[0]
+            sim_datas = data_ext[1:]
+
+        verdicts = pd.DataFrame(data=True, index=[str(f) for f in simulation_results], columns=cols)
+        for i, simulation_result in enumerate(simulation_results):
+            print(f"Comparing simulation result {simulation_result} and reference {reference_result}")
+            failures = RegressionTest._check_metrics(checks, ref_raw, sim_raws[i], ref_data, sim_datas[i], cols,
+                                                     unify_timestamps, num_threads)
 
-        if not validated_cols:
-            validated_cols = common_cols
+            for m, t, failed_cols, _ in failures:
+                print(f"Values of result {simulation_result} are different in columns {list(failed_cols.keys())} "
+                      f"by more than {t} in metric {metrics.metric_name(m)}")
+                verdicts.loc[str(simulation_result), list(failed_cols.keys())] = False
 
-        # Check if validated_cols is meaningful
-        validated_cols = set(validated_cols)
-        if "time" in validated_cols:
-            validated_cols.remove("time")  # Ignore time column
+        return verdicts
 
-        if not validated_cols.issubset(set(ref_data.columns)):
-            missing_cols = validated_cols.difference(set(ref_data.columns))
+    @staticmethod
+    def _expand_validated_cols(validated_cols, columns):
+        """
+        Expands the patterns in validated_cols against the columns of a result header. Entries that are columns of
+        the header are taken as they are, which matters for array elements like "x[1]". Otherwise, entries starting
+        with "re:" are regular expressions that must match the whole column name, entries containing one of the
+        characters "*?[" are glob patterns (see fnmatch), and all other entries are column names. Raises a
+        ValueError if a pattern matches no column. Column names are returned as given, in their order, followed by
+        the columns matched by patterns in the order of the header.
+        """
+        header = set(columns)
+        names = []
+        patterns = []
+        for entry in validated_cols:
+            if entry in header:
+                names.append(entry)
+            elif entry.startswith("re:"):
+                patterns.append((entry, re.compile(entry[3:]).fullmatch))
+            elif any(ch in entry for ch in "*?["):
+                patterns.append((entry, re.compile(fnmatch.translate(entry)).match))
+            else:
+                names.append(entry)
+
+        if not patterns:
+            return names
+
+        matched = set()
+        for entry, match in patterns:
+            entry_matched = [c for c in columns if c != "time" and match(c)]
+            if len(entry_matched) == 0:
+                raise ValueError(f"The pattern {entry} in validated_cols does not match any column")
+            matched.update(entry_matched)
+
+        return names + [c for c in columns if c in matched and c not in names]
+
+    @staticmethod
+    def _resolve_validated_cols(reference_result, simulation_result, validated_cols):
+        """
+        Resolves validated_cols against the headers of the reference and simulation result, without reading their
+        data. Patterns are expanded with RegressionTest._expand_validated_cols, and an empty validated_cols selects
+        all columns common to both results. The time column is ignored.
+
+        Raises a ValueError if not all validated columns are contained in both results, or if none is left.
+
+        Returns
+        -------
+        out : list
+            The validated columns in the order of the reference header
+        """
+        ref_header = resultio.read_columns(reference_result)
+        sim_header = resultio.read_columns(simulation_result)
+        ref_cols = set(ref_header)
+        sim_cols = set(sim_header)
+
+        if validated_cols:
+            validated_cols = set(RegressionTest._expand_validated_cols(validated_cols, ref_header))
+        else:
+            validated_cols = ref_cols.intersection(sim_cols)
+        validated_cols.discard("time")  # Ignore time column
+
+        if not validated_cols.issubset(ref_cols):
             raise ValueError(f"The reference data {reference_result} does not contain all entries of validated_cols. "
-                             f"Missing: {missing_cols}")
+                             f"Missing: {validated_cols.difference(ref_cols)}")
 
-        if not validated_cols.issubset(set(sim_data.columns)):
-            missing_cols = validated_cols.difference(set(sim_data.columns))
-            raise ValueError(f"The simulation data {simulation_result} does not contain all entries of validated_cols." 
-                             f"Missing: {missing_cols}")
+        if not validated_cols.issubset(sim_cols):
+            raise ValueError(f"The simulation data {simulation_result} does not contain all entries of validated_cols."
+                             f"Missing: {validated_cols.difference(sim_cols)}")
 
         if len(validated_cols) == 0:
             raise ValueError(f"validated_cols must contain at least one common variable in "
                              f"reference {reference_result} and simulation result {simulation_result}")
 
-        failed_cols = {}
-        for c in validated_cols:
-            print("Comparing column \"{}\"".format(c))
-            delta = metric(ref_data[["time", c]].values, sim_data[["time", c]].values)
-
-            if type(delta) is np.ndarray:
-                if np.any(delta[:, 1] >= tol):
-                    delta_gt_tol = np.where(delta >= tol, delta, 0.0)
-                    failed_cols[c] = pd.DataFrame(data=delta_gt_tol, columns=["time", "delta"])
+        return [c for c in ref_header if c in validated_cols]
+
+    @staticmethod
+    def _metric_checks(metric, tol):
+        """
+        Returns the list of (metric, tol) pairs to check, from a single metric and tolerance or from a list of
+        (metric, tol) pairs given as metric.
+        """
+        if isinstance(metric, (list, tuple)):
+            checks = [(m, t) for m, t in metric]
+            if len(checks) == 0:
+                raise ValueError("The list of (metric, tol) pairs must not be empty")
+
+            return checks
+
+        return [(metric, tol)]
+
+    @staticmethod
+    def _resolve_tolerances(tol, cols, ref_range=None):
+        """
+        Resolves a tolerance specification into one absolute tolerance per column.
+
+        Parameters
+        ----------
+        tol : float or dict
+            Either one absolute tolerance for all columns, or a dict mapping column names or glob patterns (see
+            fnmatch) to tolerances. A column name takes precedence over patterns, and otherwise the first matching
+            pattern in the order of the dict is used. Each tolerance is either a float, i.e. an absolute tolerance, or
+            a dict with the keys "abs" and/or "rel". The tolerance of a column is then abs + rel * (max - min), with
+            the minimum and maximum of the column in the reference result.
+        cols : list
+            Columns to resolve the tolerances for
+        ref_range : Callable
+            Function returning the ranges max - min of the reference for a list of columns as an np.ndarray. It is only
+            called if a relative tolerance is given.
+
+        Returns
+        -------
+        out : np.ndarray
+            Absolute tolerances of the columns
+        """
+        if not isinstance(tol, dict):
+            return np.full(len(cols), float(tol))
+
+        patterns = [p for p in tol.keys() if p not in cols]
+        abs_tols = np.zeros(len(cols))
+        rel_tols = np.zeros(len(cols))
+        unmatched = []
+        for i, c in enumerate(cols):
+            key = c if c in tol else next((p for p in patterns if fnmatch.fnmatchcase(c, p)), None)
+            if key is None:
+                unmatched.append(c)
+                continue
+
+            spec = tol[key]
+            if isinstance(spec, dict):
+                if not spec or not set(spec.keys()).issubset({"abs", "rel"}):
+                    raise ValueError(f"Invalid tolerance {spec} for {key}. Must be a float or a dict with the keys "
+                                     f"\"abs\" and/or \"rel\"")
+                abs_tols[i] = spec.get("abs", 0.0)
+                rel_tols[i] = spec.get("rel", 0.0)
             else:
-                if np.abs(delta) >= tol:
-                    failed_cols[c] = delta
+                abs_tols[i] = spec
 
-        if failed_cols:
+        if unmatched:
+            raise ValueError(f"No tolerance is given for the columns {unmatched}. Add them or a matching pattern, "
+                             f"e.g. \"*\", to tol")
+
+        if np.any(rel_tols != 0.0):
+            abs_tols = abs_tols + rel_tols * np.asarray(ref_range(list(cols)), dtype=float)
+
+        return abs_tols
+
+    @staticmethod
+    def _tolerance_str(tol, col_tols, failed_cols):
+        """
+        Describes the tolerance in messages: the tolerance itself if it is one float, and otherwise the resolved
+        tolerances of the failed columns
+        """
+        if not isinstance(tol, dict):
+            return tol
+
+        return {c: float(col_tols[c]) for c in failed_cols.keys()}
+
+    @staticmethod
+    def _comparison_fnames(simulation_result, checks, failures):
+        """
+        Paths of the comparison files for failed metrics. For a single metric, this is the default path of
+        RegressionTest._write_csv_comparison, and otherwise the metric's name is appended, followed by the index of
+        the check if the metric is checked more than once.
+        """
+        if len(checks) == 1:
+            return [""]
+
+        names = [metrics.metric_name(m) for m, _ in checks]
+        folder = pathlib.Path(simulation_result).absolute().parent
+        stem = resultio.result_stem(simulation_result)
+
+        fnames = []
+        for _, _, _, i in failures:
+            name = names[i] if names.count(names[i]) == 1 else f"{names[i]}_{i}"
+            fnames.append(folder / f"{stem}_comparison_{name}.csv")
+
+        return fnames
+
+    @staticmethod
+    def _evaluate_metric(metric, ref_data, sim_data, cols, num_threads=1):
+        """
+        Evaluates the metric for the columns cols of the reference and the simulation data. Depending on the metric's
+        properties registered in mopyregtest.metrics, all columns are evaluated at once with the metric's accumulator
+        or by the metric itself, if it supports batching. Other metrics are evaluated column by column.
+
+        With num_threads other than 1, the columns are split into blocks that are evaluated in a thread pool. The
+        numpy operations of the built-in metrics release the GIL, such that the blocks are evaluated in parallel.
+
+        Returns
+        -------
+        out : dict
+            Mapping of every column to the metric's value, i.e. a scalar or an array of shape (N, 2), in the order of
+            cols
+        """
+        if not cols:
+            return {}
+
+        info = metrics.get_metric_info(metric)
+        ref_values = ref_data[["time"] + cols].values
+        sim_values = sim_data[["time"] + cols].values
+
+        if num_threads is None:
+            num_threads = os.cpu_count() or 1
+
+        if num_threads == 1 or len(cols) == 1:
+            return RegressionTest._evaluate_metric_block(metric, info, ref_values, sim_values, cols, True)
+
+        # More blocks than threads balance the load for metrics evaluated column by column
+        num_blocks = min(len(cols), 4 * num_threads)
+        blocks = [(block[0], block[-1] + 1) for block in np.array_split(np.arange(len(cols)), num_blocks)]
+        print(f"Comparing {len(cols)} columns in {num_blocks} blocks with {num_threads} threads")
+
+        def evaluate_block(block):
+            start, stop = block
+            block_cols = [0] + list(range(start + 1, stop + 1))
+            return RegressionTest._evaluate_metric_block(metric, info, ref_values[:, block_cols],
+                                                         sim_values[:, block_cols], cols[start:stop], False)
+
+        deltas = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=num_threads) as executor:
+            # map returns the results in the order of the blocks, such that the result is deterministic
+            for block_deltas in executor.map(evaluate_block, blocks):
+                deltas.update(block_deltas)
+
+        return deltas
+
+    @staticmethod
+    def _cols_summary(cols, max_names=5):
+        """
+        Short description of the columns for progress output, with only the first max_names column names
+        """
+        names = ", ".join(f"'{c}'" for c in cols[0:max_names])
+        if len(cols) > max_names:
+            names += ", ..."
+
+        return f"{len(cols)} column{'s' if len(cols) != 1 else ''} [{names}]"
+
+    @staticmethod
+    def _evaluate_metric_block(metric, info, ref_values, sim_values, cols, verbose):
+        """
+        Evaluates the metric for a block of columns, given as arrays with the time in the first column followed by
+        the values of cols. See RegressionTest._evaluate_metric.
+        """
+        if info is not None and (info.accumulator is not None or info.batched):
+            if verbose:
+                print(f"Comparing {RegressionTest._cols_summary(cols)}")
+
+            if info.accumulator is not None:
+                delta = metrics.make_accumulator(metric).update(ref_values, sim_values).finalize()
+                if len(cols) == 1:
+                    delta = [delta]
+            else:
+                delta = metric(ref_values, sim_values)
+                delta = [delta[:, [0, j + 1]] for j in range(0, len(cols))]
+
+            return dict(zip(cols, delta))
+
+        deltas = {}
+        for j, c in enumerate(cols):
+            if verbose:
+                print("Comparing column \"{}\"".format(c))
+            deltas[c] = metric(ref_values[:, [0, j + 1]], sim_values[:, [0, j + 1]])
+
+        return deltas
+
+    @staticmethod
+    def _compare_chunked(reference_result, simulation_result, checks, validated_cols, unify_timestamps,
+                         fill_in_method, write_comparison, chunk_rows, t_start=None, t_stop=None):
+        """
+        Compares a reference result and a simulation result chunk by chunk with streaming.compare_chunked, evaluating
+        all (metric, tol) pairs in checks in one pass. The validated columns must be resolved with
+        RegressionTest._resolve_validated_cols. The other parameters are the same as for
+        RegressionTest.compare_csv_files.
+        """
+        print(f"Comparing {RegressionTest._cols_summary(validated_cols)} in chunks of {chunk_rows} rows")
+        cols = list(validated_cols)
+        all_deltas, ref_ranges = streaming.compare_chunked(reference_result, simulation_result, cols,
+                                                           [m for m, _ in checks], unify_timestamps, fill_in_method,
+                                                           chunk_rows, with_ranges=True, t_start=t_start,
+                                                           t_stop=t_stop)
+
+        failures = []
+        for i, ((m, t), deltas) in enumerate(zip(checks, all_deltas)):
+            col_tols = RegressionTest._resolve_tolerances(t, cols, lambda c: ref_ranges)
+            values = np.array([deltas[c] for c in cols], dtype=float)
+            failed_cols = {c: float(delta) for c, delta, exceeded in zip(cols, values, np.abs(values) >= col_tols)
+                           if exceeded}
+            if failed_cols:
+                failures.append((m, RegressionTest._tolerance_str(t, dict(zip(cols, col_tols)), failed_cols),
+                                 failed_cols, i))
+
+        if failures:
             if write_comparison:
-                RegressionTest._write_csv_comparison(reference_result, simulation_result,
-                                                     failed_cols, fill_in_method)
+                print("No comparison file is written for results compared in chunks")
+
+            if len(checks) == 1:
+                raise AssertionError(
+                    f"Values of results {simulation_result} and {reference_result} are different in columns "
+                    f"{list(failures[0][2].keys())} by more than {failures[0][1]}. Deviations: {failures[0][2]}")
 
             raise AssertionError(
-                f"Values of results {simulation_result} and {reference_result} are different in columns "
-                f"{list(failed_cols.keys())} by more than {tol}. ")
+                f"Values of results {simulation_result} and {reference_result} are different in "
+                + "; ".join(f"columns {list(failed_cols.keys())} by more than {t} in metric {metrics.metric_name(m)}"
+                            f" (deviations: {failed_cols})" for m, t, failed_cols, _ in failures) + ". ")
+
+        return
+
+    @staticmethod
+    def _compare_fingerprint(reference_result, simulation_result, tol=1e-7, validated_cols=[]):
+        """
+        Compares a simulation result against a fingerprint reference as written by resultio.write_fingerprint,
+        streaming through the simulation result with bounded memory.
+
+        A column passes if its values are identical to the reference (equal checksum), or if the minima and maxima of
+        the simulation result in every time bucket, its global extrema and its time average (integral divided by
+        the simulated time span) all deviate from those of the reference by less than tol. If the simulation result
+        deviates from the reference by less than tol at every point in time, the bucket extrema deviate by less than
+        tol as well, up to differences in the sampling of both results.
+
+        Parameters
+        ----------
+        reference_result : str
+            Path to a fingerprint reference .fp.json file
+        simulation_result  : str
+            Path to a simulation result file
+        tol : float, dict or list
+            Tolerance up to which deviations are accepted, see doc string of RegressionTest.compare_result. Relative
+            tolerances refer to the range of the reference's global extrema. If a list of tolerances is given, the
+            strictest tolerance of every column is used.
+        validated_cols : list
+            See doc string of RegressionTest.compare_result
+
+        Returns
+        -------
+        out : None
+        """
+        fingerprint = resultio.read_fingerprint(reference_result)
+        ref_cols = set(fingerprint["columns"].keys())
+
+        validated_cols = set(RegressionTest._expand_validated_cols(validated_cols, list(fingerprint["columns"].keys()))
+                             if validated_cols else ref_cols)
+        validated_cols.discard("time")
+
+        if not validated_cols.issubset(ref_cols):
+            raise ValueError(f"The reference data {reference_result} does not contain all entries of validated_cols. "
+                             f"Missing: {validated_cols.difference(ref_cols)}")
+
+        if len(validated_cols) == 0:
+            raise ValueError(f"validated_cols must contain at least one variable of the reference {reference_result}")
+
+        # The simulation result is read in a single pass, which also yields its time range
+        t_start, t_stop = fingerprint["time_range"]
+        try:
+            sim_fingerprint = resultio.fingerprint_result(simulation_result, time_range=(t_start, t_stop),
+                                                          num_buckets=fingerprint["num_buckets"],
+                                                          columns=sorted(validated_cols))
+        except ValueError as e:
+            raise ValueError(f"The simulation data {simulation_result} does not contain all entries of "
+                             f"validated_cols: {e}")
+
+        if sim_fingerprint["data_time_range"] is None:
+            raise ValueError(f"The result {simulation_result} does not contain any rows")
+
+        sim_t_start, sim_t_stop = sim_fingerprint["data_time_range"]
+        if not (math.isclose(t_start, sim_t_start, rel_tol=1e-5, abs_tol=1e-3)
+                and math.isclose(t_stop, sim_t_stop, rel_tol=1e-5, abs_tol=1e-3)):
+            raise ValueError(f"The simulation time range [{sim_t_start}, {sim_t_stop}] of {simulation_result} does "
+                             f"not match the time range [{t_start}, {t_stop}] of the reference {reference_result}")
+
+        missing_cols = validated_cols.difference(sim_fingerprint["columns"].keys())
+        if missing_cols:
+            raise ValueError(f"The simulation data {simulation_result} does not contain all entries of validated_cols. "
+                             f"Missing: {missing_cols}")
+
+        duration = t_stop - t_start if t_stop > t_start else 1.0
+
+        def ref_range(cols):
+            return np.array([fingerprint["columns"][c]["max"] - fingerprint["columns"][c]["min"] for c in cols])
+
+        cols = sorted(validated_cols)
+        tols = tol if isinstance(tol, list) else [tol]
+        col_tols = dict(zip(cols, np.min([RegressionTest._resolve_tolerances(t, cols, ref_range) for t in tols],
+                                         axis=0)))
+
+        failed_cols = {}
+        print(f"Comparing {RegressionTest._cols_summary(cols)} with fingerprint {reference_result}")
+        for c in cols:
+            ref = fingerprint["columns"][c]
+            sim = sim_fingerprint["columns"][c]
+
+            if ref["sha256"] == sim["sha256"] and fingerprint["num_rows"] == sim_fingerprint["num_rows"]:
+                continue
+
+            ref_env = np.array([ref["bucket_min"], ref["bucket_max"]], dtype=float)
+            sim_env = np.array([sim["bucket_min"], sim["bucket_max"]], dtype=float)
+            delta = max(np.nanmax(np.abs(sim_env - ref_env), initial=0.0),
+                        abs(sim["min"] - ref["min"]), abs(sim["max"] - ref["max"]),
+                        abs(sim["integral"] - ref["integral"]) / duration)
+
+            if delta >= col_tols[c]:
+                failed_cols[c] = float(delta)
+
+        if failed_cols:
+            # Scalar tolerances are reported as the strictest one, others as the tolerances of the failed columns
+            dict_tols = [t for t in tols if isinstance(t, dict)]
+            tol_str = RegressionTest._tolerance_str(dict_tols[0] if dict_tols else min(tols), col_tols, failed_cols)
+            raise AssertionError(
+                f"Values of results {simulation_result} and fingerprint {reference_result} are different in columns "
+                f"{list(failed_cols.keys())} by more than {tol_str}. Maximum deviations: {failed_cols}")
 
         return
 
@@ -344,21 +1405,44 @@ class RegressionTest:
 
     def compare_result(self, reference_result, tol=1e-7, validated_cols=[],
                        metric=metrics.norm_infty_dist,
-                       unify_timestamps=True, fill_in_method="ffill", write_comparison=True):
+                       unify_timestamps=True, fill_in_method="ffill", write_comparison=True, chunk_rows=None,
+                       num_threads=1, t_start=None, t_stop=None, fail_fast=False, priority_cols=[],
+                       discrete_cols=None, event_tol=0.0):
         """
         Executes simulation and then compares the obtained result and the reference result along the
         validated columns. Throws an exception (AssertionError) if the deviation is larger or equal to tol.
 
         Parameters
         ----------
-        reference_result : str
-            Path to a reference .csv file containing the expected results of the model
-        tol : float
+        reference_result : str or list
+            Path to a reference .csv file containing the expected results of the model. Compressed (.csv.gz, .csv.xz,
+            .csv.bz2, .csv.zst) and binary (.npz) reference files are read as well, determined by the file's suffix.
+
+            If results differ slightly between platforms or tool versions, a list of acceptable references can be
+            given. The comparison passes if any of them matches. The simulation result is read only once, and the
+            references are compared in the given order until the first match. A reference lacking validated columns
+            does not match. If none matches, the comparison file is written for the first reference, and the
+            AssertionError lists the deviations from all references.
+        tol : float or dict
             Absolute tolerance up to which deviation in the comparison metric is accepted
+
+            Columns of different magnitude can be given different tolerances with a dict mapping column names or glob
+            patterns to tolerances, e.g.
+
+                tol={"*.v": {"rel": 1e-3}, "*.i": 1e-6, "*": {"abs": 1e-6, "rel": 1e-4}}
+
+            A float is an absolute tolerance. A dict with the keys "abs" and/or "rel" specifies the tolerance
+            abs + rel * (max - min), relative to the range of the column in the reference result. A column name
+            takes precedence over patterns, and otherwise the first matching pattern is used. Columns without a
+            tolerance raise a ValueError. All columns are checked in one comparison.
         validated_cols : list
             List of variable names (from the file header) in the reference .csv file that are used in the regression test
             Important: All entries of validated_cols must be present in both the reference result and the actual result.
-        metric : Callable
+
+            Entries may also be glob patterns like "*.v" or "Capacitor*.i", or regular expressions prefixed with
+            "re:" like "re:R[0-9]+\\.(i|v)", which are resolved once against the header of the reference result.
+            Only the resolved columns are read from both results. A pattern matching no column raises a ValueError.
+        metric : Callable or list
             Metric-like function that is used to compute the distance between the reference result and the actual result
             produced by the simulation.
 
@@ -396,6 +1480,15 @@ class RegressionTest:
 
             which is simply :math:`\Big\{ (t_i, |r_\text{ref}[t_i] - r_\text{act}[t_i]| : i \in 1,\ldots,N \Big\}`
 
+            Several metrics can be checked at once by passing a list of (metric, tol) pairs, e.g.
+
+                metric=[(metrics.norm_infty_dist, 1e-3), (metrics.Lp_dist, 1e-4)]
+
+            All metrics are evaluated on the same loaded result, the timestamps are unified at most once, and all
+            violated pairs are reported together in one AssertionError. Each tolerance in the list may be a dict as
+            described for tol, and the argument tol is ignored then. On failure,
+            one comparison file per violated metric is written, with the metric's name appended to the file name.
+
         unify_timestamps : bool
             Boolean controlling whether the timestamp unification shall be called in compare_result before evaluating
             the metric. Default=True.
@@ -403,6 +1496,10 @@ class RegressionTest:
             If set to False, then the function passed in the argument "metric" will be evaluated for matching columns
             (from validated_cols) of reference and actual result. In this case the definition of the metric has to
             ensure that computations are meaningful, e.g. for non-matching dimensions or different timestamps.
+
+            Metrics declaring the attribute needs_unified_timestamps=False, like metrics.Lp_dist_grid,
+            metrics.Linfty_dist_grid and metrics.L2_dist_interp, compare results with different timestamps directly.
+            For these, no unification takes place.
         fill_in_method : str
             Defines the method used to fill in data when calling RegressionTest._unify_timestamps and if results have
             different timestamps and cannot be compared pointwise.
@@ -416,6 +1513,50 @@ class RegressionTest:
             If there are result comparisons that have failed, this will trigger writing a comparison csv file to the
             folder where the actual simulation result is found and be called <simulation_result_name_root>_compare.csv.
             Default=True.
+        chunk_rows : None or int
+            If given, both results are read and compared in chunks of chunk_rows rows, such that memory stays bounded
+            for results of any size. Timestamps are unified chunk-wise with the same outcome. Only the metrics
+            norm_infty_dist, Linfty_dist, norm_p_dist, Lp_dist and abs_dist_ptwise from mopyregtest.metrics are
+            supported then, and no comparison file is written. Default=None, i.e. results are read completely.
+        num_threads : None or int
+            Number of threads evaluating the metric on blocks of columns in parallel, which speeds up comparing
+            results with many columns. The result does not depend on the number of threads. If None, the number of
+            CPUs is used. Ignored if chunk_rows is given. Default=1, i.e. columns are evaluated sequentially.
+        t_start : None or float
+            If given, only the rows of both results with time >= t_start are compared, e.g. to exclude initialization
+            transients. The window is applied before the timestamp unification, so t_start should be a common output
+            time of both results. Rows before the window are skipped without parsing all of their columns.
+            Default=None.
+        t_stop : None or float
+            If given, only the rows of both results with time <= t_stop are compared, and reading stops after it.
+            Default=None.
+        fail_fast : bool
+            If True, the comparison stops at the first column exceeding its tolerance, and no comparison file is
+            written. For quick feedback, metrics are checked cheapest first, i.e. metrics with an accumulator, then
+            batched metrics and then all others, and vectorized metrics evaluate blocks of
+            RegressionTest.FAIL_FAST_BLOCK_COLS columns. num_threads is not used then. Ignored if chunk_rows is given
+            or for fingerprint references. Default=False, i.e. all columns are evaluated and reported.
+        priority_cols : list
+            Column names or patterns, as for validated_cols, whose columns are compared first in fail-fast mode, in
+            the given order. Entries matching no validated column are ignored. Default=[], i.e. the columns are
+            compared in the order of the reference header.
+        discrete_cols : None or str or list or dict
+            Discrete, i.e. Integer or Boolean, columns are compared exactly instead of with the metric, all at once
+            with a vectorized equality if both results have the same timestamps. Only the remaining continuous columns
+            are unified and evaluated with the metric. Possible values are
+
+            "auto" to treat columns with only finite integral values in both results as discrete,
+
+            a list of column names or glob patterns of discrete columns,
+
+            or a type map, e.g. from the model's variable declarations, mapping column names or glob patterns to
+            "Real", "Integer" or "Boolean", like {"*.on": "Boolean", "counter": "Integer", "*": "Real"}.
+
+            Failed discrete columns are reported with the metric metrics.event_time_dist. Ignored if chunk_rows is
+            given or for fingerprint references. Default=None, i.e. all columns are compared with the metric.
+        event_tol : float
+            Maximum deviation of the times at which discrete columns change their values. The values must change in
+            the same sequence in both results. Default=0.0, i.e. discrete columns must change at the same times.
 
         Returns
         -------
@@ -430,7 +1571,8 @@ class RegressionTest:
 
         RegressionTest.compare_csv_files(reference_result, simulation_result, tol, validated_cols,
                                          metric,
-                                         unify_timestamps, fill_in_method, write_comparison)
+                                         unify_timestamps, fill_in_method, write_comparison, chunk_rows, num_threads,
+                                         t_start, t_stop, fail_fast, priority_cols, discrete_cols, event_tol)
 
         return
 
@@ -467,6 +1609,72 @@ class RegressionTest:
 
         return
 
+    @staticmethod
+    def _parse_simulation_options(options):
+        """
+        Converts simulation options as returned by the simulation tool, e.g. ("0.0", "1.0", "1e-06", "500", "0.002"),
+        into a tuple of numbers (start_time, stop_time, tolerance, num_intervals, interval).
+        """
+        options = [str(o).strip() for o in options]
+        if len(options) != len(RegressionTest.SIMULATION_OPTIONS):
+            raise ValueError(f"Simulation options must be a tuple {RegressionTest.SIMULATION_OPTIONS}, "
+                             f"but are {options}")
+
+        (start_time, stop_time, tolerance, num_intervals, interval) = options
+
+        return (float(start_time), float(stop_time), float(tolerance), int(float(num_intervals)), float(interval))
+
+    def _simulation_options_cache_file(self, tool):
+        return self.cache_folder_path / tool / "simulation_options" / f"{self.model_in_package}.json"
+
+    def _simulation_options_cache_key(self, tool):
+        return utils.package_sources_hash(self.package_folder_path, self.dependencies, self.modelica_version,
+                                          extra=[tool])
+
+    def _read_cached_simulation_options(self, tool, cache_key):
+        """
+        Returns the cached simulation options of the model if there is a cache entry matching cache_key, else None.
+        """
+        entry = utils.read_json(self._simulation_options_cache_file(tool))
+
+        if entry is None or entry.get("key") != cache_key:
+            return None
+
+        try:
+            return RegressionTest._parse_simulation_options(entry["simulation_options"])
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def _write_cached_simulation_options(self, tool, cache_key, simulation_options):
+        utils.write_json_atomic(self._simulation_options_cache_file(tool),
+                                {"key": cache_key,
+                                 "model_in_package": self.model_in_package,
+                                 "simulation_options": list(simulation_options)})
+
+        return
+
+    @staticmethod
+    def _dependencies_load_str(dependencies):
+        """
+        Returns the script statements loading the dependencies of the package, to replace DEPENDENCIES in the templates
+        """
+        load_str = ""
+        for d in (dependencies or []):
+            load_str += "\n + loadFile(\"{}\",\"UTF-8\",true);".format(d)
+
+        return load_str
+
+    @staticmethod
+    def _read_build_time(build_time_path):
+        """
+        Reads the build time in seconds as written by the simulation script. Returns None if not available.
+        """
+        try:
+            with open(build_time_path, 'r') as fhandle:
+                return float(fhandle.read().strip().strip('"'))
+        except (OSError, ValueError):
+            return None
+
     def _run_model(self):
         """
         Executes the Modelica simulation tool as an external process called on the
@@ -478,7 +1686,7 @@ class RegressionTest:
         out : None
 
         """
-        os.chdir(self.result_folder_path)
+        os.chdir(self.work_folder_path)
 
         for tool in self.tools:
             tool_executable = tool
@@ -492,33 +1700,43 @@ class RegressionTest:
             tool_output = tool + "_output.txt"
 
             if tool == "omc":
-                # Copy mos templates to result folder
-                shutil.copy(self.template_folder_path / model_import_template, self.result_folder_path / model_import_mos)
-                shutil.copy(self.template_folder_path / model_simulate_template, self.result_folder_path / model_simulate_mos)
+                # Copy simulation mos template to result folder
+                shutil.copy(self.template_folder_path / model_simulate_template, self.work_folder_path / model_simulate_mos)
 
-                # Modify the import template
                 repl_dict = {}
                 repl_dict["PACKAGE_FOLDER"] = str(self.package_folder_path.as_posix())
-                repl_dict["RESULT_FOLDER"] = str(self.result_folder_path.as_posix())
+                repl_dict["RESULT_FOLDER"] = str(self.work_folder_path.as_posix())
                 repl_dict["MODEL_IN_PACKAGE"] = self.model_in_package
                 repl_dict["MODELICA_VERSION"] = self.modelica_version
 
-                if self.dependencies:
-                    load_str = ""
-                    for d in self.dependencies:
-                        load_str += "\n + loadFile(\"{}\",\"UTF-8\",true);".format(d)
+                repl_dict["DEPENDENCIES"] = RegressionTest._dependencies_load_str(self.dependencies)
 
-                    repl_dict["DEPENDENCIES"] = load_str
-                else:
-                    repl_dict["DEPENDENCIES"] = ""
+                # Simulation options are taken from the constructor, from the cache, or from the import script
+                simulation_options = self.simulation_options
+                cache_key = None
+                if simulation_options is None and self.cache_folder_path is not None:
+                    cache_key = self._simulation_options_cache_key(tool)
+                    simulation_options = self._read_cached_simulation_options(tool, cache_key)
+                    if simulation_options is not None:
+                        print("Using cached simulation options for model {}".format(self.model_in_package))
 
-                utils.replace_in_file(self.result_folder_path / model_import_mos, repl_dict)
+                if simulation_options is None:
+                    # Copy and modify the import template
+                    shutil.copy(self.template_folder_path / model_import_template, self.work_folder_path / model_import_mos)
+                    utils.replace_in_file(self.work_folder_path / model_import_mos, repl_dict)
 
-                # Run the import script and write the output of the OpenModelica Compiler (omc) to omc_output
-                proc_return = subprocess.run([tool_executable, model_import_mos], check=True, capture_output=True)
-                omc_messages = proc_return.stdout.decode("utf-8").strip("\'").strip("\n")
+                    # Run the import script and write the output of the OpenModelica Compiler (omc) to omc_output
+                    proc_return = subprocess.run([tool_executable, model_import_mos], check=True, capture_output=True)
+                    omc_messages = proc_return.stdout.decode("utf-8").strip("\'").strip("\n")
+
+                    simulation_options = RegressionTest._parse_simulation_options(
+                        omc_messages.split("\n")[-1].lstrip('(').rstrip(')').split(','))
 
-                (start_time, stop_time, tolerance, num_intervals, interval) = omc_messages.split("\n")[-1].lstrip('(').rstrip(')').split(',')
+                    if cache_key is not None:
+                        self._write_cached_simulation_options(tool, cache_key, simulation_options)
+
+                self.used_simulation_options = simulation_options
+                (start_time, stop_time, tolerance, num_intervals, interval) = [str(o) for o in simulation_options]
 
                 # Modify the simulation template
                 if platform.system() == 'Windows':
@@ -534,21 +1752,43 @@ class RegressionTest:
                 repl_dict["TOLERANCE"] = tolerance
                 repl_dict["NUM_INTERVALS"] = num_intervals
 
-                utils.replace_in_file(self.result_folder_path / model_simulate_mos, repl_dict)
+                build_options = ""
+                if self.build_jobs is not None:
+                    build_options += "setCommandLineOptions(\"-n={}\");\n".format(self.build_jobs)
+                if self.compiler is not None:
+                    build_options += "setCompiler(\"{}\");\n".format(self.compiler)
+                repl_dict["BUILD_OPTIONS"] = build_options
+
+                utils.replace_in_file(self.work_folder_path / model_simulate_mos, repl_dict)
 
                 # Delete old simulation binary and old simulation result
-                sim_result_path = self.result_folder_path / (self.model_in_package + "_res.csv")
+                sim_result_path = self.work_folder_path / (self.model_in_package + "_res.csv")
                 if sim_result_path.exists():
                     os.remove(sim_result_path)
 
-                sim_binary_path = self.result_folder_path / sim_binary
+                sim_binary_path = self.work_folder_path / sim_binary
                 if sim_binary_path.exists():
                     os.remove(sim_binary_path)
 
+                build_time_path = self.work_folder_path / (self.model_in_package + "_build_time.txt")
+                if build_time_path.exists():
+                    os.remove(build_time_path)
+
                 # Run the simulation script and append the output of the OpenModelica Compiler (omc) to omc_output
+                simulate_start = time.perf_counter()
                 proc_return = subprocess.run([tool_executable, model_simulate_mos], check=True, capture_output=True)
+                self.simulate_time = time.perf_counter() - simulate_start
                 omc_messages = proc_return.stdout.decode("utf-8").strip("\'").strip("\n")
 
+                self.build_time = RegressionTest._read_build_time(build_time_path)
+                print("Building model {} took {} s, the complete simulation script took {:.3f} s".format(
+                    self.model_in_package,
+                    "unknown" if self.build_time is None else "{:.3f}".format(self.build_time),
+                    self.simulate_time))
+
+                with open(self.work_folder_path / tool_output, 'w') as fhandle:
+                    fhandle.write(omc_messages)
+
                 # Check output: Both simulation binary and simulation result must exist now
                 if not sim_binary_path.exists():
                     os.chdir(self.initial_cwd)
@@ -570,7 +1810,7 @@ class RegressionTest:
 
     @staticmethod
     def _write_csv_comparison(reference_result, simulation_result, failed_cols, fill_in_method="ffill",
-                              comparison_fname=""):
+                              comparison_fname="", t_start=None, t_stop=None):
         """
         Writes a comparison CSV file from the result comparison of reference_result and actual simulation result,
         which includes also the results for the failed variable columns in the output. Note that to have results in
@@ -629,6 +1869,10 @@ class RegressionTest:
         comparison_fname : str
             Path to where the output shall be written. If not specified, the output filename
             is <path/to/simulation_result/simulation_result_name_root>_compare.csv
+        t_start : None or float
+            See doc string of RegressionTest.compare_result
+        t_stop : None or float
+            See doc string of RegressionTest.compare_result
 
         Returns
         -------
@@ -637,10 +1881,10 @@ class RegressionTest:
 
         if not comparison_fname:
             comparison_fname = (pathlib.Path(simulation_result).absolute().parent /
-                                f"{pathlib.Path(simulation_result).stem}_comparison.csv")
+                                f"{resultio.result_stem(simulation_result)}_comparison.csv")
 
-        ref_data = pd.read_csv(filepath_or_buffer=reference_result, delimiter=',')
-        sim_data = pd.read_csv(filepath_or_buffer=simulation_result, delimiter=',')
+        ref_data = resultio.read_result(reference_result, t_start=t_start, t_stop=t_stop)
+        sim_data = resultio.read_result(simulation_result, t_start=t_start, t_stop=t_stop)
 
         # Determine if the delta in failed_cols between actual and reference is a (nonlocal) scalar or a timeseries
         is_scalar = True
@@ -0,0 +1,521 @@
+"""
+MoPyRegtest: A Python enabled simple regression testing framework for Modelica models.
+
+Copyright (c) Dr. Philipp Emanuel Stelzig, 2019--2023.
+
+MIT License. See the project's LICENSE file.
+"""
+
+import bz2
+import collections
+import gzip
+import hashlib
+import json
+import lzma
+import os
+import pathlib
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from . import utils
+
+# Suffixes of compressed CSV files and the modules to open them
+COMPRESSIONS = {".gz": gzip, ".xz": lzma, ".bz2": bz2, ".zst": None}
+
+# Valid formats of result files, given as the suffix after the result's name, e.g. <model>_res.csv.gz
+RESULT_FORMATS = ["csv", "csv.gz", "csv.xz", "csv.bz2", "csv.zst", "npz", "fp.json"]
+
+# Number of rows read at once when streaming through a result file
+CHUNK_ROWS = 100000
+
+FINGERPRINT_FORMAT = "mopyregtest-fingerprint"
+
+FINGERPRINT_VERSION = 1
+
+# Number of equally long time buckets of the min/max envelope in a fingerprint
+FINGERPRINT_BUCKETS = 1000
+
+# Suffix of pointer files referring to a result file in a content-addressed reference store
+POINTER_SUFFIX = ".ref"
+
+# Parsed results from a content-addressed reference store. As these are immutable, they can be kept in memory.
+_STORE_CACHE = collections.OrderedDict()
+
+STORE_CACHE_SIZE = 8
+
+
+def result_format(filename):
+    """
+    Returns the format of a result file from its suffixes, e.g. "csv.gz" for model_res.csv.gz
+    """
+    suffixes = pathlib.Path(filename).suffixes
+    if suffixes and suffixes[-1] == ".npz":
+        return "npz"
+    if len(suffixes) >= 2 and suffixes[-2:] == [".fp", ".json"]:
+        return "fp.json"
+    if len(suffixes) >= 2 and suffixes[-1] in COMPRESSIONS and suffixes[-2] == ".csv":
+        return "csv" + suffixes[-1]
+
+    return "csv"
+
+
+def result_stem(filename):
+    """
+    Returns the name of a result file without its format suffixes, e.g. model_res for model_res.csv.gz
+    """
+    name = pathlib.Path(filename).name
+    fmt = result_format(filename)
+    if name.endswith("." + fmt):
+        return name[:-len(fmt) - 1]
+
+    return pathlib.Path(filename).stem
+
+
+def open_result(filename, mode="rb"):
+    """
+    Opens a possibly compressed CSV result file. Compressed files are decompressed while they are read, so they never
+    need to be held in memory as a whole.
+    """
+    suffix = pathlib.Path(filename).suffix
+    if suffix not in COMPRESSIONS:
+        return open(filename, mode)
+
+    if suffix == ".zst":
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError(f"Reading or writing {filename} requires the zstandard package, which is not installed")
+
+        return zstandard.open(filename, mode)
+
+    return COMPRESSIONS[suffix].open(filename, mode)
+
+
+def resolve_result(filename):
+    """
+    Returns the path of the result file that filename refers to. If filename is a pointer file (suffix .ref) into a
+    content-addressed reference store, this is the path written in the pointer file, relative to the pointer file's
+    folder. Otherwise, it is filename itself.
+    """
+    filename = pathlib.Path(filename)
+    if filename.suffix != POINTER_SUFFIX:
+        return filename
+
+    with open(filename, 'r') as fhandle:
+        target = pathlib.Path(fhandle.read().strip())
+
+    return target if target.is_absolute() else filename.parent / target
+
+
+def content_hash(filename):
+    """
+    Computes a sha256 hash of the content of a result file, independent of its compression. For .npz files, the hash
+    is computed over the column names and the data.
+    """
+    hasher = hashlib.sha256()
+
+    if result_format(filename) == "npz":
+        with np.load(filename, allow_pickle=False) as npz:
+            hasher.update("\n".join(npz["columns"]).encode("utf-8"))
+            hasher.update(np.ascontiguousarray(npz["data"]).tobytes())
+    else:
+        with open_result(filename, "rb") as fhandle:
+            for block in iter(lambda: fhandle.read(1 << 20), b""):
+                hasher.update(block)
+
+    return hasher.hexdigest()
+
+
+def store_result(filename, store_folder):
+    """
+    Adds a result file to a content-addressed reference store, unless a file with identical content is already
+    stored. Files are stored as <store_folder>/<hash[0:2]>/<hash>.<format>.
+
+    Parameters
+    ----------
+    filename : str or PathLike
+        Path of the result file
+    store_folder : str or PathLike
+        Folder of the reference store. Created if it does not exist.
+
+    Returns
+    -------
+    out : pathlib.Path
+        Path of the stored file
+    """
+    digest = content_hash(filename)
+    blob = pathlib.Path(store_folder) / digest[0:2] / f"{digest}.{result_format(filename)}"
+
+    if not blob.exists():
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(prefix=blob.name, suffix=".tmp", dir=blob.parent)
+        os.close(fd)
+        shutil.copyfile(filename, tmp_name)
+        os.replace(tmp_name, blob)
+
+    return blob
+
+
+def _is_store_blob(filename):
+    name = pathlib.Path(filename).name
+    return len(name) > 64 and name[64] == "." and all(c in "0123456789abcdef" for c in name[0:64])
+
+
+def read_result(filename, usecols=None, t_start=None, t_stop=None):
+    """
+    Reads a result file into a pandas DataFrame. The format is determined from the file's suffixes: plain CSV (.csv),
+    compressed CSV (.csv.gz, .csv.xz, .csv.bz2, .csv.zst) or binary numpy (.npz). Pointer files (.ref) into a
+    content-addressed reference store are resolved, and results read from the store are cached in memory.
+
+    Parameters
+    ----------
+    filename : str or PathLike
+        Path of the result file
+    usecols : None or List[str]
+        If given, only these columns are read
+    t_start : None or float
+        If given, only rows with time >= t_start are read
+    t_stop : None or float
+        If given, only rows with time <= t_stop are read
+
+    Returns
+    -------
+    out : pd.DataFrame
+    """
+    filename = resolve_result(filename)
+
+    if _is_store_blob(filename):
+        key = (str(pathlib.Path(filename).absolute()), None if usecols is None else tuple(usecols), t_start, t_stop)
+        if key not in _STORE_CACHE:
+            _STORE_CACHE[key] = _read_result_file(filename, usecols, t_start, t_stop)
+            while len(_STORE_CACHE) > STORE_CACHE_SIZE:
+                _STORE_CACHE.popitem(last=False)
+        _STORE_CACHE.move_to_end(key)
+
+        return _STORE_CACHE[key].copy()
+
+    return _read_result_file(filename, usecols, t_start, t_stop)
+
+
+def read_columns(filename):
+    """
+    Reads only the column names of a result file, without reading its data.
+    """
+    filename = resolve_result(filename)
+
+    if result_format(filename) == "fp.json":
+        return ["time"] + list(read_fingerprint(filename)["columns"].keys())
+
+    if result_format(filename) == "npz":
+        with np.load(filename, allow_pickle=False) as npz:
+            return npz["columns"].tolist()
+
+    with open_result(filename, "rb") as fhandle:
+        return list(pd.read_csv(filepath_or_buffer=fhandle, delimiter=',', nrows=0).columns)
+
+
+def identical_results(filename1, filename2):
+    """
+    Checks if two result files are byte-identical, which is decided by their sizes and sha256 hashes. Pointer files
+    into a reference store are resolved.
+    """
+    filename1 = resolve_result(filename1)
+    filename2 = resolve_result(filename2)
+
+    if result_format(filename1) != result_format(filename2):
+        return False
+
+    if os.path.samefile(filename1, filename2):
+        return True
+
+    if os.path.getsize(filename1) != os.path.getsize(filename2):
+        return False
+
+    return utils.hash_file(filename1).digest() == utils.hash_file(filename2).digest()
+
+
+def _read_result_file(filename, usecols=None, t_start=None, t_stop=None):
+    if result_format(filename) == "fp.json":
+        raise ValueError(f"{filename} is a fingerprint and does not contain the full result")
+
+    windowed = t_start is not None or t_stop is not None
+
+    if result_format(filename) == "npz":
+        with np.load(filename, allow_pickle=False) as npz:
+            columns = npz["columns"].tolist()
+            values = npz["data"]
+
+        if windowed:
+            start, stop = _window_rows(values[:, columns.index("time")], t_start, t_stop)
+            values = values[start:stop]
+
+        if usecols is not None:
+            col_idx = [j for j, c in enumerate(columns) if c in usecols]
+            values = values[:, col_idx]
+            columns = [columns[j] for j in col_idx]
+
+        return pd.DataFrame(data=values, columns=columns)
+
+    if windowed:
+        chunks = list(iter_result(filename, usecols, t_start=t_start, t_stop=t_stop))
+        if not chunks:
+            return pd.DataFrame(columns=usecols if usecols is not None else read_columns(filename), dtype=float)
+
+        return pd.concat(chunks, ignore_index=True)
+
+    with open_result(filename, "rb") as fhandle:
+        return pd.read_csv(filepath_or_buffer=fhandle, delimiter=',', usecols=usecols)
+
+
+def _window_rows(times, t_start=None, t_stop=None):
+    """
+    Returns the start and stop index of the rows with t_start <= time <= t_stop, found by bisection as the times of
+    results are sorted
+    """
+    start = 0 if t_start is None else int(np.searchsorted(times, t_start, side="left"))
+    stop = len(times) if t_stop is None else int(np.searchsorted(times, t_stop, side="right"))
+
+    return start, max(start, stop)
+
+
+def write_result(data, filename):
+    """
+    Writes a pandas DataFrame into a result file, whose format is determined from the file's suffixes.
+    """
+    if result_format(filename) == "npz":
+        np.savez_compressed(filename, data=data.values, columns=np.array(data.columns, dtype=str))
+        return
+
+    with open_result(filename, "wb") as fhandle:
+        data.to_csv(fhandle, sep=",", index=False)
+
+    return
+
+
+def convert_result(src, dst):
+    """
+    Copies the result file src to dst, converting the format if the suffixes of src and dst differ. Conversions
+    between plain and compressed CSV files are streamed.
+    """
+    src = resolve_result(src)
+    src_format = result_format(src)
+    dst_format = result_format(dst)
+
+    if src_format == dst_format:
+        shutil.copyfile(src, dst)
+    elif dst_format == "fp.json":
+        write_fingerprint(src, dst)
+    elif src_format != "npz" and dst_format != "npz":
+        with open_result(src, "rb") as fsrc, open_result(dst, "wb") as fdst:
+            shutil.copyfileobj(fsrc, fdst, 1 << 20)
+    else:
+        write_result(read_result(src), dst)
+
+    return
+
+
+def iter_result(filename, usecols=None, chunksize=None, t_start=None, t_stop=None):
+    """
+    Iterates over a result file in chunks of at most chunksize rows, such that CSV files of any size can be processed
+    with bounded memory. Binary .npz files are yielded as a whole.
+
+    If a time window is given, only rows inside it are yielded. As the time column is sorted, the rows before t_start
+    are found by reading only the time column of a CSV file, and the remaining columns of these rows are not parsed.
+    Reading stops at the first row after t_stop.
+
+    Parameters
+    ----------
+    filename : str or PathLike
+        Path of the result file
+    usecols : None or List[str]
+        If given, only these columns are read
+    chunksize : None or int
+        Number of rows per chunk. If None, CHUNK_ROWS is used.
+    t_start : None or float
+        If given, only rows with time >= t_start are read
+    t_stop : None or float
+        If given, only rows with time <= t_stop are read
+
+    Returns
+    -------
+    out : Iterator[pd.DataFrame]
+    """
+    filename = resolve_result(filename)
+
+    if result_format(filename) in ["npz", "fp.json"]:
+        yield _read_result_file(filename, usecols, t_start, t_stop)
+        return
+
+    skip_rows = 0
+    if t_start is not None:
+        skip_rows = _count_rows_before(filename, t_start, chunksize)
+
+    # The time column is needed to find the end of the window
+    read_cols = usecols
+    if t_stop is not None and usecols is not None and "time" not in usecols:
+        read_cols = ["time"] + list(usecols)
+
+    with open_result(filename, "rb") as fhandle:
+        for chunk in pd.read_csv(filepath_or_buffer=fhandle, delimiter=',', usecols=read_cols,
+                                 skiprows=range(1, skip_rows + 1), chunksize=chunksize or CHUNK_ROWS):
+            if t_stop is None:
+                yield chunk
+                continue
+
+            times = chunk["time"].values
+            stop = _window_rows(times, t_stop=t_stop)[1]
+            if read_cols is not usecols:
+                chunk = chunk[[c for c in chunk.columns if c != "time"]]
+
+            if stop > 0:
+                yield chunk.iloc[0:stop]
+
+            if stop < len(times):
+                return
+
+
+def _count_rows_before(filename, t_start, chunksize=None):
+    """
+    Counts the rows of a CSV result file with time < t_start, reading only the time column up to t_start
+    """
+    num_rows = 0
+    with open_result(filename, "rb") as fhandle:
+        for chunk in pd.read_csv(filepath_or_buffer=fhandle, delimiter=',', usecols=["time"],
+                                 chunksize=chunksize or CHUNK_ROWS):
+            start = _window_rows(chunk["time"].values, t_start=t_start)[0]
+            num_rows += start
+            if start < len(chunk):
+                break
+
+    return num_rows
+
+
+def _time_range(filename):
+    t_start = np.inf
+    t_stop = -np.inf
+    for chunk in iter_result(filename, usecols=["time"]):
+        if len(chunk) > 0:
+            t_start = min(t_start, chunk["time"].values[0])
+            t_stop = max(t_stop, chunk["time"].values[-1])
+
+    if t_start > t_stop:
+        raise ValueError(f"The result {filename} does not contain any rows")
+
+    return float(t_start), float(t_stop)
+
+
+def fingerprint_result(filename, time_range=None, num_buckets=FINGERPRINT_BUCKETS, columns=None):
+    """
+    Computes the fingerprint of a result file in a single streaming pass. For every column, the fingerprint contains
+    the minimum and maximum value in each of num_buckets equally long time buckets (the envelope), the global extrema,
+    the integral over time (trapezoidal rule) and a sha256 checksum of the values.
+
+    Parameters
+    ----------
+    filename : str or PathLike
+        Path of the result file
+    time_range : None or (float, float)
+        Start and stop time dividing into the buckets. If None, the time range of the result is used, which needs
+        another pass over the time column. Rows outside of time_range are assigned to the first or last bucket.
+    num_buckets : int
+        Number of time buckets of the envelope
+    columns : None or List[str]
+        If given, only these columns are fingerprinted
+
+    Returns
+    -------
+    out : dict
+        The fingerprint, as written by write_fingerprint. The entry "data_time_range" holds the first and last time
+        of the result, or None if it has no rows, such that the time range of the result is checked without another
+        pass.
+    """
+    if time_range is None:
+        time_range = _time_range(filename)
+    t_start, t_stop = time_range
+    bucket_width = (t_stop - t_start) / num_buckets if t_stop > t_start else 1.0
+
+    usecols = None if columns is None else ["time"] + [c for c in columns if c != "time"]
+
+    names = None
+    num_rows = 0
+    data_time_range = None
+    prev = None
+    for chunk in iter_result(filename, usecols=usecols):
+        if names is None:
+            names = [c for c in chunk.columns if c != "time"]
+            bucket_min = np.full((num_buckets, len(names)), np.nan)
+            bucket_max = np.full((num_buckets, len(names)), np.nan)
+            integral = np.zeros(len(names))
+            hashers = [hashlib.sha256() for _ in names]
+
+        if len(chunk) == 0:
+            continue
+
+        t = chunk["time"].values.astype(np.float64)
+        values = chunk[names].values.astype(np.float64)
+        num_rows += len(t)
+        data_time_range = [float(t[0]) if data_time_range is None else data_time_range[0], float(t[-1])]
+
+        # Results are sorted by time, so the rows of a bucket are contiguous and can be reduced at once
+        idx = np.clip(((t - t_start) / bucket_width).astype(np.int64), 0, num_buckets - 1)
+        starts = np.flatnonzero(np.r_[True, idx[1:] != idx[:-1]])
+        buckets = idx[starts]
+        bucket_min[buckets] = np.fmin(bucket_min[buckets], np.minimum.reduceat(values, starts, axis=0))
+        bucket_max[buckets] = np.fmax(bucket_max[buckets], np.maximum.reduceat(values, starts, axis=0))
+
+        # Carry the last row of the previous chunk to integrate across chunk boundaries
+        if prev is not None:
+            t = np.r_[prev[0], t]
+            values = np.vstack((prev[1], values))
+        integral += np.sum(np.diff(t)[:, np.newaxis] * (values[1:] + values[:-1]) / 2, axis=0)
+        prev = (t[-1], values[-1])
+
+        for j, hasher in enumerate(hashers):
+            hasher.update(np.ascontiguousarray(chunk[names[j]].values, dtype=np.float64).tobytes())
+
+    if names is None:
+        raise ValueError(f"The result {filename} does not contain any data")
+
+    def _tolist(a):
+        return [None if np.isnan(v) else float(v) for v in a]
+
+    fingerprint = {"format": FINGERPRINT_FORMAT, "version": FINGERPRINT_VERSION,
+                   "num_rows": num_rows, "time_range": [t_start, t_stop], "data_time_range": data_time_range,
+                   "num_buckets": num_buckets, "columns": {}}
+    for j, c in enumerate(names):
+        fingerprint["columns"][c] = {"min": float(np.nanmin(bucket_min[:, j])) if num_rows else None,
+                                     "max": float(np.nanmax(bucket_max[:, j])) if num_rows else None,
+                                     "integral": float(integral[j]),
+                                     "sha256": hashers[j].hexdigest(),
+                                     "bucket_min": _tolist(bucket_min[:, j]),
+                                     "bucket_max": _tolist(bucket_max[:, j])}
+
+    return fingerprint
+
+
+def write_fingerprint(src, dst, num_buckets=FINGERPRINT_BUCKETS):
+    """
+    Writes the fingerprint of the result file src into the file dst, see fingerprint_result
+    """
+    fingerprint = fingerprint_result(src, num_buckets=num_buckets)
+    with open(dst, 'w') as fhandle:
+        json.dump(fingerprint, fhandle)
+
+    return
+
+
+def read_fingerprint(filename):
+    """
+    Reads a fingerprint written by write_fingerprint. Pointer files into a reference store are resolved.
+    """
+    filename = resolve_result(filename)
+    with open(filename, 'r') as fhandle:
+        fingerprint = json.load(fhandle)
+
+    if fingerprint.get("format") != FINGERPRINT_FORMAT or fingerprint.get("version") != FINGERPRINT_VERSION:
+        raise ValueError(f"{filename} is not a MoPyRegtest fingerprint of version {FINGERPRINT_VERSION}")
+
+    return fingerprint
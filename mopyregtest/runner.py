@@ -0,0 +1,225 @@
+"""
+MoPyRegtest: A Python enabled simple regression testing framework for Modelica models.
+
+Copyright (c) Dr. Philipp Emanuel Stelzig, 2019--2023.
+
+MIT License. See the project's LICENSE file.
+"""
+
+import concurrent.futures
+import json
+import os
+import pathlib
+import time
+import unittest
+
+import numpy as np
+
+import mopyregtest
+from . import metrics
+from .modelicaregressiontest import RegressionTest
+
+MANIFEST_FORMAT = "mopyregtest-manifest"
+
+MANIFEST_VERSION = 1
+
+# Settings of a test that can be given in the manifest's defaults and be overridden per test
+TEST_SETTINGS = ("mode", "metric", "metric_code", "tol", "validated_cols", "unify_timestamps", "fill_in_method", "cleanup",
+                 "simulation_options")
+
+
+def load_manifest(manifest_file):
+    """
+    Loads a test manifest as written by Generator.generate_tests with output_format="manifest" and resolves all
+    relative paths in it against the folder containing the manifest.
+
+    Parameters
+    ----------
+    manifest_file : str or PathLike
+        Path of the manifest .json file
+
+    Returns
+    -------
+    out : List[dict]
+        One dictionary per test with all settings needed to run it
+    """
+    manifest_file = pathlib.Path(manifest_file).absolute()
+    with open(manifest_file, 'r') as fhandle:
+        manifest = json.load(fhandle)
+
+    if manifest.get("format") != MANIFEST_FORMAT or manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError(f"{manifest_file} is not a MoPyRegtest test manifest of version {MANIFEST_VERSION}")
+
+    manifest_folder = manifest_file.parent
+
+    def _resolve(path):
+        path = pathlib.Path(os.path.expanduser(path))
+        return path if path.is_absolute() else manifest_folder / path
+
+    package_folder = _resolve(manifest["package_folder"])
+    result_folder = _resolve(manifest["result_folder"])
+    dependencies = manifest.get("dependencies")
+    if dependencies is not None:
+        dependencies = [str(_resolve(d)) for d in dependencies]
+
+    tests = []
+    for t in manifest["tests"]:
+        test = {k: v for k, v in manifest.get("defaults", {}).items() if k in TEST_SETTINGS}
+        # A metric of the test overrides the default metric in either form
+        if "metric" in t or "metric_code" in t:
+            test.pop("metric", None)
+            test.pop("metric_code", None)
+        test.update(t)
+
+        test["package_folder"] = str(package_folder)
+        test["modelica_version"] = manifest.get("modelica_version", "default")
+        test["dependencies"] = dependencies
+        # Every test gets its own result folder, as tests may run in parallel
+        test["result_folder"] = str(result_folder / test["model_in_package"])
+        if test.get("reference_result") is not None:
+            test["reference_result"] = str(_resolve(test["reference_result"]))
+        test.setdefault("name", test["model_in_package"].lower().replace(".", "_"))
+
+        tests.append(test)
+
+    return tests
+
+
+def _resolve_metric(test):
+    """
+    Returns the metric function of a test from a loaded manifest. The entry "metric" is the name of a metric
+    registered in mopyregtest.metrics, like "norm_infty_dist", and is looked up with mopyregtest.metrics.get_metric.
+
+    Only if the test explicitly has the entry "metric_code", as written by the Generator for user-defined metrics
+    given as code like "lambda r_ref, r_act: ...", this code is evaluated. Manifests containing "metric_code" must
+    therefore be trusted like Python code.
+    """
+    if "metric_code" in test:
+        return eval(test["metric_code"], {"mopyregtest": mopyregtest, "np": np})
+
+    return metrics.get_metric(test.get("metric", "norm_infty_dist"))
+
+
+def run_test(test):
+    """
+    Runs a single test from a loaded manifest. Raises AssertionError if the test fails.
+
+    Parameters
+    ----------
+    test : dict
+        Test as returned by load_manifest
+
+    Returns
+    -------
+    out : None
+    """
+    tester = RegressionTest(package_folder=test["package_folder"],
+                            model_in_package=test["model_in_package"],
+                            result_folder=test["result_folder"],
+                            modelica_version=test["modelica_version"],
+                            dependencies=test["dependencies"],
+                            simulation_options=test.get("simulation_options"))
+
+    if test.get("mode", "regression") == "success":
+        tester.check_success()
+    else:
+        tester.compare_result(reference_result=test["reference_result"],
+                              metric=_resolve_metric(test),
+                              validated_cols=test.get("validated_cols", []),
+                              tol=test.get("tol", 1e-7),
+                              unify_timestamps=test.get("unify_timestamps", True),
+                              fill_in_method=test.get("fill_in_method", "ffill"))
+
+    if test.get("cleanup", False):
+        tester.cleanup(ask_confirmation=False)
+
+    return
+
+
+def _run_test_timed(test):
+    start = time.perf_counter()
+    cwd = os.getcwd()
+    try:
+        run_test(test)
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    finally:
+        os.chdir(cwd)
+
+    return {"name": test["name"], "model_in_package": test["model_in_package"],
+            "passed": error is None, "error": error, "duration": time.perf_counter() - start}
+
+
+def run_manifest(manifest_file, num_workers=None):
+    """
+    Runs all tests of a test manifest, in parallel processes, and reports the results.
+
+    Parameters
+    ----------
+    manifest_file : str or PathLike
+        Path of the manifest .json file
+    num_workers : None or int
+        Number of worker processes. If None (default), the number of CPUs is used. If 1, all tests run
+        sequentially in the current process.
+
+    Returns
+    -------
+    out : List[dict]
+        One result per test, in the order of the manifest, with the entries "name", "model_in_package", "passed",
+        "error" and "duration" in seconds
+    """
+    tests = load_manifest(manifest_file)
+
+    results = [None] * len(tests)
+    if num_workers == 1:
+        for i, test in enumerate(tests):
+            results[i] = _run_test_timed(test)
+            _report(results[i])
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=num_workers) as executor:
+            futures = {executor.submit(_run_test_timed, test): i for i, test in enumerate(tests)}
+            for future in concurrent.futures.as_completed(futures):
+                results[futures[future]] = future.result()
+                _report(results[futures[future]])
+
+    failed = [r for r in results if not r["passed"]]
+    print(f"\n{len(results) - len(failed)} of {len(results)} tests passed")
+    for r in failed:
+        print(f"FAILED {r['model_in_package']}")
+
+    return results
+
+
+def _report(result):
+    if result["passed"]:
+        print(f"PASSED {result['model_in_package']} ({result['duration']:.1f} s)")
+    else:
+        print(f"FAILED {result['model_in_package']} ({result['duration']:.1f} s): {result['error']}")
+
+
+def make_test_case(manifest_file, class_name):
+    """
+    Creates a unittest.TestCase class with one test method per test in the manifest, such that the tests of a manifest
+    can be run with unittest or pytest.
+
+    Parameters
+    ----------
+    manifest_file : str or PathLike
+        Path of the manifest .json file
+    class_name : str
+        Name of the created class
+
+    Returns
+    -------
+    out : type
+        Subclass of unittest.TestCase
+    """
+    def _make_method(test):
+        def test_method(self):
+            run_test(test)
+        return test_method
+
+    methods = {f"test_{test['name']}": _make_method(test) for test in load_manifest(manifest_file)}
+
+    return type(class_name, (unittest.TestCase,), methods)
@@ -0,0 +1,300 @@
+"""
+MoPyRegtest: A Python enabled simple regression testing framework for Modelica models.
+
+Copyright (c) Dr. Philipp Emanuel Stelzig, 2019--2023.
+
+MIT License. See the project's LICENSE file.
+"""
+
+import math
+
+import numpy as np
+
+from . import metrics
+from . import resultio
+
+
+def _ffill(values, carry):
+    """
+    Forward fills the NaN values in the columns of values, starting from the row carry before the first row
+    """
+    values = np.vstack((carry, values))
+    idx = np.where(np.isnan(values), 0, np.arange(values.shape[0])[:, np.newaxis])
+    np.maximum.accumulate(idx, axis=0, out=idx)
+
+    return np.take_along_axis(values, idx, axis=0)[1:]
+
+
+def _bfill(values):
+    return _ffill(values[::-1], np.full(values.shape[1], np.nan))[::-1]
+
+
+def _interpolate(values, carry):
+    """
+    Linearly interpolates the NaN values in the columns of values with respect to the row index, starting from the row
+    carry before the first row. Trailing NaN values are forward filled, as by pandas.DataFrame.interpolate.
+    """
+    values = np.vstack((carry, values))
+    n = values.shape[0]
+    rows = np.arange(n)[:, np.newaxis]
+    valid = ~np.isnan(values)
+
+    left = np.where(valid, rows, -1)
+    np.maximum.accumulate(left, axis=0, out=left)
+    right = np.where(valid, rows, n)
+    right = np.minimum.accumulate(right[::-1], axis=0)[::-1]
+
+    has_left = left >= 0
+    has_right = right < n
+    left_values = np.take_along_axis(values, np.maximum(left, 0), axis=0)
+    right_values = np.take_along_axis(values, np.minimum(right, n - 1), axis=0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        weight = (rows - left) / (right - left)
+        interpolated = left_values + weight * (right_values - left_values)
+
+    filled = np.where(valid, values, np.where(has_left & has_right, interpolated,
+                                              np.where(has_left, left_values, np.nan)))
+
+    return filled[1:]
+
+
+class _UnifiedReader:
+    """
+    Reads several result files in time chunks and yields blocks of rows with unified timestamps, identical to the
+    result of RegressionTest._unify_timestamps on the full results, but with memory bounded by a few chunks.
+
+    Rows are only unified up to a time boundary, below which all files have been read completely. The fill state,
+    i.e. the last unified row of every file, is carried from one block to the next. For "bfill" and "interpolate",
+    unified rows after the last original row of a file are held back until the next original row of that file
+    has been read.
+    """
+
+    def __init__(self, filenames, columns, fill_in_method="ffill", unify_timestamps=True, chunk_rows=None,
+                 t_start=None, t_stop=None):
+        if fill_in_method not in ["ffill", "bfill", "interpolate"]:
+            raise ValueError("Unknown filling method for NaN values")
+
+        self.filenames = filenames
+        self.columns = columns
+        self.fill_in_method = fill_in_method
+        self.unify_timestamps = unify_timestamps
+
+        self._chunks = [resultio.iter_result(f, usecols=["time"] + columns, chunksize=chunk_rows, t_start=t_start,
+                                             t_stop=t_stop) for f in filenames]
+        self._times = [np.zeros(0) for _ in filenames]
+        self._values = [np.zeros((0, len(columns))) for _ in filenames]
+        self._exhausted = [False for _ in filenames]
+        self._carry = [np.full(len(columns), np.nan) for _ in filenames]
+
+        self.start_times = [None for _ in filenames]
+        self.end_times = [None for _ in filenames]
+
+    def _read_chunk(self, i):
+        try:
+            chunk = next(self._chunks[i])
+        except StopIteration:
+            self._exhausted[i] = True
+            return
+
+        if len(chunk) == 0:
+            return
+
+        times = chunk["time"].values.astype(np.float64)
+        if self.start_times[i] is None:
+            self.start_times[i] = times[0]
+        self.end_times[i] = times[-1]
+
+        self._times[i] = np.concatenate((self._times[i], times))
+        self._values[i] = np.vstack((self._values[i], chunk[self.columns].values.astype(np.float64)))
+
+    def __iter__(self):
+        while True:
+            for i in range(0, len(self.filenames)):
+                while not self._exhausted[i] and len(self._times[i]) == 0:
+                    self._read_chunk(i)
+
+            live = [i for i in range(0, len(self.filenames)) if not self._exhausted[i]]
+            boundary = min(self._times[i][-1] for i in live) if live else np.inf
+            limiting = min(live, key=lambda i: self._times[i][-1]) if live else None
+
+            ends = [np.searchsorted(self._times[i], boundary, side="left") for i in range(0, len(self.filenames))]
+            if all(e == 0 for e in ends):
+                if limiting is None:
+                    return
+                self._read_chunk(limiting)
+                continue
+
+            block = self._unify([self._times[i][0:ends[i]] for i in range(0, len(self.filenames))],
+                                [self._values[i][0:ends[i]] for i in range(0, len(self.filenames))])
+            if block is None:
+                self._read_chunk(limiting)
+                continue
+
+            timestamps, values, emitted = block
+            for i in range(0, len(self.filenames)):
+                self._times[i] = self._times[i][emitted[i]:]
+                self._values[i] = self._values[i][emitted[i]:]
+
+            yield timestamps, values
+
+    def _unify(self, times, values):
+        """
+        Unifies the timestamps of segments of all files. Returns the unified timestamps, the filled values of every
+        file and the number of original rows of every file that were used, or None if no row can be emitted yet.
+        """
+        all_timestamps = np.unique(np.concatenate(times))
+        counts = [np.bincount(np.searchsorted(all_timestamps, t), minlength=len(all_timestamps)) for t in times]
+        multiplicity = np.max(counts, axis=0)
+        offsets = np.cumsum(multiplicity) - multiplicity
+        num_rows = int(np.sum(multiplicity))
+
+        if not self.unify_timestamps and any(len(t) != num_rows for t in times):
+            raise ValueError(f"The timestamps of the results {self.filenames} do not match. "
+                             f"Use unify_timestamps=True to compare them.")
+
+        positions = []
+        for t in times:
+            rank = np.arange(len(t)) - np.searchsorted(t, t, side="left")
+            positions.append(offsets[np.searchsorted(all_timestamps, t)] + rank)
+
+        # Rows after the last original row of a file that is not read completely yet cannot be backward filled or
+        # interpolated, so they are held back
+        last_row = num_rows - 1
+        if self.fill_in_method != "ffill":
+            for i in range(0, len(times)):
+                if not self._exhausted[i] or len(self._times[i]) > len(times[i]):
+                    last_row = min(last_row, positions[i][-1] if len(positions[i]) > 0 else -1)
+
+        if last_row < 0:
+            return None
+
+        # All rows of the segments are filled, as the rows up to last_row may be filled from later original rows
+        timestamps = np.repeat(all_timestamps, multiplicity)[0:last_row + 1]
+        filled = []
+        emitted = []
+        for i in range(0, len(times)):
+            unified = np.full((num_rows, len(self.columns)), np.nan)
+            unified[positions[i]] = values[i]
+
+            if self.fill_in_method == "ffill":
+                unified = _ffill(unified, self._carry[i])
+            elif self.fill_in_method == "bfill":
+                unified = _bfill(unified)
+            else:
+                unified = _interpolate(unified, self._carry[i])
+
+            unified = unified[0:last_row + 1]
+            self._carry[i] = unified[-1]
+            filled.append(unified)
+            emitted.append(int(np.searchsorted(positions[i], last_row, side="right")))
+
+        return timestamps, filled, emitted
+
+    def check_time_ranges(self):
+        """
+        Raises a ValueError if the start or end times of the results do not match, as RegressionTest._unify_timestamps
+        """
+        start_times = np.array([t if t is not None else np.nan for t in self.start_times])
+        end_times = np.array([t if t is not None else np.nan for t in self.end_times])
+
+        if not math.isclose(np.min(start_times), np.max(start_times), rel_tol=1e-5, abs_tol=1e-3):
+            raise ValueError("The simulation start times of the results to not match. "
+                             f"Maximum deviation is {np.max(start_times) - np.min(start_times)} "
+                             f"and stems from results with indices {np.argmax(start_times)} and {np.argmin(start_times)}")
+
+        if not math.isclose(np.min(end_times), np.max(end_times), rel_tol=1e-5, abs_tol=1e-3):
+            raise ValueError("The simulation end times of the results to not match. "
+                             f"Maximum deviation is {np.max(end_times) - np.min(end_times)} "
+                             f"and stems from results with indices {np.argmax(end_times)} and {np.argmin(end_times)}")
+
+
+def _make_accumulator(metric):
+    """
+    Creates the accumulator of a metric for chunked comparisons. For the localized metric abs_dist_ptwise, only the
+    maximum pointwise deviation is accumulated, such that memory stays bounded.
+    """
+    info = metrics.get_metric_info(metric)
+    if info is not None and info.func is metrics.abs_dist_ptwise:
+        return metrics.NormInftyDistAccumulator()
+
+    try:
+        return metrics.make_accumulator(metric)
+    except ValueError:
+        raise ValueError(f"The metric {metric} cannot be evaluated in chunks. Only the metrics norm_infty_dist, "
+                         f"Linfty_dist, norm_p_dist, Lp_dist and abs_dist_ptwise from mopyregtest.metrics are "
+                         f"supported.")
+
+
+def compare_chunked(reference_result, simulation_result, validated_cols, metric=metrics.norm_infty_dist,
+                    unify_timestamps=True, fill_in_method="ffill", chunk_rows=None, with_ranges=False,
+                    t_start=None, t_stop=None):
+    """
+    Computes the deviations between a reference result and a simulation result, reading both in chunks of rows,
+    such that results of any size can be compared with bounded memory. Timestamps are unified chunk-wise with the
+    same outcome as RegressionTest._unify_timestamps for results without NaN values.
+
+    Parameters
+    ----------
+    reference_result : str or PathLike
+        Path to a reference result file
+    simulation_result  : str or PathLike
+        Path to a simulation result file
+    validated_cols : List[str]
+        Columns to compare, which must be present in both results
+    metric : Callable or list
+        One of the metrics norm_infty_dist, Linfty_dist, norm_p_dist, Lp_dist or abs_dist_ptwise from
+        mopyregtest.metrics, possibly with p bound by functools.partial. For abs_dist_ptwise, the maximum pointwise
+        deviation is returned. If a list of such metrics is given, all of them are evaluated in the same pass over
+        the results.
+    unify_timestamps : bool
+        See doc string of RegressionTest.compare_result
+    fill_in_method : str
+        See doc string of RegressionTest.compare_result
+    chunk_rows : None or int
+        Number of rows read at once from each file. If None, resultio.CHUNK_ROWS is used.
+    with_ranges : bool
+        If True, also the ranges max - min of the validated columns in the reference result are returned, e.g. for
+        relative tolerances
+    t_start : None or float
+        If given, only rows with time >= t_start are compared
+    t_stop : None or float
+        If given, only rows with time <= t_stop are compared
+
+    Returns
+    -------
+    out : dict or list or tuple
+        Mapping of each validated column to the value of the metric, or a list of such mappings, one per metric, if
+        metric is a list. If with_ranges is True, a tuple of this and an np.ndarray with the ranges of the columns.
+    """
+    metric_list = metric if isinstance(metric, (list, tuple)) else [metric]
+    accumulators = [_make_accumulator(m) for m in metric_list]
+
+    reader = _UnifiedReader([reference_result, simulation_result], list(validated_cols), fill_in_method,
+                            unify_timestamps, chunk_rows, t_start, t_stop)
+    ref_min = np.full(len(validated_cols), np.inf)
+    ref_max = np.full(len(validated_cols), -np.inf)
+    for timestamps, (ref_values, sim_values) in reader:
+        ref_block = np.hstack((timestamps[:, np.newaxis], ref_values))
+        sim_block = np.hstack((timestamps[:, np.newaxis], sim_values))
+        for accumulator in accumulators:
+            accumulator.update(ref_block, sim_block)
+
+        if with_ranges and len(ref_values) > 0:
+            ref_min = np.fmin(ref_min, np.nanmin(ref_values, axis=0))
+            ref_max = np.fmax(ref_max, np.nanmax(ref_values, axis=0))
+
+    if any(t is None for t in reader.start_times):
+        raise ValueError(f"The results {reader.filenames} do not all contain rows in the time window "
+                         f"[{t_start}, {t_stop}]")
+
+    if unify_timestamps:
+        reader.check_time_ranges()
+
+    deltas = [dict(zip(validated_cols, np.atleast_1d(a.finalize()))) for a in accumulators]
+    deltas = deltas if isinstance(metric, (list, tuple)) else deltas[0]
+
+    if with_ranges:
+        return deltas, ref_max - ref_min
+
+    return deltas
@@ -6,6 +6,13 @@ Copyright (c) Dr. Philipp Emanuel Stelzig, 2019--2023.
 MIT License. See the project's LICENSE file.
 """
 
+import hashlib
+import json
+import os
+import pathlib
+import tempfile
+
+
 def ask_confirmation(question, max_asks=5):
     answer = None
 
@@ -45,4 +52,81 @@ def replace_in_file(filename, repl_dict):
     fhandle.write(contents)
     fhandle.close()
 
-    return
\ No newline at end of file
+    return
+
+def hash_file(filename, hasher=None, block_size=1 << 20):
+    if hasher is None:
+        hasher = hashlib.sha256()
+
+    with open(str(filename), 'rb') as fhandle:
+        for block in iter(lambda: fhandle.read(block_size), b""):
+            hasher.update(block)
+
+    return hasher
+
+
+def package_sources_hash(package_folder, dependencies=None, modelica_version="default", extra=None):
+    """
+    Computes a hash over all Modelica source files (.mo) of a package folder, the files of its dependencies and the
+    Modelica standard library version used. Whenever any of these inputs changes, so does the hash.
+
+    Parameters
+    ----------
+    package_folder : str or PathLike
+        Path of the folder of the Modelica package
+    dependencies : None or List[str]
+        Paths of .mo files the package depends on
+    modelica_version : str
+        Version of the Modelica standard library
+    extra : None or List[str]
+        Further strings to be included in the hash, e.g. the name or version of the simulation tool
+
+    Returns
+    -------
+    out : str
+        Hexadecimal sha256 digest
+    """
+    package_folder = pathlib.Path(package_folder)
+    hasher = hashlib.sha256()
+    hasher.update(f"modelica_version={modelica_version}\n".encode("utf-8"))
+
+    for e in (extra or []):
+        hasher.update(f"extra={e}\n".encode("utf-8"))
+
+    for f in sorted(package_folder.rglob("*.mo")):
+        hasher.update(f"file={f.relative_to(package_folder).as_posix()}\n".encode("utf-8"))
+        hash_file(f, hasher)
+
+    for d in (dependencies or []):
+        hasher.update(f"dependency={d}\n".encode("utf-8"))
+        if pathlib.Path(d).is_file():
+            hash_file(d, hasher)
+
+    return hasher.hexdigest()
+
+
+def write_json_atomic(filename, data):
+    """
+    Writes data as JSON to filename such that concurrent readers never see a partially written file.
+    """
+    filename = pathlib.Path(filename)
+    filename.parent.mkdir(parents=True, exist_ok=True)
+
+    fd, tmp_name = tempfile.mkstemp(prefix=filename.name, suffix=".tmp", dir=filename.parent)
+    with os.fdopen(fd, 'w') as fhandle:
+        json.dump(data, fhandle, indent=2)
+
+    os.replace(tmp_name, filename)
+
+    return
+
+
+def read_json(filename):
+    """
+    Reads a JSON file. Returns None if the file does not exist or cannot be parsed.
+    """
+    try:
+        with open(str(filename), 'r') as fhandle:
+            return json.load(fhandle)
+    except (OSError, ValueError):
+        return None
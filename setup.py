@@ -16,7 +16,9 @@ setuptools.setup(
     url="https://github.com/pstelzig/mopyregtest",
     packages=setuptools.find_packages(),
     package_data={"mopyregtest": ["templates/omc/model_import.mos.template",
-                                  "templates/omc/model_simulate.mos.template"]},
+                                  "templates/omc/model_simulate.mos.template",
+                                  "templates/omc/model_dependencies.mos.template",
+                                  "templates/omc/package_discover.mos.template"]},
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
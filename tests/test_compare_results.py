@@ -1,6 +1,10 @@
 import unittest
 import pathlib
 import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
 import mopyregtest
 
 this_folder = pathlib.Path(__file__).absolute().parent
@@ -101,6 +105,395 @@ class TestCompareResults(unittest.TestCase):
 
         return
 
+    def test_identical_results(self):
+        """
+        Validate that identical results pass without metric evaluation and that identical columns are skipped
+        """
+        tmp_folder = pathlib.Path(tempfile.mkdtemp())
+        sine_noisy_res = this_folder / "../examples/test_user_defined_metrics/references/SineNoisy_res.csv"
+        shutil.copyfile(sine_noisy_res, tmp_folder / "SineNoisy_res.csv")
+
+        def failing_metric(r_ref, r_act):
+            raise RuntimeError("The metric must not be evaluated")
+
+        mopyregtest.RegressionTest.compare_csv_files(sine_noisy_res, tmp_folder / "SineNoisy_res.csv",
+                                                     metric=failing_metric)
+
+        data = pd.read_csv(sine_noisy_res)
+        data["y"] += 1.0
+        data.to_csv(tmp_folder / "SineNoisy_res.csv", index=False)
+
+        with self.assertRaises(AssertionError) as e:
+            mopyregtest.RegressionTest.compare_csv_files(sine_noisy_res, tmp_folder / "SineNoisy_res.csv",
+                                                         write_comparison=False)
+        self.assertIn("['y']", str(e.exception))
+
+        self.assertRaises(RuntimeError, mopyregtest.RegressionTest.compare_csv_files,
+                          reference_result=sine_noisy_res, simulation_result=tmp_folder / "SineNoisy_res.csv",
+                          metric=failing_metric, validated_cols=["y"])
+
+        shutil.rmtree(tmp_folder)
+
+        return
+
+    def test_grid_metric(self):
+        """
+        Validate that results with different timestamps are compared with a metric not needing unified timestamps
+        """
+        sine_res = this_folder / "../examples/test_user_defined_metrics/references/Sine_res.csv"
+        sine_noisy_res = this_folder / "../examples/test_user_defined_metrics/references/SineNoisy_res.csv"
+
+        mopyregtest.RegressionTest.compare_csv_files(sine_res, sine_noisy_res, tol=0.1, validated_cols=["y"],
+                                                     metric=mopyregtest.metrics.L2_dist_interp)
+        self.assertRaises(AssertionError, mopyregtest.RegressionTest.compare_csv_files,
+                          reference_result=sine_res, simulation_result=sine_noisy_res, tol=1e-3,
+                          validated_cols=["y"], metric=mopyregtest.metrics.Lp_dist_grid, write_comparison=False)
+
+        return
+
+    def test_multiple_metrics(self):
+        """
+        Validate that several (metric, tol) pairs are checked in one comparison and all violations are reported
+        together, with one comparison file per violated metric
+        """
+        sine_res = this_folder / "../examples/test_user_defined_metrics/references/Sine_res.csv"
+        tmp_folder = pathlib.Path(tempfile.mkdtemp())
+        sine_noisy_res = tmp_folder / "SineNoisy_res.csv"
+        shutil.copyfile(this_folder / "../examples/test_user_defined_metrics/references/SineNoisy_res.csv",
+                        sine_noisy_res)
+
+        mopyregtest.RegressionTest.compare_csv_files(sine_res, sine_noisy_res, validated_cols=["y"],
+                                                     metric=[(mopyregtest.metrics.norm_infty_dist, 0.2),
+                                                             (mopyregtest.metrics.Lp_dist, 0.1),
+                                                             (mopyregtest.metrics.L2_dist_interp, 0.1)])
+
+        checks = [(mopyregtest.metrics.norm_infty_dist, 0.2), (mopyregtest.metrics.Lp_dist, 0.01),
+                  (mopyregtest.metrics.abs_dist_ptwise, 0.1)]
+        with self.assertRaises(AssertionError) as e:
+            mopyregtest.RegressionTest.compare_csv_files(sine_res, sine_noisy_res, validated_cols=["y"],
+                                                         metric=checks)
+        self.assertIn("metric Lp_dist", str(e.exception))
+        self.assertIn("metric abs_dist_ptwise", str(e.exception))
+        self.assertNotIn("norm_infty_dist", str(e.exception))
+        self.assertTrue((tmp_folder / "SineNoisy_res_comparison_Lp_dist.csv").exists())
+        self.assertTrue((tmp_folder / "SineNoisy_res_comparison_abs_dist_ptwise.csv").exists())
+        self.assertFalse((tmp_folder / "SineNoisy_res_comparison_norm_infty_dist.csv").exists())
+
+        with self.assertRaises(AssertionError) as e:
+            mopyregtest.RegressionTest.compare_csv_files(sine_res, sine_noisy_res, validated_cols=["y"],
+                                                         metric=checks[0:2], chunk_rows=50)
+        self.assertIn("metric Lp_dist", str(e.exception))
+
+        # A metric checked twice writes one comparison file per check
+        checks = [(mopyregtest.metrics.norm_infty_dist, 1.0), (mopyregtest.metrics.norm_infty_dist, 1e-3),
+                  (mopyregtest.metrics.Lp_dist, 1.0), (mopyregtest.metrics.norm_infty_dist, 1e-2)]
+        self.assertRaises(AssertionError, mopyregtest.RegressionTest.compare_csv_files, sine_res, sine_noisy_res,
+                          validated_cols=["y"], metric=checks)
+        self.assertFalse((tmp_folder / "SineNoisy_res_comparison_norm_infty_dist_0.csv").exists())
+        self.assertTrue((tmp_folder / "SineNoisy_res_comparison_norm_infty_dist_1.csv").exists())
+        self.assertTrue((tmp_folder / "SineNoisy_res_comparison_norm_infty_dist_3.csv").exists())
+
+        shutil.rmtree(tmp_folder)
+
+        return
+
+    def test_column_tolerances(self):
+        """
+        Validate per-column and pattern tolerances, absolute, relative to the reference range and combined
+        """
+        tmp_folder = pathlib.Path(tempfile.mkdtemp())
+        ref = pd.DataFrame(data={"time": [0.0, 0.5, 1.0], "R1.v": [0.0, 5000.0, 10000.0], "R1.i": [0.0, 0.001, 0.002],
+                                 "C1.v": [1.0, 1.0, 1.0]})
+        act = ref.copy()
+        act["R1.v"] += 5.0
+        act["R1.i"] += 1e-6
+        act["C1.v"] += 1e-3
+        ref.to_csv(tmp_folder / "ref_res.csv", index=False)
+        act.to_csv(tmp_folder / "act_res.csv", index=False)
+
+        tol = {"*.v": {"rel": 1e-3}, "R1.i": 1e-5, "C1.v": {"abs": 1e-2, "rel": 1e-3}}
+        for chunk_rows in [None, 2]:
+            mopyregtest.RegressionTest.compare_csv_files(tmp_folder / "ref_res.csv", tmp_folder / "act_res.csv",
+                                                         tol=tol, chunk_rows=chunk_rows)
+
+            with self.assertRaises(AssertionError) as e:
+                mopyregtest.RegressionTest.compare_csv_files(tmp_folder / "ref_res.csv", tmp_folder / "act_res.csv",
+                                                             tol={"R1.*": {"rel": 1e-4}, "*": 1e-2},
+                                                             chunk_rows=chunk_rows, write_comparison=False)
+            self.assertIn("'R1.v'", str(e.exception))
+            self.assertIn("'R1.i'", str(e.exception))
+            self.assertNotIn("'C1.v'", str(e.exception))
+
+        self.assertRaises(ValueError, mopyregtest.RegressionTest.compare_csv_files,
+                          reference_result=tmp_folder / "ref_res.csv", simulation_result=tmp_folder / "act_res.csv",
+                          tol={"*.v": 1.0})
+
+        shutil.rmtree(tmp_folder)
+
+        return
+
+    def test_column_patterns(self):
+        """
+        Validate that glob and regular expression patterns in validated_cols are resolved against the result header
+        """
+        diodes_res = this_folder / "../examples/test_Modelica_Electrical_Analog_Examples/references/Modelica.Electrical.Analog.Examples.CharacteristicIdealDiodes_res.csv"
+        header = mopyregtest.resultio.read_columns(diodes_res)
+
+        expand = mopyregtest.RegressionTest._expand_validated_cols
+        self.assertEqual(expand(["R1.*.v"], header), ["R1.n.v", "R1.p.v"])
+        self.assertEqual(expand(["Ideal.v", "re:R[0-9]\\.(i|v)"], header),
+                         ["Ideal.v", "R1.v", "R2.i", "R2.v", "R3.v", "R1.i", "R3.i"])
+        self.assertEqual(expand(["x[1]", "x[2]"], ["time", "x[1]", "x[2]"]), ["x[1]", "x[2]"])
+        self.assertRaises(ValueError, expand, ["Capacitor*.i"], header)
+
+        mopyregtest.RegressionTest.compare_csv_files(diodes_res, diodes_res, validated_cols=["*.i", "re:.*LossPower"])
+        self.assertRaises(ValueError, mopyregtest.RegressionTest.compare_csv_files,
+                          reference_result=diodes_res, simulation_result=diodes_res, validated_cols=["Capacitor*.i"])
+
+        # Only the selected columns are read from the wider simulation result
+        mopyregtest.RegressionTest.compare_csv_files(
+            this_folder / "../examples/test_user_defined_metrics/references/Sine_res.csv",
+            this_folder / "../examples/test_user_defined_metrics/references/SineNoisy_res.csv",
+            tol=0.2, validated_cols=["re:y"])
+        self.assertEqual(expand(["uniformNoise.state[[]1]"],
+                                ["time", "uniformNoise.state[1]", "uniformNoise.state[2]"]), ["uniformNoise.state[1]"])
+
+        return
+
+    def test_threaded_columns(self):
+        """
+        Validate that evaluating the columns in a thread pool gives the same results in the same order as evaluating
+        them sequentially
+        """
+        diodes_res = this_folder / "../examples/test_Modelica_Electrical_Analog_Examples/references/Modelica.Electrical.Analog.Examples.CharacteristicIdealDiodes_res.csv"
+        ref_data = mopyregtest.resultio.read_result(diodes_res)
+        sim_data = ref_data.copy()
+        cols = [c for c in ref_data.columns if c != "time"]
+        sim_data[cols] += np.linspace(0.0, 1e-3, len(cols))
+
+        for metric in [mopyregtest.metrics.norm_infty_dist, mopyregtest.metrics.tube_dist,
+                       lambda r_ref, r_act: np.max(np.abs(r_ref[:, 1] - r_act[:, 1]))]:
+            expected = mopyregtest.RegressionTest._evaluate_metric(metric, ref_data, sim_data, cols)
+            for num_threads in [2, 3, None]:
+                deltas = mopyregtest.RegressionTest._evaluate_metric(metric, ref_data, sim_data, cols, num_threads)
+                self.assertEqual(list(deltas.keys()), cols)
+                for c in cols:
+                    np.testing.assert_array_equal(deltas[c], expected[c])
+
+        # Progress output names only the first few of many columns
+        summary = mopyregtest.RegressionTest._cols_summary([f"x[{i}]" for i in range(0, 10000)])
+        self.assertEqual(summary, "10000 columns ['x[0]', 'x[1]', 'x[2]', 'x[3]', 'x[4]', ...]")
+
+        return
+
+    def test_time_window(self):
+        """
+        Validate that only the rows inside the time window are compared, also when comparing in chunks
+        """
+        tmp_folder = pathlib.Path(tempfile.mkdtemp())
+        time = np.linspace(0.0, 1.0, 101)
+        ref = pd.DataFrame(data={"time": time, "x": np.sin(time)})
+        act = ref.copy()
+        act.loc[act["time"] < 0.2, "x"] += 1.0
+        act.loc[act["time"] > 0.9, "x"] -= 1.0
+        ref.to_csv(tmp_folder / "ref_res.csv", index=False)
+        act.to_csv(tmp_folder / "act_res.csv", index=False)
+
+        for chunk_rows in [None, 7]:
+            mopyregtest.RegressionTest.compare_csv_files(tmp_folder / "ref_res.csv", tmp_folder / "act_res.csv",
+                                                         t_start=0.2, t_stop=0.9, chunk_rows=chunk_rows)
+            self.assertRaises(AssertionError, mopyregtest.RegressionTest.compare_csv_files,
+                              reference_result=tmp_folder / "ref_res.csv", simulation_result=tmp_folder / "act_res.csv",
+                              t_start=0.2, chunk_rows=chunk_rows)
+            self.assertRaises(ValueError, mopyregtest.RegressionTest.compare_csv_files,
+                              reference_result=tmp_folder / "ref_res.csv", simulation_result=tmp_folder / "act_res.csv",
+                              t_start=2.0, chunk_rows=chunk_rows)
+
+        # The comparison file only covers the time window
+        self.assertRaises(AssertionError, mopyregtest.RegressionTest.compare_csv_files,
+                          reference_result=tmp_folder / "ref_res.csv", simulation_result=tmp_folder / "act_res.csv",
+                          t_start=0.5, metric=mopyregtest.metrics.abs_dist_ptwise)
+        comparison = pd.read_csv(tmp_folder / "act_res_comparison.csv")
+        self.assertAlmostEqual(comparison["time"].min(), 0.5)
+
+        shutil.rmtree(tmp_folder)
+
+        return
+
+    def test_nway(self):
+        """
+        Validate the verdict matrix of comparing several simulation results against one reference
+        """
+        tmp_folder = pathlib.Path(tempfile.mkdtemp())
+        time = np.linspace(0.0, 1.0, 11)
+        ref = pd.DataFrame(data={"time": time, "x": time, "y": 2.0 * time})
+        ref.to_csv(tmp_folder / "ref_res.csv", index=False)
+        ref.to_csv(tmp_folder / "act1_res.csv", index=False)
+
+        act2 = ref.copy()
+        act2["x"] += 1e-3
+        act2.to_csv(tmp_folder / "act2_res.csv", index=False)
+
+        # Different timestamps, such that all results are unified onto one timeline
+        time3 = np.linspace(0.0, 1.0, 6)
+        act3 = pd.DataFrame(data={"time": time3, "x": time3, "y": 2.0 * time3 + 1.0, "z": time3})
+        act3.to_csv(tmp_folder / "act3_res.csv", index=False)
+
+        sims = [tmp_folder / "act1_res.csv", tmp_folder / "act2_res.csv", tmp_folder / "act3_res.csv"]
+        verdicts = mopyregtest.RegressionTest.compare_csv_files_nway(tmp_folder / "ref_res.csv", sims, tol=1e-2,
+                                                                     fill_in_method="interpolate")
+        self.assertEqual(list(verdicts.index), [str(f) for f in sims])
+        self.assertEqual(list(verdicts.columns), ["x", "y"])
+        np.testing.assert_array_equal(verdicts.values, [[True, True], [True, True], [True, False]])
+
+        verdicts = mopyregtest.RegressionTest.compare_csv_files_nway(
+            tmp_folder / "ref_res.csv", sims, validated_cols=["x"], fill_in_method="interpolate",
+            metric=[(mopyregtest.metrics.norm_infty_dist, 1e-4), (mopyregtest.metrics.Lp_dist, 1.0)])
+        np.testing.assert_array_equal(verdicts["x"].values, [True, False, True])
+
+        self.assertRaises(ValueError, mopyregtest.RegressionTest.compare_csv_files_nway,
+                          tmp_folder / "ref_res.csv", sims, validated_cols=["z"])
+
+        shutil.rmtree(tmp_folder)
+
+        return
+
+    def test_multiple_references(self):
+        """
+        Validate that a simulation result passes if it matches any of several references, and that otherwise the
+        deviations from all references are reported
+        """
+        tmp_folder = pathlib.Path(tempfile.mkdtemp())
+        time = np.linspace(0.0, 1.0, 11)
+        act = pd.DataFrame(data={"time": time, "x": time})
+        act.to_csv(tmp_folder / "act_res.csv", index=False)
+
+        linux = act.copy()
+        linux["x"] += 1e-3
+        linux.to_csv(tmp_folder / "linux_res.csv", index=False)
+        windows = act.copy()
+        windows["x"] += 1e-9
+        windows.to_csv(tmp_folder / "windows_res.csv", index=False)
+        mopyregtest.resultio.convert_result(tmp_folder / "linux_res.csv", tmp_folder / "linux_res.fp.json")
+
+        refs = [tmp_folder / "linux_res.csv", tmp_folder / "windows_res.csv"]
+        mopyregtest.RegressionTest.compare_csv_files(refs, tmp_folder / "act_res.csv", tol=1e-6)
+        mopyregtest.RegressionTest.compare_csv_files(refs, tmp_folder / "act_res.csv", tol=1e-6, chunk_rows=4)
+        mopyregtest.RegressionTest.compare_csv_files([tmp_folder / "linux_res.fp.json", tmp_folder / "act_res.csv"],
+                                                     tmp_folder / "act_res.csv")
+
+        with self.assertRaises(AssertionError) as e:
+            mopyregtest.RegressionTest.compare_csv_files(refs, tmp_folder / "act_res.csv", tol=1e-10)
+        self.assertIn("linux_res.csv", str(e.exception))
+        self.assertIn("windows_res.csv", str(e.exception))
+        self.assertTrue((tmp_folder / "act_res_comparison.csv").exists())
+
+        self.assertRaises(ValueError, mopyregtest.RegressionTest.compare_csv_files, [], tmp_folder / "act_res.csv")
+
+        # A reference lacking validated columns does not match, but does not prevent a match with another reference
+        act["y"] = 2 * time
+        act.to_csv(tmp_folder / "act2_res.csv", index=False)
+        act.to_csv(tmp_folder / "ref2_res.csv", index=False)
+        refs = [tmp_folder / "ref2_res.csv", tmp_folder / "windows_res.csv"]
+        for ref_list in [refs, refs[::-1]]:
+            mopyregtest.RegressionTest.compare_csv_files(ref_list, tmp_folder / "act2_res.csv", tol=1e-10,
+                                                         validated_cols=["x", "y"])
+
+        act["y"] += 1.0
+        act.to_csv(tmp_folder / "ref3_res.csv", index=False)
+        with self.assertRaises(AssertionError) as e:
+            mopyregtest.RegressionTest.compare_csv_files([tmp_folder / "windows_res.csv", tmp_folder / "ref3_res.csv"],
+                                                         tmp_folder / "act2_res.csv", tol=1e-10,
+                                                         validated_cols=["x", "y"])
+        self.assertIn("Missing: {'y'}", str(e.exception))
+        self.assertIn("ref3_res.csv", str(e.exception))
+        self.assertRaises(ValueError, mopyregtest.RegressionTest.compare_csv_files, [tmp_folder / "windows_res.csv"],
+                          tmp_folder / "act2_res.csv", validated_cols=["x", "y"])
+
+        shutil.rmtree(tmp_folder)
+
+        return
+
+    def test_fail_fast(self):
+        """
+        Validate that a fail-fast comparison reports only the first failed column, in the order of the priority
+        columns, and writes no comparison file
+        """
+        tmp_folder = pathlib.Path(tempfile.mkdtemp())
+        time = np.linspace(0.0, 1.0, 11)
+        ref = pd.DataFrame(data={"time": time, "a": time, "b": time, "c": time})
+        act = ref.copy()
+        act["b"] += 1.0
+        act["c"] += 1.0
+        ref.to_csv(tmp_folder / "ref_res.csv", index=False)
+        act.to_csv(tmp_folder / "act_res.csv", index=False)
+
+        for metric in [mopyregtest.metrics.norm_infty_dist, mopyregtest.metrics.abs_dist_ptwise,
+                       lambda r_ref, r_act: np.max(np.abs(r_ref[:, 1] - r_act[:, 1]))]:
+            with self.assertRaises(AssertionError) as e:
+                mopyregtest.RegressionTest.compare_csv_files(tmp_folder / "ref_res.csv", tmp_folder / "act_res.csv",
+                                                             metric=metric, fail_fast=True)
+            self.assertIn("['b']", str(e.exception))
+
+            with self.assertRaises(AssertionError) as e:
+                mopyregtest.RegressionTest.compare_csv_files(tmp_folder / "ref_res.csv", tmp_folder / "act_res.csv",
+                                                             metric=metric, fail_fast=True, priority_cols=["c", "x*"])
+            self.assertIn("['c']", str(e.exception))
+
+        self.assertFalse((tmp_folder / "act_res_comparison.csv").exists())
+        mopyregtest.RegressionTest.compare_csv_files(tmp_folder / "ref_res.csv", tmp_folder / "act_res.csv",
+                                                     validated_cols=["a"], fail_fast=True)
+
+        shutil.rmtree(tmp_folder)
+
+        return
+
+    def test_discrete_columns(self):
+        """
+        Validate that discrete columns are compared exactly with a tolerance on their event times, detected from their
+        values or given by a type map, while the continuous columns are compared with the metric
+        """
+        tmp_folder = pathlib.Path(tempfile.mkdtemp())
+        time = np.linspace(0.0, 1.0, 101)
+        ref = pd.DataFrame(data={"time": time, "x": np.sin(time), "switch.on": (time >= 0.5).astype(float),
+                                 "counter": np.floor(10 * time)})
+        act = ref.copy()
+        act["x"] += 1e-4
+        act["switch.on"] = (time >= 0.52).astype(float)
+        ref.to_csv(tmp_folder / "ref_res.csv", index=False)
+        act.to_csv(tmp_folder / "act_res.csv", index=False)
+
+        for discrete_cols in ["auto", ["switch.*", "counter"], {"switch.*": "Boolean", "counter": "Integer",
+                                                                 "*": "Real"}]:
+            mopyregtest.RegressionTest.compare_csv_files(tmp_folder / "ref_res.csv", tmp_folder / "act_res.csv",
+                                                         tol=1e-3, discrete_cols=discrete_cols, event_tol=0.05)
+
+            with self.assertRaises(AssertionError) as e:
+                mopyregtest.RegressionTest.compare_csv_files(tmp_folder / "ref_res.csv", tmp_folder / "act_res.csv",
+                                                             tol=1e-3, discrete_cols=discrete_cols, event_tol=0.01)
+            self.assertIn("['switch.on']", str(e.exception))
+            self.assertIn("event_time_dist", str(e.exception))
+
+        # Without discrete columns, the switch deviates by 1 in the metric
+        self.assertRaises(AssertionError, mopyregtest.RegressionTest.compare_csv_files,
+                          reference_result=tmp_folder / "ref_res.csv", simulation_result=tmp_folder / "act_res.csv",
+                          tol=1e-3)
+        self.assertRaises(ValueError, mopyregtest.RegressionTest.compare_csv_files,
+                          reference_result=tmp_folder / "ref_res.csv", simulation_result=tmp_folder / "act_res.csv",
+                          discrete_cols={"*": "String"})
+
+        # Deviations of the continuous columns are still written to the comparison file
+        with self.assertRaises(AssertionError):
+            mopyregtest.RegressionTest.compare_csv_files(tmp_folder / "ref_res.csv", tmp_folder / "act_res.csv",
+                                                         tol=1e-5, discrete_cols="auto")
+        comparison = pd.read_csv(tmp_folder / "act_res_comparison.csv")
+        self.assertIn("failed.x.delta_nonloc", comparison.columns)
+        self.assertFalse(any(c.startswith("failed.counter") for c in comparison.columns))
+
+        shutil.rmtree(tmp_folder)
+
+        return
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,165 @@
+import shutil
+import tempfile
+import unittest
+import pathlib
+import mopyregtest
+
+this_folder = pathlib.Path(__file__).absolute().parent
+
+class TestGenerator(unittest.TestCase):
+    def test_failures_collected(self):
+        """
+        Validates that failures when generating references are collected per model, also with parallel workers,
+        and that no test definition is written if any reference could not be generated.
+        """
+        gentests_folder = this_folder / "data/gentests_failures"
+        gen = mopyregtest.Generator(package_folder=this_folder / "data/FlawedModels",
+                                    models_in_package=["FlawedModels.DoesNotBuild", "FlawedModels.DoesNotExist"])
+
+        with self.assertRaises(mopyregtest.generator.ReferenceGenerationError) as e:
+            gen.generate_tests(gentests_folder, "FlawedModels_Failures", "results", num_workers=2)
+
+        self.assertEqual(set(e.exception.failures.keys()), {"FlawedModels.DoesNotBuild", "FlawedModels.DoesNotExist"})
+        self.assertFalse((gentests_folder / "test_flawedmodels_failures.py").exists())
+
+        (gentests_folder / "references").mkdir(parents=True, exist_ok=True)
+        simulation_options, failures = gen._generate_references(gentests_folder / "references",
+                                                                gen.models_in_package, num_workers=2)
+        self.assertEqual(simulation_options, {})
+        self.assertEqual(set(failures.keys()), {"FlawedModels.DoesNotBuild", "FlawedModels.DoesNotExist"})
+
+        # Clean up the generated regression tests as otherwise they will confuse unittest discovery
+        shutil.rmtree(gentests_folder)
+
+        return
+
+    @unittest.skipIf(shutil.which("omc") is None, "requires the OpenModelica compiler omc")
+    def test_discover_models(self):
+        """
+        Validates that only models with an experiment annotation are discovered, together with their simulation options
+        """
+        models = mopyregtest.Generator.discover_models(this_folder / "data/FlawedModels", "FlawedModels")
+
+        self.assertEqual(list(models.keys()), ["FlawedModels.DoesNotFinish"])
+        self.assertEqual(models["FlawedModels.DoesNotFinish"], (0.0, 2.0, 1e-6, 1000, 0.002))
+
+        return
+
+    def test_parse_discovered_models(self):
+        """
+        Validates parsing the output of the class enumeration of the simulation tool
+        """
+        output = "true\n\"mopyregtest_class;MyLib.A;model;false;true;0.0;2.0;1e-06;1000;0.002\n" \
+                 "mopyregtest_class;MyLib.B;model;false;false;0.0;1.0;1e-06;500;0.002\n" \
+                 "mopyregtest_class;MyLib.C;block;true;true;0.0;1.0;1e-06;500;0.002\n" \
+                 "mopyregtest_class;MyLib.D;function;false;true;0.0;1.0;1e-06;500;0.002\n\"\ntrue\n"
+
+        models = mopyregtest.Generator._parse_discovered_models(output)
+        self.assertEqual(models, {"MyLib.A": (0.0, 2.0, 1e-6, 1000, 0.002)})
+
+        models = mopyregtest.Generator._parse_discovered_models(output, include_partial=True, require_experiment=False)
+        self.assertEqual(list(models.keys()), ["MyLib.A", "MyLib.B", "MyLib.C"])
+
+        return
+
+    def test_class_source_files(self):
+        """
+        Validates that the source files defining a class are found in a package stored in multiple files
+        """
+        tmp_folder = pathlib.Path(tempfile.mkdtemp())
+        (tmp_folder / "Sub").mkdir()
+        (tmp_folder / "package.mo").write_text("package MyLib end MyLib;")
+        (tmp_folder / "Sub/package.mo").write_text("within MyLib; package Sub end Sub;")
+        (tmp_folder / "Sub/Model.mo").write_text("within MyLib.Sub; model Model end Model;")
+
+        self.assertEqual(mopyregtest.Generator._class_source_files(tmp_folder, "MyLib.Sub.Model"),
+                         [tmp_folder / "package.mo", tmp_folder / "Sub/package.mo", tmp_folder / "Sub/Model.mo"])
+        self.assertEqual(mopyregtest.Generator._class_source_files(tmp_folder, "MyLib.Sub.Model.Nested"),
+                         [tmp_folder / "package.mo", tmp_folder / "Sub/package.mo", tmp_folder / "Sub/Model.mo"])
+        self.assertEqual(mopyregtest.Generator._class_source_files(tmp_folder, "MyLib.Other"),
+                         [tmp_folder / "package.mo"])
+
+        shutil.rmtree(tmp_folder)
+
+        return
+
+    def test_parse_used_classes(self):
+        """
+        Validates parsing the output of the used classes query of the simulation tool
+        """
+        output = "true\ntrue\n\n\"mopyregtest_used_classes MyLib.A\"\n{MyLib.A,Modelica.Icons.Example}\n" \
+                 "\"mopyregtest_used_classes MyLib.DoesNotExist\"\n{}\n"
+
+        self.assertEqual(mopyregtest.Generator._parse_used_classes(output),
+                         {"MyLib.A": ["MyLib.A", "Modelica.Icons.Example"]})
+
+        return
+
+    def test_incremental_up_to_date(self):
+        """
+        Validates that in incremental mode, up-to-date references are neither regenerated nor modified
+        """
+        gentests_folder = this_folder / "data/gentests_incremental"
+        md = "FlawedModels.DoesNotFinish"
+        gen = mopyregtest.Generator(package_folder=this_folder / "data/FlawedModels", models_in_package=[md])
+
+        (gentests_folder / "references").mkdir(parents=True)
+        ref_file = gentests_folder / f"references/{md}_res.csv"
+        shutil.copyfile(this_folder / "../examples/test_user_defined_metrics/references/Sine_res.csv", ref_file)
+        ref_mtime = ref_file.stat().st_mtime_ns
+
+        manifest = {md: dict(gen._reference_inputs([md])[md], simulation_options=[0.0, 2.0, 1e-6, 1000, 0.002])}
+        mopyregtest.utils.write_json_atomic(gentests_folder / "references" / gen.REFERENCES_MANIFEST, manifest)
+
+        gen.generate_tests(gentests_folder, "FlawedModels_Incremental", "results", incremental=True,
+                           bake_simulation_options=True)
+
+        self.assertEqual(ref_file.stat().st_mtime_ns, ref_mtime)
+        content = (gentests_folder / "test_flawedmodels_incremental.py").read_text()
+        self.assertIn("simulation_options=(0.0, 2.0, 1e-06, 1000, 0.002)", content)
+
+        # Clean up the generated regression tests as otherwise they will confuse unittest discovery
+        shutil.rmtree(gentests_folder)
+
+        return
+
+    def test_manifest_output(self):
+        """
+        Validates that tests written as a test manifest are loaded with paths relative to the manifest, and that
+        the unittest shim creates one test method per model.
+        """
+        gentests_folder = this_folder / "data/gentests_manifest"
+        md = "FlawedModels.DoesNotFinish"
+        gen = mopyregtest.Generator(package_folder=this_folder / "data/FlawedModels", models_in_package=[md],
+                                    metric=mopyregtest.metrics.Lp_dist, tol=1e-3)
+
+        gen.generate_tests(gentests_folder, "FlawedModels_Manifest", "results",
+                           references={md: str(this_folder / "../examples/test_user_defined_metrics/references/Sine_res.csv")},
+                           output_format="manifest")
+
+        manifest_file = gentests_folder / "test_flawedmodels_manifest.json"
+        tests = mopyregtest.runner.load_manifest(manifest_file)
+        self.assertEqual(len(tests), 1)
+        self.assertEqual(tests[0]["model_in_package"], md)
+        self.assertEqual(tests[0]["metric"], "Lp_dist")
+        self.assertNotIn("metric_code", tests[0])
+        self.assertEqual(tests[0]["tol"], 1e-3)
+        self.assertEqual(pathlib.Path(tests[0]["reference_result"]), gentests_folder / f"references/{md}_res.csv")
+        self.assertEqual(pathlib.Path(tests[0]["result_folder"]), gentests_folder / "results" / md)
+        self.assertIs(mopyregtest.runner._resolve_metric(tests[0]), mopyregtest.metrics.Lp_dist)
+        self.assertRaises(ValueError, mopyregtest.runner._resolve_metric, {"metric": "__import__('os')"})
+        self.assertEqual(mopyregtest.runner._resolve_metric({"metric_code": "lambda r_ref, r_act: 0.0"})(None, None),
+                         0.0)
+
+        test_case = mopyregtest.runner.make_test_case(manifest_file, "TestFlawedModels_Manifest")
+        self.assertTrue(hasattr(test_case, "test_flawedmodels_doesnotfinish"))
+        self.assertIn("make_test_case", (gentests_folder / "test_flawedmodels_manifest.py").read_text())
+
+        # Clean up the generated regression tests as otherwise they will confuse unittest discovery
+        shutil.rmtree(gentests_folder)
+
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
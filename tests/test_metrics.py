@@ -1,5 +1,7 @@
 import unittest
+import functools
 import numpy as np
+import pandas as pd
 import mopyregtest
 
 class TestMetrics(unittest.TestCase):
@@ -152,6 +154,157 @@ class TestMetrics(unittest.TestCase):
 
         self.assertRaises(ValueError, mopyregtest.metrics.norm_infty_dist, f1=f1, f2=f4)
 
+    def test_accumulators(self):
+        """
+        Validates that accumulators updated chunk-wise and merged from partial accumulators give the same results as
+        the metric functions
+        """
+        rng = np.random.default_rng(1)
+        x = np.sort(rng.uniform(0, 10, 50))
+        f1 = np.vstack((x, rng.normal(size=50), rng.normal(size=50))).transpose()
+        f2 = np.vstack((x, rng.normal(size=50), rng.normal(size=50))).transpose()
+
+        for metric in [mopyregtest.metrics.norm_p_dist, mopyregtest.metrics.norm_infty_dist,
+                       mopyregtest.metrics.Lp_dist, mopyregtest.metrics.Linfty_dist,
+                       functools.partial(mopyregtest.metrics.Lp_dist, p=3)]:
+            chunked = mopyregtest.metrics.make_accumulator(metric)
+            for i in range(0, 50, 7):
+                chunked.update(f1[i:i + 7], f2[i:i + 7])
+
+            parts = [mopyregtest.metrics.make_accumulator(metric).update(f1[i:i + 20], f2[i:i + 20])
+                     for i in range(0, 50, 20)]
+            merged = mopyregtest.metrics.make_accumulator(metric)
+            for part in parts:
+                merged.merge(part)
+
+            for j in range(1, 3):
+                expected = metric(f1[:, [0, j]], f2[:, [0, j]])
+                self.assertAlmostEqual(chunked.finalize()[j - 1], expected)
+                self.assertAlmostEqual(merged.finalize()[j - 1], expected)
+
+            single = mopyregtest.metrics.make_accumulator(metric).update(f1[:, [0, 1]], f2[:, [0, 1]])
+            self.assertAlmostEqual(single.finalize(), metric(f1[:, [0, 1]], f2[:, [0, 1]]))
+
+        ptwise = mopyregtest.metrics.make_accumulator(mopyregtest.metrics.abs_dist_ptwise)
+        ptwise.update(f1[0:30, [0, 1]], f2[0:30, [0, 1]]).update(f1[30:, [0, 1]], f2[30:, [0, 1]])
+        np.testing.assert_allclose(ptwise.finalize(), mopyregtest.metrics.abs_dist_ptwise(f1[:, [0, 1]], f2[:, [0, 1]]))
+
+        self.assertRaises(ValueError, mopyregtest.metrics.make_accumulator, lambda r_ref, r_act: 0.0)
+
+    def test_grid_metrics(self):
+        """
+        Validates the metrics for functions on different abscissae against the metrics on unified abscissae
+        """
+        f1 = np.array([[0, 1],
+                       [1, 2],
+                       [3, -3],
+                       [3, -4],
+                       [10, -5]])
+
+        f2 = np.array([[0, 7],
+                       [2, -2],
+                       [10, 2]])
+
+        f1_ext, f2_ext = mopyregtest.RegressionTest._unify_timestamps(
+            [pd.DataFrame(f1, columns=["time", "y"]), pd.DataFrame(f2, columns=["time", "y"])])
+
+        for p in [1, 2, 3]:
+            self.assertAlmostEqual(mopyregtest.metrics.Lp_dist_grid(f1, f2, p),
+                                   mopyregtest.metrics.Lp_dist(f1_ext.values, f2_ext.values, p))
+
+        self.assertAlmostEqual(mopyregtest.metrics.Linfty_dist_grid(f1, f2), 7)
+
+        # Distance of f(t) = t and f(t) = 0 on [0, 1] is sqrt(1/3)
+        self.assertAlmostEqual(mopyregtest.metrics.L2_dist_interp(np.array([[0, 0], [1, 1]]),
+                                                                  np.array([[0, 0], [0.5, 0], [1, 0]])), np.sqrt(1 / 3))
+
+        self.assertRaises(ValueError, mopyregtest.metrics.Lp_dist_grid, f1=f1, f2=np.array([[20, 1], [30, 1]]))
+
+        self.assertFalse(mopyregtest.metrics.needs_unified_timestamps(mopyregtest.metrics.Lp_dist_grid))
+        self.assertTrue(mopyregtest.metrics.needs_unified_timestamps(mopyregtest.metrics.Lp_dist))
+
+    def test_tube_dist(self):
+        """
+        Validates the tube around a reference with a step and the distance of results from it
+        """
+        f1 = np.array([[0, 0],
+                       [1, 0],
+                       [1, 1],
+                       [2, 1],
+                       [4, 1]])
+
+        lower, upper = mopyregtest.metrics.tube_envelope(f1, x_width=0.5, y_width=0.1)
+        np.testing.assert_allclose(lower[:, 0], [-0.1, -0.1, -0.1, 0.9, 0.9])
+        np.testing.assert_allclose(upper[:, 0], [0.1, 1.1, 1.1, 1.1, 1.1])
+
+        # A step slightly later than in the reference stays in the tube, a wrong value at the end does not
+        f2 = np.array([[0, 0],
+                       [1.2, 0],
+                       [1.2, 1],
+                       [3, 1],
+                       [4, 1.5]])
+        delta = mopyregtest.metrics.tube_dist(f1, f2, x_width=0.5, y_width=0.1)
+        np.testing.assert_allclose(delta, [[0, 0], [1.2, 0], [1.2, 0], [3, 0], [4, 0.4]])
+
+        # Several variables at once
+        f1_multi = np.hstack((f1, 2 * f1[:, 1:]))
+        f2_multi = np.hstack((f2, 2 * f2[:, 1:]))
+        delta_multi = mopyregtest.metrics.tube_dist(f1_multi, f2_multi, x_width=0.5, y_width=0.1)
+        np.testing.assert_allclose(delta_multi[:, 1], delta[:, 1])
+        np.testing.assert_allclose(delta_multi[:, 2], [0, 0, 0, 0, 0.9])
+
+    def test_event_time_dist(self):
+        """
+        Validates the distance of discrete functions with value changes at deviating times
+        """
+        f1 = np.array([[0, 0],
+                       [1, 0],
+                       [1, 1],
+                       [2, 1],
+                       [3, 2]])
+        f2 = np.array([[0, 0],
+                       [0.5, 0],
+                       [1.1, 1],
+                       [3.25, 2]])
+
+        self.assertEqual(mopyregtest.metrics.event_time_dist(f1, f1), 0.0)
+        self.assertAlmostEqual(mopyregtest.metrics.event_time_dist(f1, f2), 0.25)
+
+        # Different sequences of values or initial values cannot be compared by event times
+        f3 = f2.copy()
+        f3[3, 1] = 3
+        self.assertEqual(mopyregtest.metrics.event_time_dist(f1, f3), np.inf)
+        self.assertEqual(mopyregtest.metrics.event_time_dist(f1, np.array([[0, 1], [3, 1]])), np.inf)
+
+    def test_registry(self):
+        """
+        Validates looking up metrics and their properties in the metric registry
+        """
+        self.assertIs(mopyregtest.metrics.get_metric("Lp_dist"), mopyregtest.metrics.Lp_dist)
+        self.assertRaises(ValueError, mopyregtest.metrics.get_metric, "not_a_metric")
+
+        info = mopyregtest.metrics.get_metric_info(functools.partial(mopyregtest.metrics.Lp_dist, p=1))
+        self.assertEqual(info.name, "Lp_dist")
+        self.assertIs(info.accumulator, mopyregtest.metrics.LpDistAccumulator)
+        self.assertFalse(info.localized)
+
+        self.assertTrue(mopyregtest.metrics.get_metric_info("tube_dist").batched)
+        self.assertIsNone(mopyregtest.metrics.get_metric_info(lambda r_ref, r_act: 0.0))
+
+        def my_dist(f1, f2):
+            return np.max(np.abs(f2[:, 1] - f1[:, 1]))
+
+        mopyregtest.metrics.register_metric(my_dist, name="test_my_dist", needs_unified_timestamps=False)
+        self.assertIn("test_my_dist", mopyregtest.metrics.metric_names())
+        self.assertFalse(mopyregtest.metrics.needs_unified_timestamps(my_dist))
+
+        gen = mopyregtest.Generator(package_folder=".", models_in_package=[], metric=my_dist)
+        self.assertEqual(gen.metric, 'mopyregtest.metrics.get_metric("test_my_dist")')
+        gen = mopyregtest.Generator(package_folder=".", models_in_package=[], metric=mopyregtest.metrics.tube_dist)
+        self.assertEqual(gen.metric, "mopyregtest.metrics.tube_dist")
+
+        del mopyregtest.metrics._REGISTRY["test_my_dist"]
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,161 @@
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+import pathlib
+import pandas as pd
+import mopyregtest
+from mopyregtest import resultio
+
+this_folder = pathlib.Path(__file__).absolute().parent
+sine_res = this_folder / "../examples/test_user_defined_metrics/references/Sine_res.csv"
+sine_noisy_res = this_folder / "../examples/test_user_defined_metrics/references/SineNoisy_res.csv"
+
+class TestResultIO(unittest.TestCase):
+    def setUp(self):
+        self.tmp_folder = pathlib.Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_folder)
+
+    def test_result_format(self):
+        self.assertEqual(resultio.result_format("Model_res.csv"), "csv")
+        self.assertEqual(resultio.result_format("Model_res.csv.gz"), "csv.gz")
+        self.assertEqual(resultio.result_format("Model_res.npz"), "npz")
+        self.assertEqual(resultio.result_format("Modelica.Blocks.Sources.Sine_res.csv.xz"), "csv.xz")
+
+        self.assertEqual(resultio.result_stem("Modelica.Blocks.Sources.Sine_res.csv.xz"), "Modelica.Blocks.Sources.Sine_res")
+        self.assertEqual(resultio.result_stem("Model_res.npz"), "Model_res")
+
+    def test_convert_roundtrip(self):
+        """
+        Validates that results converted into compressed and binary formats are read back identically
+        """
+        expected = resultio.read_result(sine_res)
+
+        for fmt in ["csv.gz", "csv.xz", "csv.bz2", "npz"]:
+            converted = self.tmp_folder / f"Sine_res.{fmt}"
+            resultio.convert_result(sine_res, converted)
+            pd.testing.assert_frame_equal(resultio.read_result(converted), expected, check_dtype=False)
+
+            subset = resultio.read_result(converted, usecols=["time", "y"])
+            self.assertEqual(list(subset.columns), ["time", "y"])
+
+    def test_time_window(self):
+        """
+        Validates that only the rows inside a time window are read, for all formats and chunk sizes
+        """
+        data = resultio.read_result(sine_noisy_res)
+        expected = data[(data["time"] >= 0.25) & (data["time"] <= 0.5)].reset_index(drop=True)
+
+        for fmt in ["csv", "csv.gz", "npz"]:
+            converted = self.tmp_folder / f"SineNoisy_res.{fmt}"
+            resultio.convert_result(sine_noisy_res, converted)
+
+            pd.testing.assert_frame_equal(resultio.read_result(converted, t_start=0.25, t_stop=0.5), expected,
+                                          check_dtype=False)
+            for chunksize in [1, 10]:
+                chunks = list(resultio.iter_result(converted, usecols=["y"], chunksize=chunksize,
+                                                   t_start=0.25, t_stop=0.5))
+                pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), expected[["y"]],
+                                              check_dtype=False)
+
+        self.assertEqual(len(resultio.read_result(sine_noisy_res, t_start=2.0)), 0)
+
+    def test_compare_compressed(self):
+        """
+        Validates that compressed results are compared transparently and the comparison file is named after the
+        result without its format suffixes
+        """
+        ref = self.tmp_folder / "SineNoisy_res.csv.gz"
+        act = self.tmp_folder / "Sine_res.npz"
+        resultio.convert_result(sine_noisy_res, ref)
+        resultio.convert_result(sine_res, act)
+
+        mopyregtest.RegressionTest.compare_csv_files(ref, ref, validated_cols=["y"])
+
+        self.assertRaises(AssertionError, mopyregtest.RegressionTest.compare_csv_files,
+                          reference_result=ref, simulation_result=act, tol=1e-5, validated_cols=["y"])
+        self.assertTrue((self.tmp_folder / "Sine_res_comparison.csv").exists())
+
+        # Column names of binary results appear in messages as for CSV results
+        self.assertEqual(resultio.read_columns(act), ["time", "y"])
+        with self.assertRaises(AssertionError) as e:
+            mopyregtest.RegressionTest.compare_csv_files(act, ref, tol=1e-5, validated_cols=["y"])
+        self.assertIn("columns ['y']", str(e.exception))
+        with self.assertRaises(ValueError) as e:
+            mopyregtest.RegressionTest.compare_csv_files(act, ref, validated_cols=["y", "z"])
+        self.assertNotIn("np.str_", str(e.exception))
+
+    def test_fingerprint(self):
+        """
+        Validates that fingerprints do not depend on the chunking of the result and that results are compared against
+        fingerprints within the tolerance
+        """
+        fp = self.tmp_folder / "Sine_res.fp.json"
+        resultio.convert_result(sine_res, fp)
+        fingerprint = resultio.read_fingerprint(fp)
+        self.assertEqual(fingerprint["num_rows"], 502)
+        self.assertEqual(fingerprint["time_range"], [0.0, 1.0])
+        self.assertEqual(fingerprint["data_time_range"], [0.0, 1.0])
+
+        chunk_rows = resultio.CHUNK_ROWS
+        resultio.CHUNK_ROWS = 37
+        try:
+            chunked = resultio.fingerprint_result(sine_res, time_range=(0.0, 1.0), columns=["y"])
+        finally:
+            resultio.CHUNK_ROWS = chunk_rows
+        self.assertEqual(chunked["columns"]["y"]["sha256"], fingerprint["columns"]["y"]["sha256"])
+        self.assertEqual(chunked["columns"]["y"]["bucket_max"], fingerprint["columns"]["y"]["bucket_max"])
+        self.assertAlmostEqual(chunked["columns"]["y"]["integral"], fingerprint["columns"]["y"]["integral"])
+
+        self.assertRaises(ValueError, resultio.read_result, fp)
+
+        # The simulation result is read in a single pass
+        with unittest.mock.patch.object(resultio, "iter_result", wraps=resultio.iter_result) as iter_result:
+            mopyregtest.RegressionTest.compare_csv_files(fp, sine_res)
+        self.assertEqual(iter_result.call_count, 1)
+
+        data = resultio.read_result(sine_res)
+        data[data["time"] <= 0.5].to_csv(self.tmp_folder / "Short_res.csv", index=False)
+        self.assertRaises(ValueError, mopyregtest.RegressionTest.compare_csv_files, fp,
+                          self.tmp_folder / "Short_res.csv")
+        mopyregtest.RegressionTest.compare_csv_files(fp, sine_noisy_res, tol=1e-3, validated_cols=["y"])
+        with self.assertRaises(AssertionError) as e:
+            mopyregtest.RegressionTest.compare_csv_files(fp, sine_noisy_res, tol=1e-5, validated_cols=["y"])
+        self.assertIn("by more than 1e-05.", str(e.exception))
+
+    def test_reference_store(self):
+        """
+        Validates that identical references are stored once and that pointer files into the store are compared
+        transparently
+        """
+        store = self.tmp_folder / "store"
+        gen = mopyregtest.Generator(package_folder=this_folder / "data/FlawedModels",
+                                    models_in_package=["FlawedModels.A", "FlawedModels.B"],
+                                    reference_store=store)
+
+        for md in gen.models_in_package:
+            shutil.copyfile(sine_res, self.tmp_folder / gen._reference_name(md))
+            gen._store_reference(self.tmp_folder, md)
+
+            self.assertFalse((self.tmp_folder / gen._reference_name(md)).exists())
+            self.assertTrue(gen._reference_exists(self.tmp_folder, md))
+
+        self.assertEqual(len(list(store.glob("*/*.csv"))), 1)
+
+        pointer = self.tmp_folder / gen._reference_test_name("FlawedModels.A")
+        self.assertEqual(pointer.name, "FlawedModels.A_res.csv.ref")
+        pd.testing.assert_frame_equal(resultio.read_result(pointer), resultio.read_result(sine_res))
+
+        # Results from the store are cached, so callers must get a copy they may modify
+        data = resultio.read_result(pointer)
+        data["y"] = 0.0
+        pd.testing.assert_frame_equal(resultio.read_result(pointer), resultio.read_result(sine_res))
+        self.assertFalse((resultio.read_result(pointer)["y"] == 0.0).all())
+
+        mopyregtest.RegressionTest.compare_csv_files(pointer, sine_res, validated_cols=["y"])
+
+
+if __name__ == '__main__':
+    unittest.main()
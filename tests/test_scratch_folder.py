@@ -0,0 +1,94 @@
+import os
+import shutil
+import tempfile
+import unittest
+import pathlib
+import mopyregtest
+
+this_folder = pathlib.Path(__file__).absolute().parent
+
+md = "FlawedModels.DoesNotFinish"
+
+# Files the simulation tool writes into the work folder: results, scripts and logs, and build artifacts
+result_files = [f"{md}_res.csv", "model_simulate.mos", "omc_output.txt", f"{md}.log"]
+build_files = [f"{md}.c", f"{md}.o", f"{md}.makefile", f"{md}_init.xml", md]
+
+
+class TestScratchFolder(unittest.TestCase):
+    def setUp(self):
+        self.tmp_folder = pathlib.Path(tempfile.mkdtemp())
+        self.work_folders = []
+        self.cwd = os.getcwd()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmp_folder)
+
+    def _make_tester(self, scratch_min_free_mb, fail_in_scratch=False):
+        """
+        Creates a RegressionTest whose simulation tool is replaced by writing the files of a build and simulation
+        into the work folder. With fail_in_scratch, the first run fails as if the scratch folder ran full.
+        """
+        tester = mopyregtest.RegressionTest(package_folder=this_folder / "data/FlawedModels",
+                                            model_in_package=md,
+                                            result_folder=self.tmp_folder / "results",
+                                            scratch_folder=self.tmp_folder / "scratch",
+                                            scratch_min_free_mb=scratch_min_free_mb)
+
+        def run_model():
+            os.chdir(tester.work_folder_path)
+            self.work_folders.append(tester.work_folder_path)
+            for f in result_files + build_files:
+                (tester.work_folder_path / f).write_text("time,x\n0,1\n")
+
+            if fail_in_scratch and len(self.work_folders) == 1:
+                tester.scratch_min_free_mb = 1e12
+                raise OSError("No space left on device")
+
+        tester._run_model = run_model
+
+        return tester
+
+    def test_scratch_folder_copy_back(self):
+        """
+        Validates that only the result, script and log files are copied back from the scratch folder, and that the
+        scratch folder is removed after the simulation
+        """
+        tester = self._make_tester(scratch_min_free_mb=0)
+        tester._import_and_simulate()
+
+        self.assertEqual(len(self.work_folders), 1)
+        self.assertEqual(self.work_folders[0].parent, self.tmp_folder / "scratch")
+        self.assertFalse(self.work_folders[0].exists())
+        self.assertEqual(list((self.tmp_folder / "scratch").iterdir()), [])
+
+        self.assertEqual(sorted(f.name for f in (self.tmp_folder / "results").iterdir()), sorted(result_files))
+
+    def test_scratch_folder_too_small(self):
+        """
+        Validates that the model is built in the result folder if the scratch folder has too little free space
+        """
+        tester = self._make_tester(scratch_min_free_mb=1e12)
+        tester._import_and_simulate()
+
+        self.assertEqual(self.work_folders, [tester.result_folder_path])
+        self.assertEqual(list((self.tmp_folder / "scratch").iterdir()), [])
+        self.assertEqual(sorted(f.name for f in (self.tmp_folder / "results").iterdir()),
+                         sorted(result_files + build_files))
+
+    def test_scratch_folder_runs_full(self):
+        """
+        Validates that the model is built again in the result folder if the scratch folder runs full during the build
+        """
+        tester = self._make_tester(scratch_min_free_mb=0, fail_in_scratch=True)
+        tester._import_and_simulate()
+
+        self.assertEqual(len(self.work_folders), 2)
+        self.assertEqual(self.work_folders[0].parent, self.tmp_folder / "scratch")
+        self.assertEqual(self.work_folders[1], tester.result_folder_path)
+        self.assertEqual(list((self.tmp_folder / "scratch").iterdir()), [])
+        self.assertTrue((self.tmp_folder / f"results/{md}.o").exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
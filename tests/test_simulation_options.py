@@ -0,0 +1,74 @@
+import shutil
+import tempfile
+import unittest
+import pathlib
+import mopyregtest
+
+this_folder = pathlib.Path(__file__).absolute().parent
+
+class TestSimulationOptions(unittest.TestCase):
+    def setUp(self):
+        self.tmp_folder = pathlib.Path(tempfile.mkdtemp())
+        self.package_folder = self.tmp_folder / "FlawedModels"
+        shutil.copytree(this_folder / "data/FlawedModels", self.package_folder)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_folder)
+
+    def test_explicit_simulation_options(self):
+        """
+        Validates that explicitly given simulation options are parsed into numbers
+        """
+        tester = mopyregtest.RegressionTest(package_folder=self.package_folder,
+                                            model_in_package="FlawedModels.DoesNotFinish",
+                                            result_folder=self.tmp_folder / "results",
+                                            simulation_options=("0", "2", "1e-06", "1000.0", "0.002"))
+
+        self.assertEqual(tester.simulation_options, (0.0, 2.0, 1e-6, 1000, 0.002))
+
+        self.assertRaises(ValueError, mopyregtest.RegressionTest,
+                          package_folder=self.package_folder,
+                          model_in_package="FlawedModels.DoesNotFinish",
+                          result_folder=self.tmp_folder / "results",
+                          simulation_options=(0.0, 2.0, 1e-6))
+
+    def test_cache_roundtrip(self):
+        """
+        Validates that cached simulation options are found again, and only for a matching cache key
+        """
+        tester = mopyregtest.RegressionTest(package_folder=self.package_folder,
+                                            model_in_package="FlawedModels.DoesNotFinish",
+                                            result_folder=self.tmp_folder / "results",
+                                            cache_folder=self.tmp_folder / "cache")
+
+        cache_key = tester._simulation_options_cache_key("omc")
+        self.assertIsNone(tester._read_cached_simulation_options("omc", cache_key))
+
+        tester._write_cached_simulation_options("omc", cache_key, (0.0, 2.0, 1e-6, 1000, 0.002))
+        self.assertEqual(tester._read_cached_simulation_options("omc", cache_key), (0.0, 2.0, 1e-6, 1000, 0.002))
+        self.assertIsNone(tester._read_cached_simulation_options("omc", "other_key"))
+
+    def test_cache_key_invalidation(self):
+        """
+        Validates that the cache key changes with the package sources and the Modelica version
+        """
+        tester = mopyregtest.RegressionTest(package_folder=self.package_folder,
+                                            model_in_package="FlawedModels.DoesNotFinish",
+                                            result_folder=self.tmp_folder / "results",
+                                            cache_folder=self.tmp_folder / "cache")
+        cache_key = tester._simulation_options_cache_key("omc")
+
+        tester_other_version = mopyregtest.RegressionTest(package_folder=self.package_folder,
+                                                          model_in_package="FlawedModels.DoesNotFinish",
+                                                          result_folder=self.tmp_folder / "results",
+                                                          modelica_version="4.0.0",
+                                                          cache_folder=self.tmp_folder / "cache")
+        self.assertNotEqual(cache_key, tester_other_version._simulation_options_cache_key("omc"))
+
+        with open(self.package_folder / "package.mo", "a") as f:
+            f.write("\n")
+        self.assertNotEqual(cache_key, tester._simulation_options_cache_key("omc"))
+
+
+if __name__ == '__main__':
+    unittest.main()
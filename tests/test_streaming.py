@@ -0,0 +1,84 @@
+import shutil
+import tempfile
+import unittest
+import pathlib
+import functools
+import numpy as np
+import pandas as pd
+import mopyregtest
+
+this_folder = pathlib.Path(__file__).absolute().parent
+
+class TestStreaming(unittest.TestCase):
+    def setUp(self):
+        self.tmp_folder = pathlib.Path(tempfile.mkdtemp())
+
+        # Results with different timestamps and events, i.e. timestamps occurring multiple times
+        self.res1 = pd.DataFrame(data=[[0.0, 1.0, 2.0], [0.5, 2.0, 4.0], [0.5, 2.5, 5.0], [0.75, 3.0, 6.0],
+                                       [0.8, 3.5, 7.0], [1.0, 4.0, 8.0]],
+                                 columns=["time", "quant1", "quant2"])
+        self.res2 = pd.DataFrame(data=[[0.0, 1.0, 2.0], [0.25, 1.5, 3.0], [0.5, 2.0, 4.0], [0.5, 2.2, 4.4],
+                                       [0.5, 2.4, 4.8], [1.0, 4.0, 8.0]],
+                                 columns=["time", "quant1", "quant2"])
+        self.res1.to_csv(self.tmp_folder / "res1.csv", index=False)
+        self.res2.to_csv(self.tmp_folder / "res2.csv", index=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_folder)
+
+    def test_unify_chunked(self):
+        """
+        Validates that timestamps unified chunk-wise are identical to those unified on the full results, for all fill
+        in methods and chunk sizes
+        """
+        for fill_in_method in ["ffill", "bfill", "interpolate"]:
+            expected = mopyregtest.RegressionTest._unify_timestamps([self.res1, self.res2], fill_in_method)
+
+            for chunk_rows in [1, 2, 5, 100]:
+                reader = mopyregtest.streaming._UnifiedReader([self.tmp_folder / "res1.csv", self.tmp_folder / "res2.csv"],
+                                                              ["quant1", "quant2"], fill_in_method, chunk_rows=chunk_rows)
+                blocks = list(reader)
+
+                np.testing.assert_array_equal(np.concatenate([b[0] for b in blocks]), expected[0]["time"].values)
+                for i in range(0, 2):
+                    np.testing.assert_allclose(np.vstack([b[1][i] for b in blocks]),
+                                               expected[i][["quant1", "quant2"]].values, rtol=1e-12)
+
+    def test_metrics_chunked(self):
+        """
+        Validates that metrics accumulated chunk-wise are identical to those evaluated on the full results
+        """
+        expected = mopyregtest.RegressionTest._unify_timestamps([self.res1, self.res2], "interpolate")
+
+        for metric in [mopyregtest.metrics.norm_infty_dist, mopyregtest.metrics.Linfty_dist,
+                       mopyregtest.metrics.norm_p_dist, mopyregtest.metrics.Lp_dist,
+                       functools.partial(mopyregtest.metrics.Lp_dist, p=1)]:
+            deltas = mopyregtest.streaming.compare_chunked(self.tmp_folder / "res1.csv", self.tmp_folder / "res2.csv",
+                                                           ["quant1", "quant2"], metric,
+                                                           fill_in_method="interpolate", chunk_rows=2)
+            for c in ["quant1", "quant2"]:
+                self.assertAlmostEqual(deltas[c], metric(expected[0][["time", c]].values, expected[1][["time", c]].values))
+
+        self.assertRaises(ValueError, mopyregtest.streaming.compare_chunked,
+                          self.tmp_folder / "res1.csv", self.tmp_folder / "res2.csv", ["quant1"],
+                          lambda r_ref, r_act: 0.0)
+
+    def test_compare_chunked(self):
+        """
+        Validates comparing results in chunks with compare_csv_files
+        """
+        sine_res = this_folder / "../examples/test_user_defined_metrics/references/Sine_res.csv"
+        sine_noisy_res = this_folder / "../examples/test_user_defined_metrics/references/SineNoisy_res.csv"
+
+        mopyregtest.RegressionTest.compare_csv_files(sine_res, sine_noisy_res, tol=0.2, validated_cols=["y"],
+                                                     chunk_rows=50)
+        self.assertRaises(AssertionError, mopyregtest.RegressionTest.compare_csv_files,
+                          reference_result=sine_res, simulation_result=sine_noisy_res, tol=0.1,
+                          validated_cols=["y"], chunk_rows=50)
+        self.assertRaises(ValueError, mopyregtest.RegressionTest.compare_csv_files,
+                          reference_result=sine_res, simulation_result=sine_noisy_res,
+                          validated_cols=["y", "uniformNoise.y"], chunk_rows=50)
+
+
+if __name__ == '__main__':
+    unittest.main()